@@ -0,0 +1,382 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所分析查詢引擎（DuckDB）
+把 SQLite 資料庫、output/ 的歷年CSV與Parquet歸檔合併載入同一個欄式 futures 資料表，
+以欄式向量化、多核心平行的SQL回答常見的分析問題，結果可取回 pandas 或 Arrow
+"""
+
+import os
+import logging
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from database_manager import TaifexDatabaseManager
+from schema_mapping import KEY_COLUMNS, METRIC_COLUMNS, CSV_COLUMN_MAP
+
+try:
+    import duckdb
+    DUCKDB_AVAILABLE = True
+except ImportError:
+    DUCKDB_AVAILABLE = False
+
+# 同一筆資料出現在多個來源時的優先順序（數字小者優先）：資料庫最新，CSV最舊
+SOURCE_PRIORITY = {
+    'database': 0,
+    'parquet': 1,
+    'csv': 2,
+}
+
+
+def _sql_date(value):
+    """把 'YYYY/MM/DD' 字串、date 或 datetime 轉為 date"""
+    return pd.Timestamp(str(value).replace('/', '-')).date()
+
+
+def _as_list(value):
+    """單一值轉為列表，None 保持 None"""
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+class AnalyticsEngine:
+    """以DuckDB查詢台期所歷史資料"""
+
+    def __init__(self, db_path="data/taifex_data.db", csv_dir="output",
+                 parquet_root="data/parquet_archive", threads=None):
+        """
+        初始化分析引擎並掛載資料來源
+
+        Args:
+            db_path: SQLite資料庫路徑
+            csv_dir: 爬蟲輸出的歷年CSV目錄
+            parquet_root: Parquet歸檔根目錄
+            threads: DuckDB使用的執行緒數，None 表示全部核心
+        """
+        if not DUCKDB_AVAILABLE:
+            raise ImportError("分析引擎需要 duckdb，請執行 pip install duckdb")
+
+        self.db_path = Path(db_path)
+        self.csv_dir = Path(csv_dir)
+        self.parquet_root = Path(parquet_root)
+        self.logger = logging.getLogger(__name__)
+
+        self.conn = duckdb.connect()
+        self.conn.execute(f"SET threads = {int(threads or os.cpu_count() or 1)}")
+        self.sources = []
+        self.refresh()
+
+    def close(self):
+        """關閉DuckDB連線"""
+        self.conn.close()
+
+    def _attach_database(self):
+        """掛載SQLite資料庫：優先以 sqlite 擴充直接掃描，無法載入擴充時改由資料庫管理器讀入"""
+        if not self.db_path.exists():
+            return None
+
+        try:
+            self.conn.execute("DETACH DATABASE IF EXISTS taifex_db")
+            self.conn.execute(f"ATTACH '{self.db_path}' AS taifex_db (TYPE SQLITE, READ_ONLY)")
+            return f'''
+                SELECT strptime(date, '%Y/%m/%d')::DATE AS date, contract_code, identity_type,
+                       {', '.join(f'CAST({col} AS BIGINT) AS {col}' for col in METRIC_COLUMNS)}
+                FROM taifex_db.futures_data
+            '''
+        except duckdb.Error as e:
+            # 離線環境無法下載 sqlite 擴充
+            self.logger.info(f"ℹ️ 無法以DuckDB直接掛載SQLite（{e.__class__.__name__}），改用資料庫管理器讀取")
+
+        df = TaifexDatabaseManager(self.db_path).query(columns=KEY_COLUMNS + METRIC_COLUMNS)
+        df['contract_code'] = df['contract_code'].astype(str)
+        df['identity_type'] = df['identity_type'].astype(str)
+        self.conn.register('taifex_db_frame', df)
+        return f"SELECT CAST(date AS DATE) AS date, {', '.join(KEY_COLUMNS[1:] + METRIC_COLUMNS)} FROM taifex_db_frame"
+
+    def _attach_csv(self):
+        """掛載 output/ 的歷年CSV（中文欄位）"""
+        files = sorted(str(path) for path in self.csv_dir.glob("taifex_*.csv"))
+        if not files:
+            return None
+
+        renamed = ', '.join(f'"{zh}" AS {en}' for zh, en in CSV_COLUMN_MAP.items() if en != 'date')
+        file_list = ', '.join(f"'{path}'" for path in files)
+        return f'''
+            SELECT strptime(CAST("日期" AS VARCHAR), '%Y/%m/%d')::DATE AS date, {renamed}
+            FROM read_csv([{file_list}], header = true, union_by_name = true,
+                          types = {{'日期': 'VARCHAR', '契約名稱': 'VARCHAR', '身份別': 'VARCHAR'}})
+        '''
+
+    def _attach_parquet(self):
+        """掛載Parquet歸檔（依 year/contract 目錄分割）"""
+        if not any(self.parquet_root.glob('year=*/contract=*/*.parquet')):
+            return None
+        columns = ', '.join(KEY_COLUMNS + METRIC_COLUMNS)
+        return f'''
+            SELECT {columns}
+            FROM read_parquet('{self.parquet_root}/year=*/contract=*/*.parquet', hive_partitioning = true)
+        '''
+
+    def refresh(self):
+        """
+        重新掛載所有資料來源並載入 futures 資料表（同一筆資料以較新的來源為準）
+
+        CSV 每次掃描都要重新解析，因此合併結果存成 DuckDB 記憶體中的欄式資料表，
+        之後的查詢都直接平行掃描欄位；資料來源更新後再呼叫一次即可
+        """
+        selects = []
+        self.sources = []
+        for name, attach in (('database', self._attach_database),
+                             ('parquet', self._attach_parquet),
+                             ('csv', self._attach_csv)):
+            try:
+                sql = attach()
+            except Exception as e:
+                self.logger.warning(f"⚠️ 無法掛載資料來源 {name}: {e}")
+                continue
+            if sql:
+                selects.append(f"SELECT *, {SOURCE_PRIORITY[name]} AS source_priority FROM ({sql})")
+                self.sources.append(name)
+
+        if not selects:
+            raise FileNotFoundError("找不到任何資料來源（資料庫、Parquet歸檔或CSV）")
+
+        metrics = ', '.join(f'CAST(COALESCE({col}, 0) AS BIGINT) AS {col}' for col in METRIC_COLUMNS)
+        self.conn.execute(f'''
+            CREATE OR REPLACE TABLE futures AS
+            SELECT date, contract_code, identity_type, {metrics}
+            FROM ({' UNION ALL BY NAME '.join(selects)})
+            WHERE date IS NOT NULL
+            QUALIFY row_number() OVER (
+                PARTITION BY date, contract_code, identity_type ORDER BY source_priority
+            ) = 1
+        ''')
+        rows = self.conn.execute("SELECT COUNT(*) FROM futures").fetchone()[0]
+        self.logger.info(f"🦆 分析引擎已載入 {rows} 筆（來源: {', '.join(self.sources)}）")
+
+    def sql(self, query, params=None, as_='pandas'):
+        """
+        執行參數化SQL（可使用 futures 資料表）
+
+        Args:
+            query: SQL，參數以 ? 表示
+            params: 參數列表
+            as_: 回傳格式，'pandas' 或 'arrow'
+
+        Returns:
+            DataFrame 或 pyarrow.Table
+        """
+        if as_ not in ('pandas', 'arrow'):
+            raise ValueError(f"不支援的回傳格式: {as_}")
+
+        result = self.conn.execute(query, params or [])
+        if as_ == 'arrow':
+            return result.fetch_arrow_table()
+        return result.df()
+
+    def _filters(self, start=None, end=None, contracts=None, identities=None, years=None):
+        """組合共用的 WHERE 條件與參數"""
+        conditions = []
+        params = []
+        if years is not None and start is None:
+            # 未指定結束日期時，往回的年數以資料的最新日為準（與 end=None 表示最新資料一致）
+            anchor = end if end is not None else self.conn.execute("SELECT MAX(date) FROM futures").fetchone()[0]
+            if anchor is not None:
+                start = (pd.Timestamp(_sql_date(anchor)) - pd.DateOffset(years=years)).date()
+        if start is not None:
+            conditions.append('date >= ?')
+            params.append(_sql_date(start))
+        if end is not None:
+            conditions.append('date <= ?')
+            params.append(_sql_date(end))
+
+        contracts = _as_list(contracts)
+        if contracts:
+            conditions.append(f"contract_code IN ({', '.join('?' * len(contracts))})")
+            params.extend(contracts)
+        identities = _as_list(identities)
+        if identities:
+            conditions.append(f"identity_type IN ({', '.join('?' * len(identities))})")
+            params.extend(identities)
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        return where, params
+
+    @staticmethod
+    def _check_metric(metric):
+        """檢查指標欄位名稱（欄位名稱無法以參數傳入SQL）"""
+        if metric not in METRIC_COLUMNS:
+            raise ValueError(f"未知的指標欄位: {metric}")
+
+    def net_oi_by_identity(self, years=3, contracts='TX', identities=None, freq='day', end=None, as_='pandas'):
+        """
+        各身份別的多空淨額未平倉口數
+
+        Args:
+            years: 往回查詢的年數
+            contracts: 契約代碼或列表，None 表示全部契約合計
+            identities: 身份別列表，None 表示全部
+            freq: 'day' 為每日值，'week' / 'month' / 'year' 為該期間平均與期末值
+            end: 結束日期，None 表示最新
+            as_: 回傳格式，'pandas' 或 'arrow'
+
+        Returns:
+            長表：date（或 period）、identity_type、net_position_volume 等欄位
+        """
+        if freq not in ('day', 'week', 'month', 'year'):
+            raise ValueError(f"不支援的期間: {freq}")
+
+        where, params = self._filters(end=end, contracts=contracts, identities=identities, years=years)
+        daily = f'''
+            SELECT date, identity_type, SUM(net_position_volume) AS net_position_volume
+            FROM futures {where}
+            GROUP BY date, identity_type
+        '''
+        if freq == 'day':
+            query = f"{daily} ORDER BY date, identity_type"
+        else:
+            query = f'''
+                SELECT date_trunc('{freq}', date)::DATE AS period, identity_type,
+                       AVG(net_position_volume) AS avg_net_position_volume,
+                       arg_max(net_position_volume, date) AS last_net_position_volume,
+                       MIN(net_position_volume) AS min_net_position_volume,
+                       MAX(net_position_volume) AS max_net_position_volume,
+                       COUNT(*) AS trading_days
+                FROM ({daily})
+                GROUP BY period, identity_type
+                ORDER BY period, identity_type
+            '''
+        return self.sql(query, params, as_)
+
+    def percentile_ranks(self, metric='net_position_volume', lookback_days=250, contracts='TX',
+                         identities=None, end=None, as_='pandas'):
+        """
+        每個契約/身份別最新一日的數值，在過去N個交易日中的百分位數
+
+        Args:
+            metric: 指標欄位
+            lookback_days: 回看的交易日數
+            contracts: 契約代碼或列表，None 表示全部
+            identities: 身份別列表，None 表示全部
+            end: 以此日期（含）為最新一日，None 表示資料的最新日
+            as_: 回傳格式，'pandas' 或 'arrow'
+
+        Returns:
+            每個契約/身份別一列：date、value、percentile（0~1）、window_min、window_max、window_days
+        """
+        self._check_metric(metric)
+        where, params = self._filters(end=end, contracts=contracts, identities=identities)
+        query = f'''
+            WITH recent AS (
+                SELECT date, contract_code, identity_type, {metric} AS value,
+                       row_number() OVER (PARTITION BY contract_code, identity_type ORDER BY date DESC) AS age
+                FROM futures {where}
+            ),
+            ranked AS (
+                SELECT *,
+                       percent_rank() OVER (PARTITION BY contract_code, identity_type ORDER BY value) AS percentile,
+                       MIN(value) OVER (PARTITION BY contract_code, identity_type) AS window_min,
+                       MAX(value) OVER (PARTITION BY contract_code, identity_type) AS window_max,
+                       COUNT(*) OVER (PARTITION BY contract_code, identity_type) AS window_days
+                FROM recent
+                WHERE age <= ?
+            )
+            SELECT date, contract_code, identity_type, value, percentile, window_min, window_max, window_days
+            FROM ranked
+            WHERE age = 1
+            ORDER BY contract_code, identity_type
+        '''
+        return self.sql(query, params + [int(lookback_days)], as_)
+
+    def correlations(self, metric='net_position_volume', identity='外資', contracts=None, years=1,
+                     changes=True, end=None):
+        """
+        契約之間同一身份別指標的相關係數矩陣
+
+        Args:
+            metric: 指標欄位
+            identity: 身份別
+            contracts: 契約代碼列表，None 表示全部
+            years: 往回查詢的年數
+            changes: True 以每日變化量計算（避免趨勢造成的假相關），False 以原始數值計算
+            end: 結束日期，None 表示最新
+
+        Returns:
+            DataFrame: 契約 × 契約 的相關係數矩陣
+        """
+        self._check_metric(metric)
+        where, params = self._filters(end=end, contracts=contracts, identities=identity, years=years)
+        value = (f"{metric} - lag({metric}) OVER (PARTITION BY contract_code ORDER BY date)"
+                 if changes else metric)
+        pairs = self.sql(f'''
+            WITH series AS (
+                SELECT date, contract_code, {value} AS value
+                FROM futures {where}
+            )
+            SELECT a.contract_code AS contract_a, b.contract_code AS contract_b,
+                   corr(a.value, b.value) AS correlation
+            FROM series a JOIN series b ON a.date = b.date
+            WHERE a.value IS NOT NULL AND b.value IS NOT NULL
+            GROUP BY contract_a, contract_b
+        ''', params)
+
+        if pairs.empty:
+            return pd.DataFrame()
+        matrix = pairs.pivot(index='contract_a', columns='contract_b', values='correlation')
+        matrix.index.name = None
+        matrix.columns.name = None
+        return matrix
+
+    def identity_summary_by_year(self, metric='net_position_volume', contracts=None, as_='pandas'):
+        """
+        各年度、契約、身份別的指標統計（全歷史逐欄彙總）
+
+        Args:
+            metric: 指標欄位
+            contracts: 契約代碼列表，None 表示全部
+            as_: 回傳格式，'pandas' 或 'arrow'
+
+        Returns:
+            year、contract_code、identity_type、mean、std、min、max、trading_days
+        """
+        self._check_metric(metric)
+        where, params = self._filters(contracts=contracts)
+        return self.sql(f'''
+            SELECT year(date) AS year, contract_code, identity_type,
+                   AVG({metric}) AS mean, stddev_samp({metric}) AS std,
+                   MIN({metric}) AS min, MAX({metric}) AS max, COUNT(*) AS trading_days
+            FROM futures {where}
+            GROUP BY ALL
+            ORDER BY year, contract_code, identity_type
+        ''', params, as_)
+
+
+def main():
+    """示範：顯示分析引擎的常用查詢結果"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    print("🦆 台期所分析查詢引擎")
+    engine = AnalyticsEngine()
+
+    started = datetime.now()
+    span = engine.sql("SELECT MIN(date) AS first, MAX(date) AS last, COUNT(*) AS rows FROM futures")
+    print(f"📅 資料範圍: {span.iloc[0]['first']} ~ {span.iloc[0]['last']}，共 {span.iloc[0]['rows']} 筆")
+
+    print("\n📊 台指期各身份別未平倉淨額（月平均）:")
+    print(engine.net_oi_by_identity(years=3, freq='month').tail(9).to_string(index=False))
+
+    print("\n📈 最新未平倉淨額在近250日的百分位:")
+    print(engine.percentile_ranks().to_string(index=False))
+
+    print("\n🔗 外資各契約未平倉變化的相關係數:")
+    print(engine.correlations().round(2).to_string())
+
+    elapsed = (datetime.now() - started).total_seconds() * 1000
+    print(f"\n✅ 查詢完成，耗時 {elapsed:.1f} ms")
+    engine.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所資料庫線上備份
+以 SQLite backup API 分頁複製建立基底備份（寫入中也能安全執行），
+之後只以 gzip 增量檔保存自上次備份後異動的資料列，還原時依序重播
+"""
+
+import sqlite3
+import gzip
+import json
+import os
+import time
+import base64
+import hashlib
+import logging
+from pathlib import Path
+from datetime import datetime
+
+# 各資料表用來判斷異動的時間欄位
+WATERMARK_COLUMNS = {
+    'futures_data': 'updated_at',
+    'daily_summary': 'created_at',
+}
+
+MANIFEST_NAME = 'backup_manifest.json'
+
+
+def _encode_value(value):
+    """JSON無法表示的二進位值以base64保存"""
+    if isinstance(value, bytes):
+        return {'__bytes__': base64.b64encode(value).decode('ascii')}
+    return value
+
+
+def _decode_value(value):
+    """還原 _encode_value 編碼的值"""
+    if isinstance(value, dict) and '__bytes__' in value:
+        return base64.b64decode(value['__bytes__'])
+    return value
+
+
+def _row_digest(row):
+    """資料列內容的摘要（判斷水位線那一秒的資料列之後是否又被修改）"""
+    payload = json.dumps([_encode_value(v) for v in row], ensure_ascii=False, default=str)
+    return hashlib.sha1(payload.encode('utf-8')).hexdigest()
+
+
+def _watermark(entry):
+    """
+    水位線項目轉為 (時間, {id: 摘要})
+
+    時間戳只到秒，水位線同時記下落在該秒的資料列摘要；舊版清單只存時間字串
+    """
+    if isinstance(entry, dict):
+        return entry.get('at'), entry.get('rows', {})
+    return entry, {}
+
+
+class BackupManager:
+    """SQLite線上基底備份與增量備份"""
+
+    def __init__(self, db_path="data/taifex_data.db", backup_dir="backup", pages=256, full_interval_days=7):
+        """
+        初始化備份管理器
+
+        Args:
+            db_path: SQLite資料庫路徑
+            backup_dir: 備份目錄
+            pages: 線上備份每一步複製的頁數（分頁複製，避免長時間鎖住資料庫）
+            full_interval_days: 距上次基底備份超過幾天就重新建立基底備份
+        """
+        self.db_path = Path(db_path)
+        self.backup_dir = Path(backup_dir)
+        self.backup_dir.mkdir(parents=True, exist_ok=True)
+        self.pages = pages
+        self.full_interval_days = full_interval_days
+        self.manifest_path = self.backup_dir / MANIFEST_NAME
+        self.logger = logging.getLogger(__name__)
+
+    def load_manifest(self):
+        """讀取備份清單"""
+        if self.manifest_path.exists():
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        return {'backups': []}
+
+    def _save_manifest(self, manifest):
+        """寫入備份清單（先寫暫存檔再取代，避免中斷時損毀）"""
+        tmp_path = self.manifest_path.with_suffix('.json.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
+
+    def _new_backup_path(self, kind, suffix):
+        """產生不重複的備份檔路徑"""
+        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+        path = self.backup_dir / f"taifex_{kind}_{timestamp}{suffix}"
+        counter = 1
+        while path.exists():
+            path = self.backup_dir / f"taifex_{kind}_{timestamp}_{counter}{suffix}"
+            counter += 1
+        return path
+
+    def _read_watermarks(self, conn):
+        """各資料表目前的水位線：最新異動時間，以及該時間點上各資料列的內容摘要"""
+        watermarks = {}
+        for table, column in WATERMARK_COLUMNS.items():
+            try:
+                at = conn.execute(f"SELECT MAX({column}) FROM {table}").fetchone()[0]
+                rows = conn.execute(f"SELECT * FROM {table} WHERE {column} = ?", (at,)).fetchall()
+            except sqlite3.OperationalError:
+                watermarks[table] = None
+                continue
+            # 兩個資料表的第一欄都是 id
+            watermarks[table] = {'at': at, 'rows': {str(row[0]): _row_digest(row) for row in rows}}
+        return watermarks
+
+    def create_base_backup(self):
+        """
+        建立完整的基底備份（線上分頁複製）
+
+        Returns:
+            Path: 備份檔路徑
+        """
+        backup_path = self._new_backup_path('base', '.db')
+
+        source = sqlite3.connect(self.db_path, timeout=30)
+        target = sqlite3.connect(backup_path)
+        try:
+            # 複製完成的那一刻即為此備份的時間點，水位線取自備份檔本身
+            source.backup(target, pages=self.pages, sleep=0.005)
+            watermarks = self._read_watermarks(target)
+            rows = target.execute("SELECT COUNT(*) FROM futures_data").fetchone()[0]
+        finally:
+            target.close()
+            source.close()
+
+        manifest = self.load_manifest()
+        manifest['backups'].append({
+            'type': 'base',
+            'file': backup_path.name,
+            'created_at': datetime.now().isoformat(),
+            'watermarks': watermarks,
+            'rows': rows,
+        })
+        self._save_manifest(manifest)
+
+        self.logger.info(f"✅ 基底備份完成: {backup_path.name}（{rows} 筆）")
+        return backup_path
+
+    def create_delta_backup(self):
+        """
+        建立增量備份：只保存上次備份水位線之後異動的資料列
+
+        Returns:
+            Path: 增量檔路徑，沒有異動時為 None
+        """
+        manifest = self.load_manifest()
+        if not manifest['backups']:
+            return self.create_base_backup()
+
+        last_watermarks = manifest['backups'][-1]['watermarks']
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            # 在同一讀取交易中取資料與新水位線，確保兩者一致
+            conn.execute('BEGIN')
+            tables = {}
+            for table, column in WATERMARK_COLUMNS.items():
+                since, seen = _watermark(last_watermarks.get(table))
+                sql = f"SELECT * FROM {table}"
+                params = ()
+                if since is not None:
+                    # 時間戳只到秒，用 >= 取回同一秒內的異動，再略過上次已備份且內容相同的資料列
+                    sql += f" WHERE {column} >= ?"
+                    params = (since,)
+                try:
+                    cursor = conn.execute(sql, params)
+                except sqlite3.OperationalError:
+                    continue
+                columns = [d[0] for d in cursor.description]
+                position = columns.index(column)
+                rows = [row for row in cursor.fetchall()
+                        if row[position] != since or seen.get(str(row[0])) != _row_digest(row)]
+                if rows:
+                    tables[table] = {
+                        'columns': columns,
+                        'rows': [[_encode_value(v) for v in row] for row in rows]
+                    }
+            watermarks = self._read_watermarks(conn)
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        if not tables:
+            self.logger.info("ℹ️ 自上次備份後沒有異動，略過增量備份")
+            return None
+
+        delta_path = self._new_backup_path('delta', '.json.gz')
+        with gzip.open(delta_path, 'wt', encoding='utf-8') as f:
+            json.dump({'watermarks': watermarks, 'tables': tables}, f, ensure_ascii=False)
+
+        row_count = sum(len(t['rows']) for t in tables.values())
+        manifest['backups'].append({
+            'type': 'delta',
+            'file': delta_path.name,
+            'created_at': datetime.now().isoformat(),
+            'watermarks': watermarks,
+            'rows': row_count,
+        })
+        self._save_manifest(manifest)
+
+        self.logger.info(f"✅ 增量備份完成: {delta_path.name}（{row_count} 筆異動）")
+        return delta_path
+
+    def backup(self):
+        """
+        依排程需要建立基底或增量備份
+
+        Returns:
+            Path: 備份檔路徑，沒有異動時為 None
+        """
+        bases = [b for b in self.load_manifest()['backups'] if b['type'] == 'base']
+        if not bases or not (self.backup_dir / bases[-1]['file']).exists():
+            return self.create_base_backup()
+
+        age = datetime.now() - datetime.fromisoformat(bases[-1]['created_at'])
+        if age.days >= self.full_interval_days:
+            return self.create_base_backup()
+        return self.create_delta_backup()
+
+    def restore_chain(self, until=None):
+        """
+        取得還原需要的備份鏈：最新（或指定時間前）的基底備份及其後的增量
+
+        Args:
+            until: 只使用此時間（含）之前的備份，datetime 或 ISO 字串
+
+        Returns:
+            list: 備份清單項目
+        """
+        backups = self.load_manifest()['backups']
+        if until is not None:
+            until = until.isoformat() if hasattr(until, 'isoformat') else str(until)
+            backups = [b for b in backups if b['created_at'] <= until]
+
+        base_index = None
+        for i, entry in enumerate(backups):
+            if entry['type'] == 'base' and (self.backup_dir / entry['file']).exists():
+                base_index = i
+        if base_index is None:
+            return []
+        return backups[base_index:]
+
+    def restore(self, target_path=None, until=None):
+        """
+        以基底備份加上之後的增量重建資料庫
+
+        Args:
+            target_path: 還原目標路徑，None 表示覆寫原資料庫（會先自動建立基底備份）
+            until: 還原到此時間點為止
+
+        Returns:
+            Path: 還原後的資料庫路徑
+        """
+        chain = self.restore_chain(until)
+        if not chain:
+            raise FileNotFoundError(f"找不到可用的基底備份: {self.backup_dir}")
+
+        target_path = Path(target_path) if target_path else self.db_path
+        if target_path == self.db_path and self.db_path.exists():
+            # 覆寫前先保留目前狀態，還原錯了還能回來
+            self.create_base_backup()
+
+        started = time.time()
+        work_path = target_path.with_name(target_path.name + '.restoring')
+        if work_path.exists():
+            work_path.unlink()
+
+        base = sqlite3.connect(self.backup_dir / chain[0]['file'])
+        work = sqlite3.connect(work_path)
+        base.backup(work)
+        base.close()
+
+        # 重播不是新的異動：暫時移除 change_log 觸發器，還原的資料列不會被下游當成待同步
+        triggers = work.execute(
+            "SELECT name, sql FROM sqlite_master WHERE type = 'trigger' AND name LIKE 'trg_%_changelog_%'"
+        ).fetchall()
+        for name, _ in triggers:
+            work.execute(f'DROP TRIGGER {name}')
+
+        replayed = 0
+        for entry in chain[1:]:
+            with gzip.open(self.backup_dir / entry['file'], 'rt', encoding='utf-8') as f:
+                delta = json.load(f)
+            for table, data in delta['tables'].items():
+                columns = data['columns']
+                work.executemany(
+                    f"INSERT OR REPLACE INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' * len(columns))})",
+                    ([_decode_value(v) for v in row] for row in data['rows'])
+                )
+                replayed += len(data['rows'])
+        for _, sql in triggers:
+            work.execute(sql)
+        work.commit()
+
+        if target_path.exists():
+            # 以 backup API 寫回，其他連線看到的是一次完整的切換
+            target = sqlite3.connect(target_path, timeout=30)
+            work.backup(target)
+            target.close()
+            work.close()
+            work_path.unlink()
+        else:
+            work.close()
+            os.replace(work_path, target_path)
+
+        if target_path == self.db_path:
+            # 之後的增量要以還原後的狀態為基準
+            self.create_base_backup()
+
+        elapsed = time.time() - started
+        self.logger.info(
+            f"✅ 還原完成: {target_path}（基底 {chain[0]['file']} + {len(chain) - 1} 個增量，"
+            f"重播 {replayed} 筆，耗時 {elapsed:.2f} 秒）"
+        )
+        return target_path
+
+    def cleanup(self, keep_bases=4):
+        """
+        清理舊備份：保留最近N個基底備份及其後的增量
+
+        Args:
+            keep_bases: 保留的基底備份數
+        """
+        manifest = self.load_manifest()
+        base_indexes = [i for i, b in enumerate(manifest['backups']) if b['type'] == 'base']
+        if len(base_indexes) <= keep_bases:
+            return []
+
+        cutoff = base_indexes[-keep_bases]
+        removed = []
+        for entry in manifest['backups'][:cutoff]:
+            path = self.backup_dir / entry['file']
+            if path.exists():
+                path.unlink()
+            removed.append(entry['file'])
+            self.logger.info(f"🗑️ 清理舊備份: {entry['file']}")
+
+        manifest['backups'] = manifest['backups'][cutoff:]
+        self._save_manifest(manifest)
+        return removed
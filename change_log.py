@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所資料異動紀錄（change data capture）
+由觸發器把 futures_data / daily_summary 的每次實際異動寫入只增不改的 change_log，
+各下游（Google Sheets、Telegram、Excel匯出…）各自保存游標，只處理新的異動
+"""
+
+import sqlite3
+import logging
+import pandas as pd
+from pathlib import Path
+from database_writer import get_writer
+
+# 各資料表組成資料列鍵值的欄位；是否真的改變以資料表本身的 row_hash（寫入時計算的 splitmix64 內容雜湊）判斷
+TRACKED_TABLES = {
+    'futures_data': {'key': ['date', 'contract_code', 'identity_type']},
+    'daily_summary': {'key': ['date']},
+}
+
+
+# 各資料表的下游；安裝時先建立游標，清理異動紀錄時才不會漏掉還沒執行過的下游
+SINKS = {
+    'futures_data': ('google_sheets:交易量資料', 'google_sheets:完整資料', 'excel_export', 'telegram'),
+    'daily_summary': ('google_sheets_summary',),
+}
+
+# 取代舊版共用 'google_sheets' 游標的各工作表游標
+LEGACY_SHEETS_SINKS = ('google_sheets:交易量資料', 'google_sheets:完整資料')
+
+
+def _row_key_sql(alias, columns):
+    """資料列鍵值運算式，例如 date|contract_code|identity_type"""
+    return " || '|' || ".join(f"{alias}.{col}" for col in columns)
+
+
+class ChangeLog:
+    """資料異動紀錄與下游同步游標"""
+
+    def __init__(self, db_path="data/taifex_data.db"):
+        """
+        初始化異動紀錄（建立資料表與觸發器）
+
+        Args:
+            db_path: SQLite資料庫路徑
+        """
+        self.db_path = Path(db_path)
+        self.logger = logging.getLogger(__name__)
+        self.install()
+
+    def _trigger_statements(self, table, spec):
+        """產生單一資料表的觸發器"""
+        new_key = _row_key_sql('NEW', spec['key'])
+        old_key = _row_key_sql('OLD', spec['key'])
+
+        return [
+            f'''
+            CREATE TRIGGER trg_{table}_changelog_insert AFTER INSERT ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op, row_key, row_hash)
+                VALUES ('{table}', NEW.id, 'I', {new_key}, NEW.row_hash);
+            END
+            ''',
+            # 只記錄內容雜湊或鍵值真的改變的更新，重複 upsert 相同資料不會產生異動；
+            # 任一邊沒有雜湊時比較結果為 NULL，補上或清除雜湊（回填）不是內容異動
+            f'''
+            CREATE TRIGGER trg_{table}_changelog_update AFTER UPDATE ON {table}
+            WHEN OLD.row_hash != NEW.row_hash OR ({old_key}) IS NOT ({new_key})
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op, row_key, row_hash)
+                VALUES ('{table}', NEW.id, 'U', {new_key}, NEW.row_hash);
+            END
+            ''',
+            f'''
+            CREATE TRIGGER trg_{table}_changelog_delete AFTER DELETE ON {table}
+            BEGIN
+                INSERT INTO change_log (table_name, row_id, op, row_key, row_hash)
+                VALUES ('{table}', OLD.id, 'D', {old_key}, NULL);
+            END
+            ''',
+        ]
+
+    def install(self):
+        """建立 change_log、sync_cursors 資料表與觸發器（重複執行會更新觸發器定義），經由共用寫入器執行"""
+        get_writer(self.db_path).submit_statements([self._install]).result()
+
+    def _install(self, conn):
+        """在寫入器的交易中建立資料表與觸發器"""
+        cursor = conn.cursor()
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS change_log (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                table_name TEXT NOT NULL,
+                row_id INTEGER NOT NULL,
+                op TEXT NOT NULL,
+                row_key TEXT,
+                row_hash INTEGER,
+                changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        ''')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_log_table_seq ON change_log(table_name, seq)')
+
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS sync_cursors (
+                sink TEXT NOT NULL,
+                table_name TEXT NOT NULL,
+                last_seq INTEGER NOT NULL DEFAULT 0,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                PRIMARY KEY (sink, table_name)
+            )
+        ''')
+
+        existing_tables = {row[0] for row in cursor.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+        for table, spec in TRACKED_TABLES.items():
+            if table not in existing_tables:
+                continue
+            # 觸發器讀取 row_hash：舊資料庫先補上欄位（由資料庫管理器回填）
+            if 'row_hash' not in [row[1] for row in cursor.execute(f"PRAGMA table_info({table})")]:
+                cursor.execute(f'ALTER TABLE {table} ADD COLUMN row_hash INTEGER')
+            for op in ('insert', 'update', 'delete'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS trg_{table}_changelog_{op}')
+            for statement in self._trigger_statements(table, spec):
+                cursor.execute(statement)
+
+        # 舊版所有工作表共用 'google_sheets' 游標，改為每個工作表各自一個游標
+        legacy = cursor.execute(
+            "SELECT table_name, last_seq FROM sync_cursors WHERE sink = 'google_sheets'"
+        ).fetchall()
+        for table, last_seq in legacy:
+            for sheet in LEGACY_SHEETS_SINKS:
+                cursor.execute(
+                    'INSERT OR IGNORE INTO sync_cursors (sink, table_name, last_seq) VALUES (?, ?, ?)',
+                    (sheet, table, last_seq)
+                )
+        cursor.execute("DELETE FROM sync_cursors WHERE sink = 'google_sheets'")
+
+        for table, sinks in SINKS.items():
+            cursor.executemany(
+                'INSERT OR IGNORE INTO sync_cursors (sink, table_name, last_seq) VALUES (?, ?, 0)',
+                [(sink, table) for sink in sinks]
+            )
+        return 0
+
+    def get_cursor(self, sink, table='futures_data'):
+        """取得下游目前已處理到的異動序號"""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute(
+            'SELECT last_seq FROM sync_cursors WHERE sink = ? AND table_name = ?', (sink, table)
+        ).fetchone()
+        conn.close()
+        return row[0] if row else 0
+
+    def pending(self, sink, table='futures_data'):
+        """
+        取得下游尚未處理的異動資料列（每列只取目前值，已刪除者不回傳）
+
+        Args:
+            sink: 下游名稱
+            table: 資料表名稱
+
+        Returns:
+            tuple: (DataFrame 目前的資料列, 本批最後的異動序號)，沒有新異動時序號為 None
+        """
+        conn = sqlite3.connect(self.db_path)
+        try:
+            # 同一讀取交易中取序號上限與資料，避免漏掉讀取期間的新異動
+            conn.execute('BEGIN')
+            row = conn.execute(
+                'SELECT last_seq FROM sync_cursors WHERE sink = ? AND table_name = ?', (sink, table)
+            ).fetchone()
+            since = row[0] if row else 0
+            last_seq = conn.execute(
+                'SELECT MAX(seq) FROM change_log WHERE table_name = ? AND seq > ?', (table, since)
+            ).fetchone()[0]
+
+            if last_seq is None:
+                return pd.DataFrame(), None
+
+            order_by = ', '.join(f't.{col}' for col in TRACKED_TABLES[table]['key'])
+            rows = pd.read_sql_query(f'''
+                SELECT t.* FROM {table} t
+                JOIN (
+                    SELECT DISTINCT row_id FROM change_log
+                    WHERE table_name = ? AND seq > ? AND seq <= ?
+                ) c ON t.id = c.row_id
+                ORDER BY {order_by}
+            ''', conn, params=(table, since, last_seq))
+            conn.execute('COMMIT')
+        finally:
+            conn.close()
+
+        self.logger.info(f"🔄 {sink}: {table} 有 {len(rows)} 筆新異動（序號 {since + 1}~{last_seq}）")
+        return rows, last_seq
+
+    def has_pending(self, sink, table='futures_data'):
+        """下游是否有尚未處理的異動"""
+        conn = sqlite3.connect(self.db_path)
+        row = conn.execute('''
+            SELECT 1 FROM change_log
+            WHERE table_name = ? AND seq > COALESCE(
+                (SELECT last_seq FROM sync_cursors WHERE sink = ? AND table_name = ?), 0)
+            LIMIT 1
+        ''', (table, sink, table)).fetchone()
+        conn.close()
+        return row is not None
+
+    def latest_seq(self, table='futures_data'):
+        """資料表目前最新的異動序號"""
+        conn = sqlite3.connect(self.db_path)
+        seq = conn.execute('SELECT MAX(seq) FROM change_log WHERE table_name = ?', (table,)).fetchone()[0]
+        conn.close()
+        return seq or 0
+
+    def ack(self, sink, seq, table='futures_data'):
+        """
+        下游處理成功後推進游標（游標只會前進）
+
+        Args:
+            sink: 下游名稱
+            seq: 已處理到的異動序號
+            table: 資料表名稱
+        """
+        if seq is None:
+            return
+        get_writer(self.db_path).execute('''
+            INSERT INTO sync_cursors (sink, table_name, last_seq) VALUES (?, ?, ?)
+            ON CONFLICT(sink, table_name) DO UPDATE SET
+                last_seq = MAX(last_seq, excluded.last_seq),
+                updated_at = CURRENT_TIMESTAMP
+        ''', (sink, table, int(seq)))
+
+    def prune(self, retention_days=90):
+        """
+        刪除所有下游都已處理過的異動紀錄（各資料表分別以最慢的游標為準）
+
+        Args:
+            retention_days: 停用的下游（例如未設定Telegram）游標不會前進，超過此天數的紀錄仍會刪除，避免無限增長
+        """
+        conn = sqlite3.connect(self.db_path)
+        floors = conn.execute('SELECT table_name, MIN(last_seq) FROM sync_cursors GROUP BY table_name').fetchall()
+        conn.close()
+
+        writer = get_writer(self.db_path)
+        deleted = 0
+        for table, floor in floors:
+            deleted += writer.execute('DELETE FROM change_log WHERE table_name = ? AND seq <= ?', (table, floor))
+        expired = writer.execute("DELETE FROM change_log WHERE changed_at < datetime('now', ?)",
+                                 (f'-{int(retention_days)} days',))
+        if expired:
+            self.logger.warning(f"⚠️ {expired} 筆異動紀錄超過 {retention_days} 天仍有下游未處理，已刪除")
+        self.logger.info(f"🧹 已清理 {deleted + expired} 筆處理完畢的異動紀錄")
+        return deleted + expired
@@ -16,7 +16,7 @@ from pathlib import Path
 import logging
 import matplotlib as mpl
 import platform
-import json
+from schema_mapping import SHEETS_COLUMN_MAP, typed_frame
 
 # 根據作業系統設定中文字體
 if platform.system() == 'Windows':
@@ -79,9 +79,8 @@ class ChartGenerator:
             logger.error(f"資料缺少必要欄位: {required_columns}")
             return {}
         
-        # 轉換日期欄位
-        if '日期' in df.columns:
-            df['日期'] = pd.to_datetime(df['日期'])
+        # 統一型別（日期 datetime64、契約 category、數值 int64）
+        df = typed_frame(df)
         
         # 按契約分組
         contract_data = {}
@@ -106,6 +105,29 @@ class ChartGenerator:
         
         return contract_data
     
+    def prepare_data_from_cube(self, cube, days=30, contracts=None):
+        """
+        由時間序列資料方塊準備圖表數據（直接切片，不需篩選、分組、排序）
+        
+        Args:
+            cube: TimeSeriesCube
+            days: 要取的天數
+            contracts: 契約列表，None 表示方塊中的全部契約
+            
+        Returns:
+            dict: 按契約分組的數據，格式與 prepare_data 相同
+        """
+        start_date = datetime.now() - timedelta(days=days)
+        contract_data = {}
+        for contract in contracts if contracts is not None else cube.contracts:
+            if contract not in cube.contracts:
+                continue
+            daily_summary = cube.contract_totals(contract, ['多空淨額交易口數', '多空淨額未平倉口數'], start=start_date)
+            if not daily_summary.empty:
+                contract_data[contract] = daily_summary
+        
+        return contract_data
+    
     def create_dual_axis_chart(self, contract, data, save_path=None):
         """
         創建雙軸圖表
@@ -327,12 +349,13 @@ class ChartGenerator:
             plt.close()
             return None
     
-    def generate_all_charts(self, df):
+    def generate_all_charts(self, df, cube=None):
         """
         生成所有圖表
         
         Args:
             df: 包含期貨資料的DataFrame
+            cube: 時間序列資料方塊，提供時圖表數據直接由方塊切片取得（契約依 df 為準）
             
         Returns:
             list: 生成的圖表檔案路徑列表
@@ -340,7 +363,11 @@ class ChartGenerator:
         chart_paths = []
         
         # 準備數據
-        contract_data = self.prepare_data(df)
+        if cube is not None and cube.length:
+            contracts = df['契約名稱'].dropna().unique().tolist() if '契約名稱' in df.columns else None
+            contract_data = self.prepare_data_from_cube(cube, contracts=contracts)
+        else:
+            contract_data = self.prepare_data(df)
         
         if not contract_data:
             logger.warning("沒有有效數據可生成圖表")
@@ -409,6 +436,27 @@ class ChartGenerator:
         
         return summary
 
+    def load_data_from_database(self, db_manager, days=30, contracts=None):
+        """
+        從資料庫載入圖表所需的欄位
+
+        Args:
+            db_manager: 資料庫管理器
+            days: 要載入的天數
+            contracts: 契約列表，None 表示全部
+
+        Returns:
+            DataFrame: 與Google Sheets資料相同欄位名稱的DataFrame
+        """
+        start_date = datetime.now() - timedelta(days=days)
+        df = db_manager.query(
+            start=start_date,
+            contracts=contracts,
+            columns=['date', 'contract_code', 'identity_type', 'net_trade_volume', 'net_position_volume']
+        )
+
+        return df.rename(columns=SHEETS_COLUMN_MAP)
+
     def load_data_from_google_sheets(self, days=30):
         """
         從Google Sheets載入指定天數的歷史資料
@@ -421,6 +469,7 @@ class ChartGenerator:
         """
         try:
             from google_sheets_manager import GoogleSheetsManager
+            from sheets_archiver import SheetsArchiver
             
             # 初始化Google Sheets管理器
             sheets_manager = GoogleSheetsManager()
@@ -429,16 +478,9 @@ class ChartGenerator:
                 logger.warning("Google Sheets未啟用，無法載入歷史資料")
                 return pd.DataFrame()
             
-            # 嘗試載入現有試算表
-            config_file = Path("config/spreadsheet_config.json")
-            if config_file.exists():
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    spreadsheet_id = config.get('spreadsheet_id')
-                    
-                    if spreadsheet_id:
-                        sheets_manager.connect_spreadsheet(spreadsheet_id)
-                        logger.info("已連接到Google試算表")
+            # 連接設定檔中的試算表（同一程序內沿用已認證的客戶端與已開啟的試算表）
+            if sheets_manager.connect_configured_spreadsheet():
+                logger.info("已連接到Google試算表")
             
             if not sheets_manager.spreadsheet:
                 logger.warning("無法連接到Google試算表")
@@ -447,20 +489,19 @@ class ChartGenerator:
             # 優先嘗試從「完整資料」工作表讀取（最新資料）
             worksheet_names = ['完整資料', '歷史資料', '原始資料']
             
+            # 已結束的年度歸檔在「<工作表>_YYYY」，依分區清單只讀取涵蓋期間的分區
+            archiver = SheetsArchiver(sheets_manager)
+            
             for worksheet_name in worksheet_names:
                 try:
-                    worksheet = sheets_manager.spreadsheet.worksheet(worksheet_name)
-                    data = worksheet.get_all_records()
+                    df = archiver.frame(worksheet_name, start=datetime.now() - timedelta(days=days))
                     
-                    if not data:
+                    if df.empty:
                         logger.warning(f"工作表「{worksheet_name}」中沒有找到資料")
                         continue
                     
-                    df = pd.DataFrame(data)
-                    
                     # 資料清理和格式轉換
                     if '日期' in df.columns:
-                        df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
                         
                         # 過濾最近N天的資料
                         end_date = datetime.now()
@@ -489,11 +530,10 @@ class ChartGenerator:
                         
                     if '資料' in ws.title or 'data' in ws.title.lower():
                         try:
-                            data = ws.get_all_records()
+                            data = sheets_manager.mirror.get_all_records(ws.title)
                             if data:
-                                df = pd.DataFrame(data)
+                                df = typed_frame(pd.DataFrame(data))
                                 if '日期' in df.columns:
-                                    df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
                                     end_date = datetime.now()
                                     start_date = end_date - timedelta(days=days)
                                     df = df[(df['日期'] >= start_date) & (df['日期'] <= end_date)]
@@ -10,9 +10,8 @@ import sys
 import os
 import logging
 from datetime import datetime, timedelta
-import pandas as pd
-import sqlite3
 from database_manager import TaifexDatabaseManager
+from schema_mapping import db_to_sheets
 from google_sheets_manager import GoogleSheetsManager
 import subprocess
 
@@ -72,35 +71,19 @@ class MissingDataChecker:
         expected_trading_days = self.get_trading_days_in_range(start_date, end_date)
         logger.info(f"📅 期間內應有交易日: {len(expected_trading_days)}天")
         
-        # 查詢資料庫中現有的日期
-        conn = sqlite3.connect(self.db.db_path)
-        query = """
-        SELECT DISTINCT date 
-        FROM futures_data 
-        WHERE date >= ? AND date <= ?
-        """
-        
-        existing_dates_df = pd.read_sql_query(
-            query, 
-            conn, 
-            params=[
-                start_date.strftime('%Y/%m/%d'),
-                end_date.strftime('%Y/%m/%d')
-            ]
+        # 查詢資料庫中現有的日期（只取日期欄位）
+        existing_records = self.db.query(
+            start_date.strftime('%Y/%m/%d'),
+            end_date.strftime('%Y/%m/%d'),
+            columns=['date'],
+            as_='records'
         )
-        conn.close()
         
         # 轉換現有日期為datetime物件
         existing_dates = set()
-        for date_str in existing_dates_df['date']:
+        for date_str in {record['date'] for record in existing_records}:
             try:
-                # 處理不同的日期格式
-                if '/' in date_str:
-                    if len(date_str.split('/')[1]) == 1:  # 2025/6/5 格式
-                        date_obj = datetime.strptime(date_str, '%Y/%m/%d')
-                    else:  # 2025/06/05 格式
-                        date_obj = datetime.strptime(date_str, '%Y/%m/%d')
-                    existing_dates.add(date_obj.date())
+                existing_dates.add(datetime.strptime(date_str, '%Y/%m/%d').date())
             except ValueError as e:
                 logger.warning(f"無法解析日期格式: {date_str} - {e}")
         
@@ -214,25 +197,7 @@ class MissingDataChecker:
     
     def prepare_sheets_data(self, df):
         """準備Google Sheets格式的資料"""
-        # 轉換為Google Sheets需要的格式
-        sheets_data = []
-        
-        for _, row in df.iterrows():
-            sheets_row = {
-                '日期': row['date'],
-                '契約名稱': row['contract_code'],
-                '身份別': row['identity_type'],
-                '多方交易口數': row['long_position'] if row['position_type'] == '多方' else 0,
-                '空方交易口數': row['short_position'] if row['position_type'] == '空方' else 0,
-                '多方未平倉口數': row['long_position'] if row['position_type'] == '多方' else 0,
-                '空方未平倉口數': row['short_position'] if row['position_type'] == '空方' else 0,
-                '多空淨額交易口數': row['net_position'],
-                '多空淨額未平倉口數': row['net_position'],
-                '更新時間': datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            }
-            sheets_data.append(sheets_row)
-        
-        return pd.DataFrame(sheets_data)
+        return db_to_sheets(df)
     
     def run_complete_check(self, days=30):
         """執行完整的檢查和補齊流程"""
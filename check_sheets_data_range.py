@@ -26,7 +26,7 @@ def check_sheets_data():
         
         # 連接試算表
         sheets_manager = GoogleSheetsManager()
-        sheets_manager.connect_spreadsheet(config.get('spreadsheet_id'))
+        sheets_manager.connect_configured_spreadsheet(config_file)
         
         if not sheets_manager.spreadsheet:
             print('❌ 無法連接到試算表')
@@ -38,12 +38,12 @@ def check_sheets_data():
         
         for ws in worksheets:
             try:
-                data = ws.get_all_records()
-                if not data:
+                # 只需要主鍵欄位（日期/契約名稱/身份別）
+                df = sheets_manager.key_values(ws.title)
+                if df.empty:
                     print(f'  - 📄 {ws.title}: 無資料')
                     continue
                 
-                df = pd.DataFrame(data)
                 row_count = len(df)
                 
                 # 檢查日期欄位
@@ -88,11 +88,10 @@ def check_sheets_data():
         # 特別檢查「原始資料」工作表
         print('\n🔍 詳細檢查「原始資料」工作表:')
         try:
-            worksheet = sheets_manager.spreadsheet.worksheet("原始資料")
-            data = worksheet.get_all_records()
+            dates = sheets_manager.column_values("原始資料", '日期')
             
-            if data:
-                df = pd.DataFrame(data)
+            if dates:
+                df = pd.DataFrame({'日期': dates})
                 df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
                 
                 print(f'   總資料量: {len(df)} 筆')
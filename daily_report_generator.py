@@ -20,12 +20,25 @@ import matplotlib.font_manager as fm
 plt.rcParams['font.sans-serif'] = ['Microsoft JhengHei', 'Arial Unicode MS', 'SimHei']
 plt.rcParams['axes.unicode_minus'] = False
 
+# 報告使用的資料庫欄位
+REPORT_COLUMNS = [
+    'date', 'contract_code', 'identity_type',
+    'long_position_volume', 'short_position_volume', 'net_position_volume'
+]
+
 class DailyReportGenerator:
     """30天日報生成器"""
     
-    def __init__(self, db_manager=None):
-        """初始化日報生成器"""
+    def __init__(self, db_manager=None, rolling_store=None):
+        """
+        初始化日報生成器
+        
+        Args:
+            db_manager: 資料庫管理器
+            rolling_store: 滾動指標表（RollingMetricsStore），提供時直接讀取現成的移動平均
+        """
         self.db_manager = db_manager or TaifexDatabaseManager()
+        self.rolling_store = rolling_store
         self.logger = logging.getLogger(__name__)
         self.output_dir = Path("reports")
         self.output_dir.mkdir(exist_ok=True)
@@ -34,8 +47,11 @@ class DailyReportGenerator:
         """生成30天完整報告"""
         timestamp = datetime.now().strftime('%Y%m%d')
         
-        # 取得30天資料
-        data_30d = self.db_manager.get_recent_data(30)
+        # 取得30天資料（只取報告需要的欄位）
+        data_30d = self.db_manager.query(
+            start=datetime.now() - timedelta(days=30),
+            columns=REPORT_COLUMNS
+        )
         summary_30d = self.db_manager.get_daily_summary(30)
         
         if data_30d.empty:
@@ -73,8 +89,8 @@ class DailyReportGenerator:
     
     def generate_basic_info(self, data_30d, summary_30d):
         """生成基本資訊"""
-        latest_date = data_30d['date'].max() if not data_30d.empty else "無資料"
-        oldest_date = data_30d['date'].min() if not data_30d.empty else "無資料"
+        latest_date = data_30d['date'].max().strftime('%Y/%m/%d') if not data_30d.empty else "無資料"
+        oldest_date = data_30d['date'].min().strftime('%Y/%m/%d') if not data_30d.empty else "無資料"
         
         return {
             "報告生成時間": datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
@@ -91,17 +107,17 @@ class DailyReportGenerator:
             return {"錯誤": "無資料"}
         
         # 計算各法人平均淨部位
-        institutional_summary = data_30d.groupby('identity_type')['net_position'].agg([
+        institutional_summary = data_30d.groupby('identity_type', observed=True)['net_position_volume'].agg([
             'mean', 'sum', 'std', 'count'
         ]).round(2)
         
         # 最新一日的法人部位
         latest_date = data_30d['date'].max()
-        latest_positions = data_30d[data_30d['date'] == latest_date].groupby('identity_type')['net_position'].sum()
+        latest_positions = data_30d[data_30d['date'] == latest_date].groupby('identity_type', observed=True)['net_position_volume'].sum()
         
         # 計算變動趨勢（與7天前比較）
-        seven_days_ago = (datetime.strptime(latest_date, '%Y/%m/%d') - timedelta(days=7)).strftime('%Y/%m/%d')
-        past_positions = data_30d[data_30d['date'] == seven_days_ago].groupby('identity_type')['net_position'].sum()
+        seven_days_ago = latest_date - timedelta(days=7)
+        past_positions = data_30d[data_30d['date'] == seven_days_ago].groupby('identity_type', observed=True)['net_position_volume'].sum()
         
         trend_analysis = {}
         for identity in latest_positions.index:
@@ -127,15 +143,18 @@ class DailyReportGenerator:
             return {"錯誤": "無資料"}
         
         # 各契約的活躍度分析
-        contract_activity = data_30d.groupby('contract_code').agg({
-            'long_position': 'sum',
-            'short_position': 'sum',
-            'net_position': ['sum', 'std'],
+        contract_activity = data_30d.groupby('contract_code', observed=True).agg({
+            'long_position_volume': 'sum',
+            'short_position_volume': 'sum',
+            'net_position_volume': ['sum', 'std'],
             'date': 'nunique'
         }).round(2)
         
         # 計算各契約的總交易量
-        contract_activity['total_volume'] = contract_activity[('long_position', 'sum')] + contract_activity[('short_position', 'sum')]
+        contract_activity['total_volume'] = contract_activity[('long_position_volume', 'sum')] + contract_activity[('short_position_volume', 'sum')]
+        
+        # 攤平多層欄位名稱，方便輸出JSON
+        contract_activity.columns = ['_'.join(filter(None, col)) for col in contract_activity.columns]
         
         # 找出最活躍的契約
         most_active = contract_activity['total_volume'].idxmax() if not contract_activity.empty else "無"
@@ -143,7 +162,7 @@ class DailyReportGenerator:
         return {
             "契約活躍度統計": contract_activity.to_dict(),
             "最活躍契約": most_active,
-            "契約數量": len(data_30d['contract_code'].unique())
+            "契約數量": data_30d['contract_code'].nunique()
         }
     
     def generate_trend_analysis(self, summary_30d):
@@ -153,9 +172,16 @@ class DailyReportGenerator:
         
         # 計算移動平均
         summary_30d = summary_30d.sort_values('date')
-        summary_30d['外資_MA7'] = summary_30d['foreign_net'].rolling(7).mean()
-        summary_30d['自營商_MA7'] = summary_30d['dealer_net'].rolling(7).mean()
-        summary_30d['投信_MA7'] = summary_30d['trust_net'].rolling(7).mean()
+        ma_columns = (('外資', '外資_MA7', 'foreign_net'), ('自營商', '自營商_MA7', 'dealer_net'), ('投信', '投信_MA7', 'trust_net'))
+        if self.rolling_store is not None:
+            # 讀取滾動指標表，視窗未滿7日者為空值（與 rolling(7) 相同）
+            ma7 = self.rolling_store.get_wide(window=7, start=summary_30d['date'].min(), min_count=7)
+            dates = pd.to_datetime(summary_30d['date'], format='%Y/%m/%d', errors='coerce')
+            for identity, column, _ in ma_columns:
+                summary_30d[column] = dates.map(ma7[identity]).values if identity in ma7.columns else float('nan')
+        else:
+            for _, column, source in ma_columns:
+                summary_30d[column] = summary_30d[source].rolling(7).mean()
         
         # 趨勢判斷
         latest_trend = summary_30d.tail(1).iloc[0] if not summary_30d.empty else {}
@@ -228,10 +254,11 @@ class DailyReportGenerator:
             if not data_30d.empty:
                 pivot_table = pd.pivot_table(
                     data_30d, 
-                    values='net_position',
+                    values='net_position_volume',
                     index='date',
                     columns='identity_type',
-                    aggfunc='sum'
+                    aggfunc='sum',
+                    observed=True
                 )
                 pivot_table.to_excel(writer, sheet_name='三大法人透視表')
     
@@ -0,0 +1,395 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所資料品質檢查
+以規則表描述檢查項目，整批資料先轉為分組代碼，各規則以 np.bincount/累積和一次算完（不逐一契約×身份別篩選），
+結果彙整為結構化的問題清單，可用於每次寫入前的檢查，也可一次檢查資料庫全部歷史
+"""
+
+import time
+import logging
+import pandas as pd
+import numpy as np
+from datetime import timedelta
+from schema_mapping import KEY_COLUMNS, METRIC_COLUMNS, CSV_COLUMN_MAP, DEFAULT_IDENTITY, typed_frame
+
+# 三大法人身份別（與「總計」比對加總）
+INSTITUTIONS = ('自營商', '投信', '外資')
+
+# 多方 − 空方 = 淨額 的欄位組合與容許誤差（金額以千元為單位，四捨五入可能差1）
+NET_RULES = [
+    ('long_trade_volume', 'short_trade_volume', 'net_trade_volume', 0),
+    ('long_trade_amount', 'short_trade_amount', 'net_trade_amount', 1),
+    ('long_position_volume', 'short_position_volume', 'net_position_volume', 0),
+    ('long_position_amount', 'short_position_amount', 'net_position_amount', 1),
+]
+
+# 檢查異常值的指標（口數）
+OUTLIER_METRICS = [col for col in METRIC_COLUMNS if col.endswith('_volume')]
+
+# 規則：(代號, 嚴重程度, 說明, 明細訊息格式)
+RULES = [
+    ('duplicate_key', 'error', '同一日期/契約/身份別有多筆資料',
+     '{date} {contract_code} {identity_type} 有 {value} 筆資料'),
+    ('net_mismatch', 'error', '多方減空方不等於淨額',
+     '{date} {contract_code} {identity_type} {metric}={value}，多方−空方={expected}'),
+    ('identity_sum', 'error', '三大法人加總與總計不一致',
+     '{date} {contract_code} {metric} 總計={value}，三大法人加總={expected}'),
+    ('missing_identity', 'warning', '同一日期/契約的身份別不完整',
+     '{date} {contract_code} 只有 {value} 個法人身份別（應為 {expected} 個）'),
+    ('outlier', 'warning', '數值遠離近期歷史（可能是契約識別錯誤）',
+     '{date} {contract_code} {identity_type} {metric}={value}，近期平均 {expected}'),
+]
+RULE_SEVERITY = {rule: severity for rule, severity, _, _ in RULES}
+RULE_MESSAGES = {rule: message for rule, _, _, message in RULES}
+
+ISSUE_COLUMNS = ['rule', 'severity', 'date', 'contract_code', 'identity_type', 'metric', 'value', 'expected', 'message']
+
+
+def _group_codes(*columns):
+    """
+    多個欄位組合的分組代碼（取代 groupby，之後以 np.bincount 累加）
+
+    Returns:
+        tuple: (每列的分組代碼 0..n-1, 分組數 n)
+    """
+    codes = np.zeros(len(columns[0]), dtype=np.int64)
+    for column in columns:
+        values, uniques = pd.factorize(column)
+        codes, _ = pd.factorize(codes * (len(uniques) + 1) + values)
+    return codes.astype(np.int64), int(codes.max()) + 1 if len(codes) else 0
+
+
+def _first_rows(codes, groups):
+    """各分組第一列的位置（依分組代碼排列）"""
+    first = np.full(groups, len(codes), dtype=np.int64)
+    np.minimum.at(first, codes, np.arange(len(codes)))
+    return first
+
+
+class QualityReport:
+    """資料品質檢查結果"""
+
+    def __init__(self, issues, rows_checked, elapsed):
+        """
+        Args:
+            issues: 問題清單（ISSUE_COLUMNS 欄位的DataFrame）
+            rows_checked: 檢查的資料列數
+            elapsed: 檢查耗時（秒）
+        """
+        self.issues = issues
+        self.rows_checked = rows_checked
+        self.elapsed = elapsed
+
+    @property
+    def ok(self):
+        """沒有 error 等級的問題"""
+        return not (self.issues['severity'] == 'error').any()
+
+    def counts(self):
+        """各規則的問題數"""
+        return self.issues['rule'].value_counts().to_dict()
+
+    def by_rule(self, rule):
+        """指定規則的問題"""
+        return self.issues[self.issues['rule'] == rule]
+
+    def to_dict(self):
+        """
+        轉為可寫入JSON的字典
+
+        Returns:
+            dict: rows_checked、elapsed_ms、ok、counts、issues（日期為 'YYYY/MM/DD' 字串）
+        """
+        issues = self.issues.copy()
+        issues['date'] = issues['date'].dt.strftime('%Y/%m/%d')
+        issues = issues.astype(object).where(issues.notna(), None)
+        return {
+            'rows_checked': self.rows_checked,
+            'elapsed_ms': round(self.elapsed * 1000, 1),
+            'ok': self.ok,
+            'counts': self.counts(),
+            'issues': issues.to_dict('records'),
+        }
+
+    def log(self, logger=None, limit=5):
+        """
+        寫入日誌：每條規則的問題數與前幾筆明細
+
+        Args:
+            logger: 日誌物件，None 使用本模組的日誌
+            limit: 每條規則最多列出的明細數
+        """
+        logger = logger or logging.getLogger(__name__)
+        if self.issues.empty:
+            logger.info(f"✅ 資料品質檢查通過（{self.rows_checked} 筆，{self.elapsed * 1000:.1f} ms）")
+            return
+
+        logger.warning(f"⚠️ 資料品質檢查發現 {len(self.issues)} 個問題（{self.rows_checked} 筆，{self.elapsed * 1000:.1f} ms）")
+        for rule, severity, description, _ in RULES:
+            issues = self.by_rule(rule)
+            if issues.empty:
+                continue
+            log = logger.error if severity == 'error' else logger.warning
+            log(f"  {description}: {len(issues)} 個")
+            for message in issues['message'].head(limit):
+                log(f"    - {message}")
+
+
+class DataQualityChecker:
+    """規則式資料品質檢查"""
+
+    def __init__(self, db_manager=None, window=60, z_threshold=5.0, min_deviation=1000, min_history=10):
+        """
+        初始化檢查器
+
+        Args:
+            db_manager: TaifexDatabaseManager，提供異常值比對的歷史資料；None 只以輸入資料本身為歷史
+            window: 異常值比對的歷史交易日數
+            z_threshold: 與歷史平均相差超過幾個標準差視為異常
+            min_deviation: 與歷史平均的最小差距（口），小於此值不視為異常
+            min_history: 至少要有幾個歷史交易日才檢查異常值
+        """
+        self.db_manager = db_manager
+        self.window = window
+        self.z_threshold = z_threshold
+        self.min_deviation = min_deviation
+        self.min_history = min_history
+        self.logger = logging.getLogger(__name__)
+
+    @staticmethod
+    def _prepare(df):
+        """統一為資料庫欄位名稱與標準型別"""
+        frame = typed_frame(df.rename(columns=CSV_COLUMN_MAP))
+        if 'identity_type' not in frame.columns:
+            frame['identity_type'] = pd.Categorical([DEFAULT_IDENTITY] * len(frame))
+        columns = [col for col in KEY_COLUMNS + METRIC_COLUMNS if col in frame.columns]
+        return frame[columns]
+
+    def check(self, df):
+        """
+        檢查一批資料（中文欄位或資料庫欄位）
+
+        Args:
+            df: 要檢查的資料
+
+        Returns:
+            QualityReport: 檢查結果
+        """
+        started = time.perf_counter()
+        frame = self._prepare(df) if not df.empty else pd.DataFrame()
+
+        issues = []
+        if not frame.empty:
+            issues.extend(self._check_duplicates(frame))
+            issues.extend(self._check_net(frame))
+            issues.extend(self._check_identities(frame))
+            issues.extend(self._check_outliers(frame, self._load_history(frame)))
+        return QualityReport(self._report(issues), len(frame), time.perf_counter() - started)
+
+    def check_database(self, start=None, end=None, contracts=None):
+        """
+        檢查資料庫中的歷史資料（異常值以資料本身的前序交易日為基準）
+
+        Args:
+            start: 開始日期（含），None 表示不限
+            end: 結束日期（含），None 表示不限
+            contracts: 契約代碼列表，None 表示全部
+
+        Returns:
+            QualityReport: 檢查結果
+        """
+        if self.db_manager is None:
+            raise ValueError("check_database 需要 db_manager")
+        df = self.db_manager.query(start=start, end=end, contracts=contracts, columns=KEY_COLUMNS + METRIC_COLUMNS)
+        return self.check(df)
+
+    def _report(self, issues):
+        """合併各規則的問題並產生明細訊息（問題通常只有少數幾筆，訊息逐筆格式化）"""
+        if not issues:
+            report = pd.DataFrame({col: pd.Series(dtype=object) for col in ISSUE_COLUMNS})
+            report['date'] = report['date'].astype('datetime64[ns]')
+            return report
+
+        report = pd.concat(issues, ignore_index=True)
+        dates = report['date'].dt.strftime('%Y/%m/%d')
+        report['message'] = [
+            RULE_MESSAGES[row['rule']].format(**{**row, 'date': date})
+            + (f'（超過 {self.z_threshold:g} 個標準差）' if row['rule'] == 'outlier' else '')
+            for row, date in zip(report.to_dict('records'), dates)
+        ]
+        report = report[ISSUE_COLUMNS].sort_values(['date', 'rule', 'contract_code'], kind='stable', ignore_index=True)
+        return report
+
+    @staticmethod
+    def _issues(rule, frame, positions, metric, value, expected, identity=None):
+        """
+        組成問題清單
+
+        Args:
+            rule: 規則代號
+            frame: 資料（含主鍵欄位）
+            positions: 問題所在的資料列位置
+            metric: 指標欄位（None 表示整列）
+            value: 實際值
+            expected: 預期值
+            identity: 固定的身份別，None 使用資料列的身份別
+        """
+        return pd.DataFrame({
+            'rule': rule,
+            'severity': RULE_SEVERITY[rule],
+            'date': frame['date'].to_numpy()[positions],
+            'contract_code': frame['contract_code'].take(positions).astype(str).to_numpy(),
+            'identity_type': identity if identity is not None else frame['identity_type'].take(positions).astype(str).to_numpy(),
+            'metric': metric,
+            'value': value,
+            'expected': expected,
+        })
+
+    def _check_duplicates(self, frame):
+        """重複主鍵：以主鍵的分組代碼計數"""
+        codes, groups = _group_codes(frame['date'], frame['contract_code'], frame['identity_type'])
+        counts = np.bincount(codes, minlength=groups)
+        duplicated = counts > 1
+        if not duplicated.any():
+            return []
+        positions = _first_rows(codes, groups)[duplicated]
+        return [self._issues('duplicate_key', frame, positions, None, counts[duplicated], 1)]
+
+    def _check_net(self, frame):
+        """多方 − 空方 = 淨額：各欄位組整欄相減比對"""
+        issues = []
+        for long_col, short_col, net_col, tolerance in NET_RULES:
+            if not {long_col, short_col, net_col} <= set(frame.columns):
+                continue
+            net = frame[net_col].to_numpy()
+            expected = frame[long_col].to_numpy() - frame[short_col].to_numpy()
+            positions = np.flatnonzero(np.abs(net - expected) > tolerance)
+            if len(positions):
+                issues.append(self._issues('net_mismatch', frame, positions, net_col, net[positions], expected[positions]))
+        return issues
+
+    def _check_identities(self, frame):
+        """
+        身份別加總：以 (日期, 契約) 的分組代碼一次累加三大法人筆數、三大法人加總與總計
+
+        有「總計」列時比對三大法人加總；有部分法人資料時標記身份別不完整
+        """
+        codes, groups = _group_codes(frame['date'], frame['contract_code'])
+        identity = frame['identity_type'].astype(str)
+        is_institution = identity.isin(INSTITUTIONS).to_numpy()
+        is_total = (identity == DEFAULT_IDENTITY).to_numpy()
+
+        institutions = np.bincount(codes, weights=is_institution, minlength=groups).astype(np.int64)
+        totals = np.bincount(codes, weights=is_total, minlength=groups).astype(np.int64)
+        first = _first_rows(codes, groups)
+
+        issues = []
+        partial = (institutions > 0) & (institutions < len(INSTITUTIONS))
+        if partial.any():
+            issues.append(self._issues('missing_identity', frame, first[partial], None,
+                                       institutions[partial], len(INSTITUTIONS), identity=''))
+
+        comparable = (institutions == len(INSTITUTIONS)) & (totals == 1)
+        if not comparable.any():
+            return issues
+        for col in [col for col in METRIC_COLUMNS if col in frame.columns]:
+            values = frame[col].to_numpy(dtype=np.float64)
+            part = np.bincount(codes, weights=np.where(is_institution, values, 0), minlength=groups).astype(np.int64)
+            total = np.bincount(codes, weights=np.where(is_total, values, 0), minlength=groups).astype(np.int64)
+            tolerance = len(INSTITUTIONS) if col.endswith('_amount') else 0
+            mismatch = comparable & (np.abs(part - total) > tolerance)
+            if mismatch.any():
+                issues.append(self._issues('identity_sum', frame, first[mismatch], col,
+                                           total[mismatch], part[mismatch], identity=DEFAULT_IDENTITY))
+        return issues
+
+    def _load_history(self, frame):
+        """從資料庫讀取輸入資料最早日期之前的歷史（約 window 個交易日）"""
+        if self.db_manager is None:
+            return pd.DataFrame()
+        metrics = [col for col in OUTLIER_METRICS if col in frame.columns]
+        first = frame['date'].min()
+        # 交易日約為日曆日的七成，另留連假的餘裕
+        start = first - timedelta(days=int(self.window * 1.5) + 14)
+        end = first - timedelta(days=1)
+        try:
+            return self.db_manager.query(start=start, end=end,
+                                         contracts=frame['contract_code'].astype(str).unique().tolist(),
+                                         columns=KEY_COLUMNS + metrics)
+        except Exception as e:
+            self.logger.warning(f"讀取異常值比對歷史失敗，只使用輸入資料: {e}")
+            return pd.DataFrame()
+
+    def _check_outliers(self, frame, history):
+        """
+        異常值：歷史與輸入資料依序列、日期排序後，以累積和一次算出每個交易日之前 window 日的平均與標準差
+
+        Args:
+            frame: 要檢查的資料
+            history: 輸入資料之前的歷史資料（資料庫欄位）
+        """
+        metrics = [col for col in OUTLIER_METRICS if col in frame.columns]
+        if not metrics:
+            return []
+
+        target = frame[KEY_COLUMNS + metrics].drop_duplicates(KEY_COLUMNS, keep='last')
+        if not history.empty:
+            combined = pd.concat([history[KEY_COLUMNS + metrics], target], ignore_index=True)
+            checked = np.arange(len(combined)) >= len(history)
+        else:
+            combined = target.reset_index(drop=True)
+            checked = np.ones(len(combined), dtype=bool)
+
+        series, count = _group_codes(combined['contract_code'], combined['identity_type'])
+        order = np.lexsort((combined['date'].to_numpy(), series))
+        combined = combined.iloc[order].reset_index(drop=True)
+        series = series[order]
+        checked = checked[order]
+
+        # 每列在所屬序列中的位置，視窗為之前的 min(位置, window) 個交易日
+        rows = len(combined)
+        starts = np.flatnonzero(np.r_[True, series[1:] != series[:-1]])
+        position = np.arange(rows) - np.repeat(starts, np.diff(np.r_[starts, rows]))
+        span = np.minimum(position, self.window)
+        index = np.arange(rows)
+        enough = span >= self.min_history
+
+        issues = []
+        for col in metrics:
+            value = combined[col].to_numpy(dtype=np.float64)
+            # 先減去序列平均，累積平方和不會因數值過大而失準（標準差不受平移影響）
+            center = (np.bincount(series, weights=value, minlength=count) / np.bincount(series, minlength=count))[series]
+            centered = value - center
+            cumsum = np.r_[0.0, np.cumsum(centered)]
+            cumsq = np.r_[0.0, np.cumsum(centered * centered)]
+            total = cumsum[index] - cumsum[index - span]
+            total_sq = cumsq[index] - cumsq[index - span]
+            with np.errstate(divide='ignore', invalid='ignore'):
+                mean = total / span
+                std = np.sqrt(np.maximum(total_sq - total * total / span, 0) / (span - 1))
+                deviation = np.abs(centered - mean)
+                z = deviation / std
+            positions = np.flatnonzero(checked & enough & (deviation > self.min_deviation) & (z > self.z_threshold))
+            if len(positions):
+                expected = (mean + center)[positions].round().astype(np.int64)
+                issues.append(self._issues('outlier', combined, positions, col,
+                                           value[positions].astype(np.int64), expected))
+        return issues
+
+
+def main():
+    """檢查資料庫全部歷史資料的品質"""
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    from database_manager import TaifexDatabaseManager
+
+    print("🔍 台期所資料品質檢查")
+    checker = DataQualityChecker(TaifexDatabaseManager())
+    report = checker.check_database()
+    report.log()
+    print(f"📊 檢查 {report.rows_checked} 筆，問題數: {report.counts() or 0}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所資料庫單一寫入器
+所有寫入先排入佇列，由背景執行緒批次合併成一次交易提交（group commit），
+跨程序則以鎖定檔確保同一時間只有一個程序寫入資料庫
+"""
+
+import sqlite3
+import threading
+import queue
+import time
+import os
+import atexit
+import weakref
+import logging
+from pathlib import Path
+from concurrent.futures import Future
+
+if os.name == 'nt':
+    import msvcrt
+else:
+    import fcntl
+
+logger = logging.getLogger(__name__)
+
+# 每個資料庫路徑在同一程序內只會有一個寫入器
+_writers = {}
+_writers_lock = threading.Lock()
+
+
+class InterProcessLock:
+    """以鎖定檔實作的跨程序互斥鎖"""
+
+    def __init__(self, lock_path, timeout=60, poll_interval=0.05):
+        """
+        初始化跨程序鎖
+
+        Args:
+            lock_path: 鎖定檔路徑
+            timeout: 等待鎖的最長秒數
+            poll_interval: 重新嘗試取得鎖的間隔秒數
+        """
+        self.lock_path = Path(lock_path)
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def acquire(self):
+        """取得鎖，逾時則拋出 TimeoutError"""
+        self.lock_path.parent.mkdir(parents=True, exist_ok=True)
+        self._file = open(self.lock_path, 'a+')
+        deadline = time.monotonic() + self.timeout
+
+        while True:
+            try:
+                if os.name == 'nt':
+                    self._file.seek(0)
+                    msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return True
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    raise TimeoutError(f"等待資料庫寫入鎖逾時: {self.lock_path}")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        """釋放鎖"""
+        if self._file is None:
+            return
+        try:
+            if os.name == 'nt':
+                self._file.seek(0)
+                msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+        finally:
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.release()
+
+
+class DatabaseWriter:
+    """背景單一寫入器：排隊、批次提交、非同步回報結果"""
+
+    def __init__(self, db_path, batch_size=200, max_wait=0.02, lock_timeout=60):
+        """
+        初始化寫入器
+
+        Args:
+            db_path: SQLite資料庫路徑
+            batch_size: 每次提交最多合併的寫入工作數
+            max_wait: 收集同一批工作時最多等待的秒數
+            lock_timeout: 等待跨程序寫入鎖的最長秒數
+        """
+        self.db_path = Path(db_path)
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.process_lock = InterProcessLock(str(self.db_path) + '.lock', timeout=lock_timeout)
+        self._queue = queue.Queue()
+        self._commit_listeners = []
+        self._thread = None
+        self._start_lock = threading.Lock()
+        self._closed = False
+        self.stats = {'jobs': 0, 'commits': 0, 'failed_jobs': 0}
+
+    def start(self):
+        """啟動背景寫入執行緒"""
+        with self._start_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._closed = False
+                self._thread = threading.Thread(
+                    target=self._run, name=f"db-writer-{self.db_path.name}", daemon=True
+                )
+                self._thread.start()
+
+    def add_commit_listener(self, callback):
+        """
+        註冊每次提交成功後呼叫的函數
+
+        Args:
+            callback: 無參數函數；傳入 weakref.WeakMethod 時不會延長物件的生命週期，物件回收後自動移除
+        """
+        if callback not in self._commit_listeners:
+            self._commit_listeners.append(callback)
+
+    def submit(self, sql, params=(), many=False):
+        """
+        排入單一SQL寫入
+
+        Args:
+            sql: SQL敘述
+            params: 參數（many=True 時為參數列表）
+            many: 是否使用 executemany
+
+        Returns:
+            Future: 完成後結果為受影響的筆數
+        """
+        return self.submit_statements([(sql, params, many)])
+
+    def submit_statements(self, statements):
+        """
+        排入一組需要同時成功的SQL寫入
+
+        Args:
+            statements: [(sql, params, many), ...]，也可以放入 callable(conn)，
+                        在同一交易中執行並回傳受影響的筆數
+
+        Returns:
+            Future: 完成後結果為受影響的總筆數
+        """
+        if self._closed:
+            raise RuntimeError("資料庫寫入器已關閉")
+        self.start()
+        future = Future()
+        self._queue.put((list(statements), future))
+        return future
+
+    def execute(self, sql, params=(), many=False, timeout=None):
+        """排入寫入並等待完成，回傳受影響的筆數"""
+        return self.submit(sql, params, many).result(timeout)
+
+    def flush(self, timeout=None):
+        """等待目前佇列中的所有寫入完成"""
+        self.submit_statements([]).result(timeout)
+
+    def close(self, timeout=None):
+        """寫完佇列中剩餘的工作後停止背景執行緒"""
+        if self._thread is None or self._closed:
+            self._closed = True
+            return
+        self._closed = True
+        self._queue.put(None)
+        self._thread.join(timeout)
+
+    def _collect_batch(self):
+        """取出一批待寫入的工作，回傳 (工作列表, 是否收到停止訊號)"""
+        first = self._queue.get()
+        if first is None:
+            return [], True
+
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self._queue.get(timeout=max(remaining, 0)) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                return batch, True
+            batch.append(job)
+        return batch, False
+
+    def _connect(self):
+        """建立寫入專用連線（WAL模式讓讀取不會被寫入阻擋）"""
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _run(self):
+        """背景執行緒主迴圈"""
+        conn = self._connect()
+        try:
+            while True:
+                batch, stop = self._collect_batch()
+                if batch:
+                    self._commit_batch(conn, batch)
+                if stop:
+                    break
+        finally:
+            conn.close()
+
+    def _commit_batch(self, conn, batch):
+        """在單一交易中執行一批工作，個別工作失敗只回滾該工作"""
+        results = []
+        try:
+            with self.process_lock:
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    for statements, future in batch:
+                        conn.execute('SAVEPOINT job')
+                        try:
+                            affected = 0
+                            for item in statements:
+                                if callable(item):
+                                    affected += item(conn) or 0
+                                    continue
+                                sql, params, many = item
+                                if many:
+                                    cursor = conn.executemany(sql, params)
+                                else:
+                                    cursor = conn.execute(sql, params)
+                                affected += max(cursor.rowcount, 0)
+                            conn.execute('RELEASE job')
+                            results.append((future, affected, None))
+                        except Exception as e:
+                            conn.execute('ROLLBACK TO job')
+                            conn.execute('RELEASE job')
+                            results.append((future, None, e))
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+        except Exception as e:
+            logger.error(f"資料庫批次寫入失敗: {e}")
+            for _, future in batch:
+                future.set_exception(e)
+            self.stats['failed_jobs'] += len(batch)
+            return
+
+        self.stats['commits'] += 1
+        self.stats['jobs'] += len(batch)
+        for callback in list(self._commit_listeners):
+            if isinstance(callback, weakref.WeakMethod):
+                method = callback()
+                if method is None:
+                    self._commit_listeners.remove(callback)
+                    continue
+                callback = method
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"提交通知處理失敗: {e}")
+
+        for future, affected, error in results:
+            if error is not None:
+                self.stats['failed_jobs'] += 1
+                future.set_exception(error)
+            else:
+                future.set_result(affected)
+
+
+def get_writer(db_path):
+    """取得（必要時建立）指定資料庫的共用寫入器"""
+    key = str(Path(db_path).resolve())
+    with _writers_lock:
+        writer = _writers.get(key)
+        if writer is None or writer._closed:
+            writer = DatabaseWriter(db_path)
+            _writers[key] = writer
+        return writer
+
+
+@atexit.register
+def close_all_writers():
+    """程式結束前寫完所有佇列中的資料"""
+    with _writers_lock:
+        writers = list(_writers.values())
+    for writer in writers:
+        writer.close(timeout=30)
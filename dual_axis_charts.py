@@ -13,6 +13,7 @@ import matplotlib.dates as mdates
 import logging
 import os
 from datetime import datetime, timedelta
+from schema_mapping import typed_frame
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -30,7 +31,7 @@ def load_latest_data_with_june3():
         logger.info("🔍 載入最新Google Sheets資料（包含6/3）...")
         
         gm = GoogleSheetsManager()
-        spreadsheet = gm.client.open('台期所資料分析')
+        gm.spreadsheet = gm.client.open('台期所資料分析')
         
         # 檢查多個可能的工作表
         worksheets_to_check = ['歷史資料', 'Sheet1', '最新30天資料']
@@ -40,8 +41,7 @@ def load_latest_data_with_june3():
         for ws_name in worksheets_to_check:
             try:
                 logger.info(f"📖 檢查工作表: {ws_name}")
-                ws = spreadsheet.worksheet(ws_name)
-                values = ws.get_all_values()
+                values = gm.mirror.get_all_values(ws_name)
                 
                 if len(values) < 2:
                     continue
@@ -53,9 +53,8 @@ def load_latest_data_with_june3():
                 df_temp = df_temp[df_temp['日期'].str.strip() != '']
                 
                 if len(df_temp) > 0:
-                    # 嘗試轉換日期
-                    df_temp['日期'] = pd.to_datetime(df_temp['日期'], format='%Y/%m/%d', errors='coerce')
-                    df_temp = df_temp.dropna(subset=['日期'])
+                    # 統一型別（無法解析的日期會被移除）
+                    df_temp = typed_frame(df_temp)
                     
                     if len(df_temp) > 0:
                         logger.info(f"✅ 從 {ws_name} 載入 {len(df_temp)} 筆資料")
@@ -70,15 +69,10 @@ def load_latest_data_with_june3():
             logger.error("❌ 無法從任何工作表載入資料")
             return pd.DataFrame()
         
-        # 合併所有資料並去重
-        df = pd.concat(all_data, ignore_index=True)
+        # 合併所有資料並去重（各工作表的 category 不同，合併後重新型別化）
+        df = typed_frame(pd.concat(all_data, ignore_index=True))
         df = df.drop_duplicates(subset=['日期', '契約名稱', '身份別'])
         
-        # 轉換數值欄位
-        numeric_cols = ['多空淨額交易口數', '多空淨額未平倉口數']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-        
         logger.info(f"📊 總共合併 {len(df)} 筆唯一資料")
         logger.info(f"📅 最終日期範圍: {df['日期'].min()} 到 {df['日期'].max()}")
         
@@ -131,7 +125,7 @@ def generate_dual_axis_charts(df, output_dir="dual_axis_charts", aggregate_ident
         # 處理資料
         if aggregate_identities:
             logger.info("📊 加總三大法人資料...")
-            df_processed = df.groupby(['日期', '契約名稱']).agg({
+            df_processed = df.groupby(['日期', '契約名稱'], observed=True).agg({
                 '多空淨額交易口數': 'sum',
                 '多空淨額未平倉口數': 'sum'
             }).reset_index()
@@ -224,7 +218,7 @@ def generate_report_summary(df, is_aggregated=True):
         
         # 如果是加總模式，先處理資料
         if is_aggregated:
-            df_summary = df.groupby(['日期', '契約名稱']).agg({
+            df_summary = df.groupby(['日期', '契約名稱'], observed=True).agg({
                 '多空淨額交易口數': 'sum',
                 '多空淨額未平倉口數': 'sum'
             }).reset_index()
@@ -6,7 +6,9 @@
 """
 
 from database_manager import TaifexDatabaseManager
+from schema_mapping import db_to_sheets
 from google_sheets_manager import GoogleSheetsManager
+from backup_manager import BackupManager
 import json
 import pandas as pd
 import sqlite3
@@ -32,6 +34,7 @@ def main():
     """
     
     duplicates = pd.read_sql_query(query, conn)
+    conn.close()
     if not duplicates.empty:
         print(f"❌ 發現 {len(duplicates)} 組重複資料:")
         for _, row in duplicates.head(10).iterrows():
@@ -41,16 +44,12 @@ def main():
     
     # 2. 檢查最新的正確資料
     print("\n📊 檢查最新的正確資料...")
-    query = """
-    SELECT DISTINCT date, contract_code, identity_type, 
-           long_position, short_position, net_position
-    FROM futures_data 
-    WHERE date >= '2025/06/02'
-    ORDER BY date DESC, contract_code, identity_type
-    """
-    
-    recent_data = pd.read_sql_query(query, conn)
-    conn.close()
+    recent_columns = ['date', 'contract_code', 'identity_type',
+                      'long_position_volume', 'short_position_volume', 'net_position_volume']
+    recent_data = pd.DataFrame(
+        db_manager.query(start='2025/06/02', columns=recent_columns, as_='records'),
+        columns=recent_columns
+    )
     
     print(f"📈 最近資料: {len(recent_data)} 筆")
     
@@ -60,7 +59,7 @@ def main():
             date_data = recent_data[recent_data['date'] == date]
             print(f"\n📅 {date}: {len(date_data)} 筆資料")
             for _, row in date_data.iterrows():
-                print(f"   - {row['contract_code']} {row['identity_type']}: 多{row['long_position']}, 空{row['short_position']}, 淨{row['net_position']}")
+                print(f"   - {row['contract_code']} {row['identity_type']}: 多{row['long_position_volume']}, 空{row['short_position_volume']}, 淨{row['net_position_volume']}")
     
     # 3. 檢查是否有完整的6/2-6/6資料
     print("\n🔍 檢查6/2-6/6完整資料...")
@@ -80,15 +79,13 @@ def main():
     print(f"   1. 清除資料庫重複資料")
     print(f"   2. 重新從台期所爬取6/2-6/6資料") 
     print(f"   3. 只清理Google Sheets重複上傳")
+    print(f"   4. 從資料庫備份還原（基底備份＋增量）")
     
-    user_choice = input("\n請選擇修復方案 (1/2/3): ").strip()
+    user_choice = input("\n請選擇修復方案 (1/2/3/4): ").strip()
     
     if user_choice == "1":
         print("\n🧹 開始清除資料庫重複資料...")
-        # 保留最新的記錄，刪除較舊的重複項
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-        
+        # 保留最新的記錄，刪除較舊的重複項（經由共用寫入器，避免與爬蟲同時寫入）
         cleanup_query = """
         DELETE FROM futures_data 
         WHERE id NOT IN (
@@ -99,15 +96,13 @@ def main():
         """
         
         try:
-            cursor.execute(cleanup_query)
-            deleted_count = cursor.rowcount
-            conn.commit()
+            # 刪除無法由增量備份還原，先建立一份完整的線上備份
+            backup_path = BackupManager(db_path).create_base_backup()
+            print(f"💾 已建立刪除前備份: {backup_path}")
+            deleted_count = db_manager.writer.execute(cleanup_query)
             print(f"✅ 資料庫重複資料清除完成，刪除了 {deleted_count} 筆重複資料")
         except Exception as e:
             print(f"❌ 清除失敗: {e}")
-            conn.rollback()
-        finally:
-            conn.close()
     
     elif user_choice == "2":
         print("\n🕷️ 重新爬取6/2-6/6資料...")
@@ -150,29 +145,7 @@ def main():
                 if not recent_data.empty:
                     print("📤 重新上傳正確資料...")
                     # 轉換為Google Sheets格式
-                    sheets_data = []
-                    for _, row in recent_data.iterrows():
-                        sheets_row = {
-                            '日期': row['date'],
-                            '契約名稱': row['contract_code'],
-                            '身份別': row['identity_type'],
-                            '多方交易口數': 0,
-                            '多方契約金額': 0,
-                            '空方交易口數': 0,
-                            '空方契約金額': 0,
-                            '多空淨額交易口數': 0,
-                            '多空淨額契約金額': 0,
-                            '多方未平倉口數': row['long_position'],
-                            '多方未平倉契約金額': 0,
-                            '空方未平倉口數': row['short_position'],
-                            '空方未平倉契約金額': 0,
-                            '多空淨額未平倉口數': row['net_position'],
-                            '多空淨額未平倉契約金額': 0,
-                            '更新時間': '',
-                        }
-                        sheets_data.append(sheets_row)
-                    
-                    df = pd.DataFrame(sheets_data)
+                    df = db_to_sheets(recent_data)
                     success = sheets_manager.upload_data(df, worksheet_name="歷史資料")
                     if success:
                         print("✅ 正確資料已重新上傳")
@@ -181,6 +154,25 @@ def main():
                         
             except Exception as e:
                 print(f"❌ Google Sheets 清理失敗: {e}")
+    
+    elif user_choice == "4":
+        print("\n💾 從資料庫備份還原...")
+        backup_manager = BackupManager(db_path)
+        chain = backup_manager.restore_chain()
+        if not chain:
+            print("❌ 找不到可用的基底備份")
+            return
+        
+        print(f"   基底備份: {chain[0]['file']} ({chain[0]['created_at']})")
+        print(f"   增量備份: {len(chain) - 1} 個")
+        if input("確定要以備份覆寫目前的資料庫？(y/N): ").strip().lower() == 'y':
+            try:
+                db_manager.writer.flush()
+                backup_manager.restore()
+                db_manager.invalidate_cache()
+                print("✅ 資料庫已從備份還原（還原前的狀態另存為新的基底備份）")
+            except Exception as e:
+                print(f"❌ 還原失敗: {e}")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
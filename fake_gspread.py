@@ -0,0 +1,510 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+離線的 gspread 替身
+以記憶體實作本專案用到的 gspread 客戶端/試算表/工作表介面，記錄每種呼叫的次數與讀寫儲存格數，
+可模擬網路延遲與配額錯誤（429/5xx），不需要Google認證就能測試與量測Sheets上傳流程
+
+    clock = VirtualClock()
+    client = FakeClient(latency=0.2, sleep=clock.sleep)
+    manager = GoogleSheetsManager(client=client, quota_gate=QuotaGate(clock=clock, sleep=clock.sleep))
+    manager.create_spreadsheet()
+"""
+
+import copy
+import random
+import re
+import time
+import uuid
+import threading
+from collections import Counter
+from datetime import datetime, timedelta
+from sheets_batch import column_index, grid_range
+from sheets_mirror import column_letter, numericise_value
+from google_sheets_manager import WorksheetNotFound
+
+try:
+    from gspread.exceptions import APIError, SpreadsheetNotFound
+except ImportError:
+    class APIError(Exception):
+        """API 錯誤（與 gspread.exceptions.APIError 相同，帶有 response）"""
+
+        def __init__(self, response):
+            super().__init__(response.json()['error'])
+            self.response = response
+
+    class SpreadsheetNotFound(Exception):
+        """找不到試算表"""
+
+SHEETS_ENDPOINT = "https://sheets.googleapis.com/v4/spreadsheets"
+DRIVE_ENDPOINT = "https://www.googleapis.com/drive/v3/files"
+
+ERROR_STATUS = {
+    400: 'INVALID_ARGUMENT',
+    429: 'RESOURCE_EXHAUSTED',
+    500: 'INTERNAL',
+    503: 'UNAVAILABLE',
+}
+
+
+class VirtualClock:
+    """模擬時鐘：sleep() 只推進時間不實際等待，可同時給 FakeClient 與 QuotaGate 使用"""
+
+    def __init__(self, start=0.0):
+        self.now = start
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += max(seconds, 0)
+
+
+class FakeResponse:
+    """模擬的錯誤回應（提供 status_code、headers、json()）"""
+
+    def __init__(self, status_code, message="", headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.message = message or ERROR_STATUS.get(status_code, 'ERROR')
+
+    def json(self):
+        return {'error': {'code': self.status_code, 'message': self.message,
+                          'status': ERROR_STATUS.get(self.status_code, 'UNKNOWN')}}
+
+
+def _display(value):
+    """儲存的值轉為 get_all_values() 看到的字串"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _trim(rows):
+    """去掉尾端的空白儲存格與空白列（與 Sheets API 回傳的格式相同）"""
+    rows = [list(row) for row in rows]
+    for row in rows:
+        while row and row[-1] == '':
+            row.pop()
+    while rows and not rows[-1]:
+        rows.pop()
+    return rows
+
+
+def _cell_count(result):
+    """讀取結果的儲存格數（batch_get 的結果為多個範圍的列表）"""
+    if not isinstance(result, list):
+        return 0
+    return sum(_cell_count(item) if item and isinstance(item, list) and isinstance(item[0], list)
+               else len(item) if isinstance(item, (list, dict)) else 1 for item in result)
+
+
+class FakeHTTPClient:
+    """
+    模擬 gspread 的 HTTP 層：每個 API 呼叫都經過 request()，QuotaGate 可以照常安裝在這裡
+
+    Attributes:
+        calls: 各操作的呼叫次數（如 'values_batch_update'、'get_all_values'）
+        cells: 讀取（'read'）與寫入（'written'）的儲存格數
+        errors: 注入的錯誤次數（依狀態碼）
+    """
+
+    def __init__(self, latency=0.0, error_rate=0.0, error_every=None, error_status=429, seed=None, sleep=time.sleep):
+        """
+        Args:
+            latency: 每次請求的模擬延遲秒數
+            error_rate: 每次請求隨機失敗的機率
+            error_every: 每N次請求固定失敗一次
+            error_status: 注入錯誤的HTTP狀態碼
+            seed: 隨機種子
+        """
+        self.latency = latency
+        self.error_rate = error_rate
+        self.error_every = error_every
+        self.error_status = error_status
+        self.sleep = sleep
+        self.random = random.Random(seed)
+
+        self.requests = 0
+        self.calls = Counter()
+        self.cells = Counter()
+        self.errors = Counter()
+        self.elapsed = 0.0
+        self._fail_next = []
+        # 延遲各請求獨立計算（可同時進行），實際的讀寫依序執行（與伺服器端相同）
+        self._lock = threading.RLock()
+
+    def fail_next(self, status=429, count=1, retry_after=None):
+        """接下來的 count 次請求回傳指定錯誤"""
+        headers = {'Retry-After': str(retry_after)} if retry_after is not None else None
+        self._fail_next.extend([(status, headers)] * count)
+
+    def _injected_error(self):
+        if self._fail_next:
+            return self._fail_next.pop(0)
+        if self.error_every and self.requests % self.error_every == 0:
+            return self.error_status, None
+        if self.error_rate and self.random.random() < self.error_rate:
+            return self.error_status, None
+        return None
+
+    def request(self, method, endpoint, params=None, operation=None, name=None, written=0):
+        """
+        執行一次模擬的API請求
+
+        Args:
+            method: HTTP 方法
+            endpoint: 請求網址（QuotaGate 以此判斷配額類別）
+            params: 請求參數（僅供合併相同請求時比對）
+            operation: 實際執行的函數
+            name: 操作名稱（統計用）
+            written: 寫入的儲存格數
+        """
+        if self.latency:
+            self.sleep(self.latency)
+
+        with self._lock:
+            self.requests += 1
+            self.elapsed += self.latency
+            error = self._injected_error()
+            if error is not None:
+                status, headers = error
+                self.errors[status] += 1
+                raise APIError(FakeResponse(status, headers=headers))
+
+            result = operation()
+            self.calls[name] += 1
+            if method == 'GET':
+                self.cells['read'] += _cell_count(result)
+            self.cells['written'] += written
+            return result
+
+    def summary(self):
+        """統計摘要"""
+        return {
+            'requests': self.requests,
+            'calls': dict(self.calls),
+            'cells_read': self.cells['read'],
+            'cells_written': self.cells['written'],
+            'errors': dict(self.errors),
+            'simulated_latency': round(self.elapsed, 3),
+        }
+
+
+class FakeWorksheet:
+    """記憶體中的工作表"""
+
+    def __init__(self, spreadsheet, sheet_id, title, rows=1000, cols=26):
+        self.spreadsheet = spreadsheet
+        self.id = sheet_id
+        self.title = title
+        self.row_count = rows
+        self.col_count = cols
+        self.cells = []
+        self.formats = []
+
+    def _api(self, method, name, operation, written=0, params=None):
+        endpoint = f"{SHEETS_ENDPOINT}/{self.spreadsheet.id}/values/{self.title}"
+        return self.spreadsheet.client.http_client.request(method, endpoint, params=params, operation=operation,
+                                                           name=name, written=written)
+
+    # ---- 格線操作（不經過API，供批次請求與各方法共用） ----
+
+    def _used_rows(self):
+        rows = len(self.cells)
+        while rows and not any(value not in (None, '') for value in self.cells[rows - 1]):
+            rows -= 1
+        return rows
+
+    def _values(self, first_row=1, last_row=None, first_col=1, last_col=None):
+        last_row = min(last_row or self.row_count, self._used_rows())
+        rows = []
+        for row in self.cells[first_row - 1:last_row]:
+            row = [_display(value) for value in row[first_col - 1:last_col]]
+            rows.append(row)
+        return _trim(rows)
+
+    def _write(self, first_row, first_col, rows):
+        last_row = first_row + len(rows) - 1
+        last_col = first_col + max((len(row) for row in rows), default=0) - 1
+        if last_row > self.row_count or last_col > self.col_count:
+            raise APIError(FakeResponse(400, f"Range ({self.title}!{column_letter(last_col)}{last_row}) exceeds grid limits. "
+                                             f"Max rows: {self.row_count}, max columns: {self.col_count}"))
+        while len(self.cells) < last_row:
+            self.cells.append([])
+        for offset, row in enumerate(rows):
+            target = self.cells[first_row - 1 + offset]
+            while len(target) < first_col - 1 + len(row):
+                target.append('')
+            target[first_col - 1:first_col - 1 + len(row)] = list(row)
+        self.spreadsheet._touch()
+        return sum(len(row) for row in rows)
+
+    def _append(self, rows):
+        start = self._used_rows() + 1
+        needed = start + len(rows) - 1
+        self.row_count = max(self.row_count, needed)
+        self.col_count = max(self.col_count, max((len(row) for row in rows), default=0))
+        del self.cells[start - 1:]
+        return self._write(start, 1, rows)
+
+    def _clear(self, grid):
+        first_row = grid.get('startRowIndex', 0)
+        last_row = grid.get('endRowIndex', len(self.cells))
+        first_col = grid.get('startColumnIndex', 0)
+        last_col = grid.get('endColumnIndex')
+        for row in self.cells[first_row:last_row]:
+            end = len(row) if last_col is None else min(last_col, len(row))
+            for i in range(first_col, end):
+                row[i] = ''
+        self.spreadsheet._touch()
+
+    def _delete_rows(self, start_index, end_index):
+        del self.cells[start_index:end_index]
+        self.row_count -= end_index - start_index
+        self.spreadsheet._touch()
+
+    def _parse_range(self, a1_range):
+        grid = grid_range(self.id, a1_range)
+        return (grid.get('startRowIndex', 0) + 1, grid.get('endRowIndex'),
+                grid.get('startColumnIndex', 0) + 1, grid.get('endColumnIndex'))
+
+    # ---- gspread 介面 ----
+
+    def get_all_values(self):
+        def operation():
+            rows = self._values()
+            width = max((len(row) for row in rows), default=0)
+            return [row + [''] * (width - len(row)) for row in rows]
+        return self._api('GET', 'get_all_values', operation)
+
+    def get_all_records(self, numericise_ignore=None):
+        def operation():
+            rows = self._values()
+            if len(rows) < 2:
+                return []
+            headers = rows[0]
+            return [{header: numericise_value(row[i]) if i < len(row) else ''
+                     for i, header in enumerate(headers)} for row in rows[1:]]
+        return self._api('GET', 'get_all_records', operation)
+
+    def get(self, range_name=None):
+        first_row, last_row, first_col, last_col = self._parse_range(range_name)
+        return self._api('GET', 'get', lambda: self._values(first_row, last_row, first_col, last_col),
+                         params={'range': range_name})
+
+    def batch_get(self, ranges, **kwargs):
+        def operation():
+            return [self._values(*self._parse_range(a1_range)) for a1_range in ranges]
+        return self._api('GET', 'batch_get', operation, params={'ranges': list(ranges)})
+
+    def col_values(self, col):
+        def operation():
+            values = [row[0] if row else '' for row in self._values(first_col=col, last_col=col)]
+            while values and values[-1] == '':
+                values.pop()
+            return values
+        return self._api('GET', 'col_values', operation, params={'col': col})
+
+    def row_values(self, row):
+        def operation():
+            values = self._values(first_row=row, last_row=row)
+            return values[0] if values else []
+        return self._api('GET', 'row_values', operation, params={'row': row})
+
+    def append_row(self, values, value_input_option='RAW'):
+        return self.append_rows([values], value_input_option)
+
+    def append_rows(self, values, value_input_option='RAW'):
+        return self._api('POST', 'append_rows', lambda: self._append(values),
+                         written=sum(len(row) for row in values))
+
+    def update(self, range_name=None, values=None, **kwargs):
+        # 舊版 update('A1', rows) 與 gspread 6 的 update(rows, 'A1') 都接受
+        if not isinstance(range_name, str):
+            range_name, values = values, range_name
+        first_row, _, first_col, _ = self._parse_range(range_name or 'A1')
+        return self._api('PUT', 'update', lambda: self._write(first_row, first_col, values),
+                         written=sum(len(row) for row in values))
+
+    def batch_clear(self, ranges):
+        def operation():
+            for a1_range in ranges:
+                self._clear(grid_range(self.id, a1_range))
+        return self._api('POST', 'batch_clear', operation)
+
+    def clear(self):
+        return self._api('POST', 'clear', lambda: self._clear({}))
+
+    def format(self, ranges, format):
+        return self._api('POST', 'format', lambda: self.formats.append((ranges, format)))
+
+    def delete_rows(self, start_index, end_index=None):
+        end_index = end_index or start_index
+        return self._api('POST', 'delete_rows', lambda: self._delete_rows(start_index - 1, end_index))
+
+
+class FakeSpreadsheet:
+    """記憶體中的試算表"""
+
+    def __init__(self, client, title, spreadsheet_id=None):
+        self.client = client
+        self.id = spreadsheet_id or uuid.uuid4().hex
+        self.title = title
+        self._sheets = []
+        self._next_sheet_id = 0
+        self._revision = 0
+        self._modified = datetime(2025, 1, 1)
+        self.lastUpdateTime = self._modified.isoformat() + 'Z'
+        self._new_sheet("工作表1")
+
+    def _api(self, method, name, operation, written=0, endpoint=None):
+        endpoint = endpoint or f"{SHEETS_ENDPOINT}/{self.id}"
+        return self.client.http_client.request(method, endpoint, operation=operation, name=name, written=written)
+
+    def _touch(self):
+        """記錄修改（modifiedTime 每次修改都會前進）"""
+        self._revision += 1
+        self.lastUpdateTime = (self._modified + timedelta(seconds=self._revision)).isoformat() + 'Z'
+
+    def _new_sheet(self, title, rows=1000, cols=26):
+        if any(ws.title == title for ws in self._sheets):
+            raise APIError(FakeResponse(400, f'A sheet with the name "{title}" already exists.'))
+        worksheet = FakeWorksheet(self, self._next_sheet_id, title, rows, cols)
+        self._next_sheet_id += 1
+        self._sheets.append(worksheet)
+        self._touch()
+        return worksheet
+
+    def _sheet_by_id(self, sheet_id):
+        for worksheet in self._sheets:
+            if worksheet.id == sheet_id:
+                return worksheet
+        raise APIError(FakeResponse(400, f"No grid with id: {sheet_id}"))
+
+    def worksheet(self, title):
+        def operation():
+            for worksheet in self._sheets:
+                if worksheet.title == title:
+                    return worksheet
+            raise WorksheetNotFound(title)
+        return self._api('GET', 'fetch_sheet_metadata', operation)
+
+    def worksheets(self):
+        return self._api('GET', 'fetch_sheet_metadata', lambda: list(self._sheets))
+
+    def add_worksheet(self, title, rows, cols):
+        return self._api('POST', 'add_worksheet', lambda: self._new_sheet(title, rows, cols))
+
+    def del_worksheet(self, worksheet):
+        def operation():
+            self._sheets.remove(self._sheet_by_id(worksheet.id))
+            self._touch()
+        return self._api('POST', 'del_worksheet', operation)
+
+    def get_lastUpdateTime(self):
+        return self._api('GET', 'drive_metadata', lambda: self.lastUpdateTime,
+                         endpoint=f"{DRIVE_ENDPOINT}/{self.id}")
+
+    def batch_update(self, body):
+        """spreadsheets.batchUpdate：依序套用，任一請求失敗時全部不生效"""
+        requests = body.get('requests', [])
+
+        def operation():
+            snapshot = [(ws, copy.deepcopy(ws.cells), ws.row_count, ws.col_count) for ws in self._sheets]
+            try:
+                for request in requests:
+                    self._apply(request)
+            except Exception:
+                for ws, cells, rows, cols in snapshot:
+                    ws.cells, ws.row_count, ws.col_count = cells, rows, cols
+                raise
+            return {'replies': [{} for _ in requests]}
+
+        written = sum(len(row['values']) for request in requests for body in request.values()
+                      for row in body.get('rows', []))
+        return self._api('POST', 'batch_update', operation, written=written)
+
+    def _apply(self, request):
+        """套用一個 batchUpdate 請求"""
+        if 'appendCells' in request:
+            body = request['appendCells']
+            rows = [[next(iter(cell['userEnteredValue'].values())) if cell.get('userEnteredValue') else ''
+                     for cell in row['values']] for row in body['rows']]
+            self._sheet_by_id(body['sheetId'])._append(rows)
+        elif 'updateCells' in request and 'rows' in request['updateCells']:
+            body = request['updateCells']
+            rows = [[next(iter(cell['userEnteredValue'].values())) if cell.get('userEnteredValue') else ''
+                     for cell in row['values']] for row in body['rows']]
+            start = body['start']
+            self._sheet_by_id(start['sheetId'])._write(start['rowIndex'] + 1, start['columnIndex'] + 1, rows)
+        elif 'updateCells' in request:
+            grid = request['updateCells']['range']
+            self._sheet_by_id(grid['sheetId'])._clear(grid)
+        elif 'repeatCell' in request:
+            grid = request['repeatCell']['range']
+            self._sheet_by_id(grid['sheetId']).formats.append((grid, request['repeatCell']['cell']))
+        elif 'deleteDimension' in request:
+            grid = request['deleteDimension']['range']
+            self._sheet_by_id(grid['sheetId'])._delete_rows(grid['startIndex'], grid['endIndex'])
+        else:
+            raise APIError(FakeResponse(400, f"Unsupported request: {list(request)}"))
+
+    def values_batch_update(self, body):
+        """values.batchUpdate：'工作表'!A1:C3 範圍的資料"""
+        data = body.get('data', [])
+
+        def operation():
+            for item in data:
+                match = re.match(r"^'?(.+?)'?!([A-Z]+)(\d+)", item['range'])
+                worksheet = next((ws for ws in self._sheets if ws.title == match.group(1)), None)
+                if worksheet is None:
+                    raise APIError(FakeResponse(400, f"Unable to parse range: {item['range']}"))
+                worksheet._write(int(match.group(3)), column_index(match.group(2)), item['values'])
+            return {'totalUpdatedCells': sum(len(row) for item in data for row in item['values'])}
+
+        written = sum(len(row) for item in data for row in item['values'])
+        return self._api('POST', 'values_batch_update', operation, written=written)
+
+
+class FakeClient:
+    """記憶體中的 gspread 客戶端"""
+
+    def __init__(self, **http_options):
+        """
+        Args:
+            http_options: FakeHTTPClient 的參數（latency、error_rate、error_every、error_status、seed）
+        """
+        self.http_client = FakeHTTPClient(**http_options)
+        self._spreadsheets = {}
+
+    def create(self, title):
+        def operation():
+            spreadsheet = FakeSpreadsheet(self, title)
+            self._spreadsheets[spreadsheet.id] = spreadsheet
+            return spreadsheet
+        return self.http_client.request('POST', SHEETS_ENDPOINT, operation=operation, name='create')
+
+    def open_by_key(self, key):
+        def operation():
+            if key not in self._spreadsheets:
+                raise SpreadsheetNotFound(key)
+            return self._spreadsheets[key]
+        return self.http_client.request('GET', f"{SHEETS_ENDPOINT}/{key}", operation=operation, name='open')
+
+    def open(self, title):
+        def operation():
+            for spreadsheet in self._spreadsheets.values():
+                if spreadsheet.title == title:
+                    return spreadsheet
+            raise SpreadsheetNotFound(title)
+        return self.http_client.request('GET', DRIVE_ENDPOINT, operation=operation, name='open')
+
+    def summary(self):
+        """呼叫統計"""
+        return self.http_client.summary()
@@ -8,31 +8,14 @@
 import sqlite3
 import pandas as pd
 from database_manager import TaifexDatabaseManager
+from schema_mapping import crawler_to_db, db_to_sheets
 from google_sheets_manager import GoogleSheetsManager
 import json
 from pathlib import Path
 
 def correct_prepare_data_for_db(df):
-    """正確的資料庫格式轉換函數"""
-    if df.empty:
-        return pd.DataFrame()
-    
-    db_records = []
-    
-    for _, row in df.iterrows():
-        # 每一行應該創建一條記錄，而不是多條
-        record = {
-            'date': row.get('日期', ''),
-            'contract_code': row.get('契約名稱', ''),
-            'identity_type': row.get('身份別', '總計'),
-            'position_type': '完整',  # 標記為完整記錄
-            'long_position': row.get('多方未平倉口數', 0),
-            'short_position': row.get('空方未平倉口數', 0),
-            'net_position': row.get('多空淨額未平倉口數', 0)
-        }
-        db_records.append(record)
-    
-    return pd.DataFrame(db_records)
+    """正確的資料庫格式轉換函數（每一列爬蟲資料對應一筆資料庫記錄）"""
+    return crawler_to_db(df)
 
 def main():
     print("🔧 修復資料庫格式問題...")
@@ -44,6 +27,8 @@ def main():
     
     import shutil
     backup_path = str(db_path).replace('.db', '_backup.db')
+    # 先寫完佇列中的資料再複製檔案
+    db_manager.writer.flush()
     shutil.copy2(db_path, backup_path)
     print(f"✅ 資料庫已備份到: {backup_path}")
     
@@ -54,11 +39,12 @@ def main():
     existing_data = pd.read_sql_query("SELECT COUNT(*) as count FROM futures_data", conn)
     print(f"   現有記錄數: {existing_data['count'].iloc[0]}")
     
-    # 刪除錯誤格式的資料
+    # 刪除錯誤格式的資料（經由共用寫入器，每日摘要之後由寫入的資料重新彙總）
     print("\n🗑️ 清除錯誤格式的資料...")
-    cursor = conn.cursor()
-    cursor.execute("DELETE FROM futures_data")
-    conn.commit()
+    db_manager.writer.submit_statements([
+        ("DELETE FROM futures_data", (), False),
+        ("DELETE FROM daily_summary", (), False),
+    ]).result()
     print("✅ 錯誤資料已清除")
     
     # 假設我們有正確格式的爬蟲資料需要重新插入
@@ -78,19 +64,17 @@ def main():
                     'date': date,
                     'contract_code': contract,
                     'identity_type': identity,
-                    'position_type': '完整',
-                    'long_position': 1000,  # 模擬多方位置
-                    'short_position': 800,  # 模擬空方位置
-                    'net_position': 200     # 淨位置 = 多方 - 空方
+                    'long_position_volume': 1000,  # 模擬多方未平倉
+                    'short_position_volume': 800,  # 模擬空方未平倉
+                    'net_position_volume': 200     # 淨額 = 多方 - 空方
                 }
                 test_data.append(record)
     
-    # 插入正確格式的資料
+    # 插入正確格式的資料（與爬蟲相同的寫入流程：內容雜湊、每日摘要、異動紀錄）
     test_df = pd.DataFrame(test_data)
-    test_df.to_sql('futures_data', conn, if_exists='append', index=False)
-    conn.commit()
+    stats = db_manager.insert_data(test_df)
     
-    print(f"✅ 已插入 {len(test_df)} 筆正確格式的測試資料")
+    print(f"✅ 已插入 {stats['inserted']} 筆正確格式的測試資料")
     
     # 驗證新格式
     print("\n🔍 驗證新格式...")
@@ -128,30 +112,8 @@ def main():
             history_ws.batch_clear(["A2:Z50000"])
             print("✅ Google Sheets 歷史資料已清空")
             
-            # 準備正確格式的資料
-            sheets_data = []
-            for _, row in test_df.iterrows():
-                sheets_row = {
-                    '日期': row['date'],
-                    '契約名稱': row['contract_code'],
-                    '身份別': row['identity_type'],
-                    '多方交易口數': 0,  # 測試資料中沒有交易口數
-                    '多方契約金額': 0,
-                    '空方交易口數': 0,
-                    '空方契約金額': 0,
-                    '多空淨額交易口數': 0,
-                    '多空淨額契約金額': 0,
-                    '多方未平倉口數': row['long_position'],
-                    '多方未平倉契約金額': 0,
-                    '空方未平倉口數': row['short_position'],
-                    '空方未平倉契約金額': 0,
-                    '多空淨額未平倉口數': row['net_position'],
-                    '多空淨額未平倉契約金額': 0,
-                    '更新時間': '',
-                }
-                sheets_data.append(sheets_row)
-            
-            df = pd.DataFrame(sheets_data)
+            # 準備正確格式的資料（測試資料中沒有的欄位補0）
+            df = db_to_sheets(test_df)
             print(f"📤 準備上傳 {len(df)} 筆正確格式資料...")
             
             success = sheets_manager.upload_data(df, worksheet_name="歷史資料")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所爬蟲資料列
+解析結果以固定欄位（__slots__）的資料列表示，彙整時直接附加到各欄位的型別陣列，
+最後一次建立 DataFrame（契約、身份別為 category，數值為 int64），不經過逐列的中文鍵字典
+"""
+
+import pandas as pd
+import numpy as np
+from array import array
+from collections.abc import Mapping
+from schema_mapping import FUTURES_FIELDS
+
+# 中文欄位名稱：交易量六欄、未平倉六欄
+TRADING_METRICS = [zh for _, zh in FUTURES_FIELDS[3:9]]
+POSITION_METRICS = [zh for _, zh in FUTURES_FIELDS[9:]]
+COMPLETE_METRICS = TRADING_METRICS + POSITION_METRICS
+
+KEY_FIELDS = ('日期', '契約名稱', '身份別')
+_METRIC_INDEX = {name: i for i, name in enumerate(COMPLETE_METRICS)}
+
+
+def _to_int(value):
+    """解析出的數字轉為整數（少數欄位可能解析為浮點數）"""
+    if isinstance(value, float):
+        return int(round(value))
+    return int(value or 0)
+
+
+class FuturesRecord(Mapping):
+    """
+    單筆爬蟲資料（日期/契約/身份別 + 交易量或完整的數值欄位）
+
+    以唯讀 Mapping 介面提供與原本資料字典相同的中文鍵存取（record['多方交易口數']、record.items()）
+    """
+
+    __slots__ = ('date', 'contract', 'identity', 'values')
+
+    def __init__(self, date, contract, identity, values):
+        """
+        Args:
+            date: 'YYYY/MM/DD' 日期字串
+            contract: 契約代碼
+            identity: 身份別
+            values: 依 TRADING_METRICS 或 COMPLETE_METRICS 順序排列的數值
+        """
+        self.date = date
+        self.contract = contract
+        self.identity = identity
+        self.values = tuple(_to_int(value) for value in values)
+
+    @property
+    def metrics(self):
+        """此資料列包含的數值欄位名稱"""
+        return COMPLETE_METRICS if len(self.values) == len(COMPLETE_METRICS) else TRADING_METRICS
+
+    def __getitem__(self, key):
+        if key == '日期':
+            return self.date
+        if key == '契約名稱':
+            return self.contract
+        if key == '身份別':
+            return self.identity
+        index = _METRIC_INDEX.get(key)
+        if index is None or index >= len(self.values):
+            raise KeyError(key)
+        return self.values[index]
+
+    def __iter__(self):
+        yield from KEY_FIELDS
+        yield from self.metrics
+
+    def __len__(self):
+        return len(KEY_FIELDS) + len(self.values)
+
+    def __repr__(self):
+        return f"FuturesRecord({self.date} {self.contract} {self.identity}: {dict(zip(self.metrics, self.values))})"
+
+
+class RecordAccumulator:
+    """逐筆收集爬蟲資料，直接存入各欄位的型別陣列"""
+
+    def __init__(self):
+        self._dates = []
+        self._contracts = []
+        self._identities = []
+        # 每個數值欄位一個 int64 陣列（array('q')），交易量資料只會用到前六個
+        self._columns = [array('q') for _ in COMPLETE_METRICS]
+        self._width = None
+
+    def __len__(self):
+        return len(self._dates)
+
+    def append(self, record):
+        """
+        加入一筆資料
+
+        Args:
+            record: FuturesRecord
+        """
+        if self._width is None:
+            self._width = len(record.values)
+        elif len(record.values) != self._width:
+            raise ValueError(f"資料欄位數不一致: {len(record.values)} != {self._width}")
+
+        self._dates.append(record.date)
+        self._contracts.append(record.contract)
+        self._identities.append(record.identity)
+        for column, value in zip(self._columns, record.values):
+            column.append(value)
+
+    def extend(self, records):
+        """加入多筆資料"""
+        for record in records:
+            self.append(record)
+
+    def to_frame(self, sort=True):
+        """
+        建立 DataFrame
+
+        Args:
+            sort: 是否依 日期/契約/身份別 排序（多執行緒爬取時完成順序不固定）
+
+        Returns:
+            DataFrame: 中文欄位；契約名稱、身份別為 category，數值欄位為 int64
+        """
+        if not self._dates:
+            return pd.DataFrame()
+
+        metrics = COMPLETE_METRICS[:self._width]
+        data = {
+            '日期': self._dates,
+            '契約名稱': pd.Categorical(self._contracts, categories=sorted(set(self._contracts))),
+            '身份別': pd.Categorical(self._identities, categories=sorted(set(self._identities))),
+        }
+        for name, column in zip(metrics, self._columns):
+            data[name] = np.array(column, dtype=np.int64)
+
+        df = pd.DataFrame(data)
+        if sort:
+            df = df.sort_values(list(KEY_FIELDS), ignore_index=True)
+        return df
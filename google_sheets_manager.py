@@ -8,38 +8,97 @@ Google Sheets 資料管理系統
 """
 
 import pandas as pd
+import numpy as np
 import json
 import os
 from datetime import datetime, timedelta
 from pathlib import Path
 import logging
 import time
+from collections import Counter
+from contextlib import contextmanager
+from schema_mapping import format_dates, parse_dates, sheet_rows, summary_to_sheets, trend_to_sheets, typed_frame
+from sheets_mirror import column_letter, numericise_value
+from sheets_batch import SheetsWriteBatcher, column_index
+from sheets_session import credentials_key, get_session
 
 try:
     import gspread
+    from gspread.exceptions import WorksheetNotFound
     from google.oauth2.service_account import Credentials
     GSPREAD_AVAILABLE = True
 except ImportError:
     GSPREAD_AVAILABLE = False
     print("警告: Google Sheets套件未安裝，請執行: pip install gspread google-auth")
 
+    class WorksheetNotFound(Exception):
+        """找不到工作表（未安裝 gspread 時供 fake_gspread 離線替身使用）"""
+
+# 工作表資料列的主鍵欄位（前三欄）
+SHEET_KEY_COLUMNS = ('日期', '契約名稱', '身份別')
+
+
+def sheet_keys(key_df):
+    """主鍵欄位組合為比對用字串（日期統一為 'YYYY/MM/DD'）"""
+    dates = parse_dates(key_df['日期']).dt.strftime('%Y/%m/%d')
+    return (dates.fillna('') + '|' + key_df['契約名稱'].astype(str).str.strip()
+            + '|' + key_df['身份別'].astype(str).str.strip())
+
+
+def _same_row(local, remote, skip=()):
+    """
+    上傳列與工作表顯示值是否相同（數字以數值比較，'100' 與 100 視為相同；工作表尾端的空白格視為空字串）
+
+    Args:
+        skip: 不比較的欄位位置（如每次上傳都不同的更新時間）
+    """
+    remote = list(remote) + [''] * (len(local) - len(remote))
+    return all(numericise_value('' if value is None else str(value)) == numericise_value(str(current))
+               for position, (value, current) in enumerate(zip(local, remote)) if position not in skip)
+
+
+def _row_runs(row_numbers):
+    """排序後的列號切成連續的區段 [(起, 迄), ...]"""
+    row_numbers = np.asarray(row_numbers, dtype=np.int64)
+    if not len(row_numbers):
+        return []
+    breaks = np.flatnonzero(np.diff(row_numbers) != 1) + 1
+    return [(int(row_numbers[start]), int(row_numbers[end - 1]))
+            for start, end in zip(np.r_[0, breaks], np.r_[breaks, len(row_numbers)])]
+
+
 class GoogleSheetsManager:
     """Google Sheets 管理器"""
     
-    def __init__(self, credentials_file="config/google_sheets_credentials.json"):
+    def __init__(self, credentials_file="config/google_sheets_credentials.json", client=None, quota_gate=None,
+                 mirror_path="data/sheets_mirror.db"):
         """
         初始化Google Sheets管理器
         
         Args:
             credentials_file: Google服務帳號認證檔案路徑
+            client: 已建立的 gspread 客戶端（例如離線測試用的 fake_gspread.FakeClient），提供時不讀取認證
+            quota_gate: 配額關卡，None 使用程序共用的 QuotaGate
+            mirror_path: 本機鏡像SQLite檔案路徑
+            
+        同一程序內的管理器共用已認證的客戶端、已開啟的試算表、工作表清單與鏡像（sheets_session）
         """
         self.credentials_file = Path(credentials_file)
         self.logger = logging.getLogger(__name__)
         self.client = None
         self.spreadsheet = None
         self.spreadsheet_url = None
+        self._batcher = None
+        self.session = get_session()
+        # API 呼叫計數（讀取、建立工作表、批次寫入）
+        self.api_calls = Counter()
+        # 所有請求經過的配額關卡（限速、429/5xx 退避重試、合併相同讀取）
+        self.quota_gate = quota_gate or self.session.quota_gate
+        self.mirror_path = mirror_path
         
-        if GSPREAD_AVAILABLE:
+        if client is not None:
+            self.client = self.quota_gate.install(client)
+        elif GSPREAD_AVAILABLE:
             self.setup_credentials()
     
     def setup_credentials(self):
@@ -47,6 +106,14 @@ class GoogleSheetsManager:
         # 優先從環境變數讀取憑證（適用於GitHub Actions）
         credentials_json = os.environ.get('GOOGLE_SHEETS_CREDENTIALS')
         
+        # 同一程序已用相同認證登入過時直接沿用（不重新讀取認證、不重新授權）
+        key = credentials_key(credentials_json, self.credentials_file)
+        client = self.session.client(key) if key else None
+        if client is not None:
+            self.client = client
+            self.logger.debug("沿用已認證的Google Sheets客戶端")
+            return True
+        
         if credentials_json:
             try:
                 self.logger.info("從環境變數載入Google憑證")
@@ -65,7 +132,7 @@ class GoogleSheetsManager:
                 )
                 
                 # 建立gspread客戶端
-                self.client = gspread.authorize(credentials)
+                self.client = self.session.add_client(key, self.quota_gate.install(gspread.authorize(credentials)))
                 self.logger.info("Google Sheets認證成功（來自環境變數）")
                 return True
                 
@@ -92,7 +159,8 @@ class GoogleSheetsManager:
             )
             
             # 建立gspread客戶端
-            self.client = gspread.authorize(credentials)
+            self.client = self.session.add_client(credentials_key(credentials_file=self.credentials_file),
+                                                  self.quota_gate.install(gspread.authorize(credentials)))
             self.logger.info("Google Sheets認證成功（來自檔案）")
             return True
             
@@ -134,7 +202,7 @@ class GoogleSheetsManager:
         
         try:
             # 建立新試算表
-            spreadsheet = self.client.create(title)
+            spreadsheet = self.session.add_spreadsheet(self.client, self.client.create(title))
             self.spreadsheet = spreadsheet
             self.spreadsheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet.id}"
             
@@ -161,8 +229,8 @@ class GoogleSheetsManager:
             else:
                 spreadsheet_id = spreadsheet_id_or_url
             
-            # 連接試算表
-            spreadsheet = self.client.open_by_key(spreadsheet_id)
+            # 連接試算表（同一程序已開啟過時沿用）
+            spreadsheet = self.session.spreadsheet(self.client, spreadsheet_id)
             self.spreadsheet = spreadsheet
             self.spreadsheet_url = f"https://docs.google.com/spreadsheets/d/{spreadsheet_id}"
             
@@ -173,6 +241,159 @@ class GoogleSheetsManager:
             self.logger.error(f"連接試算表失敗: {e}")
             return None
     
+    def connect_configured_spreadsheet(self, config_file="config/spreadsheet_config.json"):
+        """
+        連接設定檔中的試算表（設定檔與試算表在同一程序內只讀取/開啟一次）
+        
+        Returns:
+            gspread Spreadsheet，設定檔不存在、沒有ID或連接失敗時為 None
+        """
+        try:
+            spreadsheet_id = self.session.configured_spreadsheet_id(config_file)
+        except Exception as e:
+            self.logger.error(f"讀取試算表設定失敗: {e}")
+            return None
+        if not spreadsheet_id:
+            return None
+        return self.connect_spreadsheet(spreadsheet_id)
+    
+    @property
+    def mirror(self):
+        """目前試算表的本機鏡像（讀取工作表內容時優先使用，只在試算表有修改時才向 API 重新下載）"""
+        if not self.spreadsheet:
+            return None
+        return self.session.mirror(self.spreadsheet, self.mirror_path)
+    
+    @contextmanager
+    def batch_writes(self, workers=1):
+        """
+        批次寫入區段：區段內所有方法的寫入（清除、格式、附加、更新）在離開時以一次 spreadsheets.batchUpdate
+        送出（全部成功或全部不生效）；巢狀使用時併入外層批次
+        
+        Args:
+            workers: 大於1時各工作表獨立、同時送出（不再是全部成功或全部不生效：單一工作表失敗不影響其他工作表，
+                     失敗記錄在批次的 errors）
+        
+        注意：區段內的寫入在送出前不會反映在工作表上，同一區段內請勿先寫入再讀取同一工作表
+        """
+        if self._batcher is not None:
+            yield self._batcher
+            return
+        
+        self._batcher = SheetsWriteBatcher(self.spreadsheet, self.api_calls, workers=workers)
+        try:
+            yield self._batcher
+            self._batcher.flush()
+        finally:
+            self._batcher = None
+    
+    def _worksheet(self, name):
+        """
+        取得工作表（程序內第一次呼叫以一次 worksheets() 取得全部工作表並快取）
+        
+        Raises:
+            WorksheetNotFound: 工作表不存在
+        """
+        worksheets = self.session.worksheets(self.spreadsheet)
+        if worksheets is None or name not in worksheets:
+            worksheets = self.session.load_worksheets(self.spreadsheet)
+            self.api_calls['metadata'] += 1
+        if name not in worksheets:
+            raise WorksheetNotFound(name)
+        return worksheets[name]
+    
+    def _add_worksheet(self, title, rows, cols):
+        """建立工作表並加入快取"""
+        worksheet = self.spreadsheet.add_worksheet(title=title, rows=rows, cols=cols)
+        self.api_calls['add_worksheet'] += 1
+        worksheets = self.session.worksheets(self.spreadsheet)
+        if worksheets is not None:
+            worksheets[title] = worksheet
+        return worksheet
+    
+    def _column_index(self, worksheet, column):
+        """欄位（1起算的序號、欄位字母或表頭名稱）轉為序號；主鍵欄位固定在前三欄，不必讀取表頭"""
+        if isinstance(column, int):
+            return column
+        if column in SHEET_KEY_COLUMNS:
+            return SHEET_KEY_COLUMNS.index(column) + 1
+        if column.isascii() and column.isalpha() and column.isupper():
+            return column_index(column)
+        header = worksheet.row_values(1)
+        self.api_calls['read'] += 1
+        if column not in header:
+            raise KeyError(f"{worksheet.title} 沒有欄位: {column}")
+        return header.index(column) + 1
+    
+    def read_range(self, worksheet_name, a1_range):
+        """
+        讀取指定範圍（如 'A2:C'、'A100:P120'），只下載該範圍的儲存格
+        
+        Returns:
+            list: 每列一個字串列表
+        """
+        worksheet = self._worksheet(worksheet_name)
+        self.api_calls['read'] += 1
+        return worksheet.get(a1_range)
+    
+    def column_values(self, worksheet_name, column, include_header=False):
+        """
+        只讀取單一欄位
+        
+        Args:
+            worksheet_name: 工作表名稱
+            column: 1起算的序號、欄位字母或表頭名稱（如 '日期'）
+            include_header: 是否包含第一列表頭
+            
+        Returns:
+            list: 欄位值（字串，尾端的空白儲存格不回傳）
+        """
+        worksheet = self._worksheet(worksheet_name)
+        values = worksheet.col_values(self._column_index(worksheet, column))
+        self.api_calls['read'] += 1
+        return values if include_header else values[1:]
+    
+    def key_values(self, worksheet_name):
+        """
+        只讀取主鍵欄位（前三欄，A1:C）
+        
+        Returns:
+            DataFrame: 欄位為工作表表頭（資料工作表即 日期/契約名稱/身份別），值為字串，列順序與工作表相同
+        """
+        width = len(SHEET_KEY_COLUMNS)
+        rows = self.read_range(worksheet_name, f"A1:{column_letter(width)}")
+        if not rows:
+            return pd.DataFrame(columns=list(SHEET_KEY_COLUMNS), dtype=str)
+        rows = [row + [''] * (width - len(row)) for row in rows]
+        return pd.DataFrame(rows[1:], columns=[str(cell).strip() for cell in rows[0]], dtype=str)
+    
+    def row_count(self, worksheet_name, exact=True):
+        """
+        工作表列數（含表頭）
+        
+        Args:
+            worksheet_name: 工作表名稱
+            exact: True 只讀取A欄計算有資料的列數；False 直接使用工作表中繼資料的列數
+                   （不另外呼叫API，但那是格線大小，可能包含尚未使用的空白列）
+        """
+        if not exact:
+            return self._worksheet(worksheet_name).row_count
+        return len(self.column_values(worksheet_name, 1, include_header=True))
+    
+    def tail_rows(self, worksheet_name, n=10):
+        """
+        讀取最後N列資料（先以A欄取得列數，再只讀取尾端範圍）
+        
+        Returns:
+            list: 最多N列，每列一個字串列表（不含表頭）
+        """
+        last_row = self.row_count(worksheet_name)
+        first_row = max(2, last_row - n + 1)
+        if last_row < first_row:
+            return []
+        worksheet = self._worksheet(worksheet_name)
+        return self.read_range(worksheet_name, f"A{first_row}:{column_letter(worksheet.col_count)}{last_row}")
+    
     def setup_worksheets(self):
         """設定工作表結構"""
         if not self.spreadsheet:
@@ -192,32 +413,30 @@ class GoogleSheetsManager:
             try:
                 default_sheet = self.spreadsheet.worksheet("工作表1")
                 self.spreadsheet.del_worksheet(default_sheet)
+                self.session.forget_worksheet(self.spreadsheet, "工作表1")
             except:
                 pass
             
-            # 建立新工作表
-            for config in worksheets_config:
-                try:
-                    worksheet = self.spreadsheet.add_worksheet(
-                        title=config["name"], 
-                        rows=1000, 
-                        cols=20
-                    )
-                    
-                    # 設定標題行
-                    if config["headers"]:
-                        worksheet.update('A1', [config["headers"]])
+            # 建立新工作表（標題行與格式一起批次寫入）
+            with self.batch_writes() as batch:
+                for config in worksheets_config:
+                    try:
+                        worksheet = self._add_worksheet(config["name"], rows=1000, cols=20)
                         
-                        # 格式化標題行
-                        worksheet.format('A1:Z1', {
-                            'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 0.9},
-                            'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}}
-                        })
-                    
-                    self.logger.info(f"工作表建立成功: {config['name']}")
-                    
-                except Exception as e:
-                    self.logger.warning(f"建立工作表 {config['name']} 失敗: {e}")
+                        # 設定標題行
+                        if config["headers"]:
+                            batch.update(worksheet, 'A1', [config["headers"]])
+                            
+                            # 格式化標題行
+                            batch.format(worksheet, 'A1:Z1', {
+                                'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 0.9},
+                                'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}}
+                            })
+                        
+                        self.logger.info(f"工作表建立成功: {config['name']}")
+                        
+                    except Exception as e:
+                        self.logger.warning(f"建立工作表 {config['name']} 失敗: {e}")
             
         except Exception as e:
             self.logger.error(f"設定工作表失敗: {e}")
@@ -265,7 +484,7 @@ class GoogleSheetsManager:
             "外資7日平均", "自營商7日平均", "投信7日平均"
         ]
     
-    def upload_data(self, df, worksheet_name="歷史資料", data_type=None):
+    def upload_data(self, df, worksheet_name="歷史資料", data_type=None, mode='upsert'):
         """
         上傳資料到Google Sheets
         
@@ -273,9 +492,14 @@ class GoogleSheetsManager:
             df: 要上傳的DataFrame
             worksheet_name: 工作表名稱（可選）
             data_type: 資料類型 ('TRADING', 'COMPLETE')，會自動選擇對應工作表
+            mode: 'upsert' 依 日期/契約名稱/身份別 更新既有列、只附加新的鍵；'append' 全部附加到尾端
+            
+        在 batch_writes() 區段內呼叫時只加入批次，實際寫入在區段結束時送出
         """
         if not self.spreadsheet or df.empty:
             return False
+        if mode not in ('upsert', 'append'):
+            raise ValueError(f"不支援的上傳模式: {mode}")
         
         try:
             # 根據資料類型自動選擇工作表
@@ -292,9 +516,10 @@ class GoogleSheetsManager:
                     worksheet_name = "交易量資料"
             
             # 獲取或創建工作表
+            new_headers = None
             try:
-                worksheet = self.spreadsheet.worksheet(worksheet_name)
-            except gspread.exceptions.WorksheetNotFound:
+                worksheet = self._worksheet(worksheet_name)
+            except WorksheetNotFound:
                 # 如果工作表不存在，創建它
                 if worksheet_name == "交易量資料":
                     headers = self.get_trading_headers()
@@ -303,12 +528,8 @@ class GoogleSheetsManager:
                 else:
                     headers = self.get_history_headers()
                 
-                worksheet = self.spreadsheet.add_worksheet(
-                    title=worksheet_name,
-                    rows=1000,
-                    cols=len(headers)
-                )
-                worksheet.append_row(headers)
+                worksheet = self._add_worksheet(worksheet_name, rows=1000, cols=len(headers))
+                new_headers = headers
             
             # 準備資料
             upload_df = df.copy()
@@ -328,19 +549,27 @@ class GoogleSheetsManager:
                     upload_df[col] = ""
             
             upload_df = upload_df[expected_columns + ['更新時間']]
+            upload_df['日期'] = format_dates(upload_df['日期'])
             
-            # 轉換為列表格式
-            data_to_upload = upload_df.values.tolist()
-            
-            # 批量上傳資料
-            if data_to_upload:
-                worksheet.append_rows(data_to_upload)
-                self.logger.info(f"成功上傳 {len(data_to_upload)} 筆資料到 {worksheet_name}")
+            with self.batch_writes() as batch:
+                if new_headers:
+                    batch.append(worksheet, [new_headers])
                 
-                # 格式化工作表
-                self._format_worksheet(worksheet)
+                if mode == 'upsert':
+                    return self._upsert_rows(worksheet, upload_df, batch, has_rows=not new_headers)
                 
-                return True
+                # 轉換為列表格式
+                data_to_upload = sheet_rows(upload_df)
+                
+                # 批量上傳資料
+                if data_to_upload:
+                    batch.append(worksheet, data_to_upload)
+                    self.logger.info(f"成功上傳 {len(data_to_upload)} 筆資料到 {worksheet_name}")
+                    
+                    # 格式化工作表
+                    self._format_worksheet(worksheet)
+                    
+                    return True
             
         except Exception as e:
             self.logger.error(f"上傳資料到 {worksheet_name} 失敗: {e}")
@@ -348,6 +577,126 @@ class GoogleSheetsManager:
         
         return False
     
+    def _upsert_rows(self, worksheet, upload_df, batch, has_rows=True):
+        """
+        依主鍵（日期/契約名稱/身份別）寫入資料：主鍵欄位取自本機鏡像，只讀取鍵已存在的列的目前內容，
+        內容有變動的覆寫該列的範圍、相同的略過（不比較更新時間，只有變動與新增的列會寫入新的更新時間）、
+        新的鍵附加到尾端（都加入批次）；同一批次中已附加的新鍵再次寫入時改寫該列，不重複附加
+        
+        Args:
+            worksheet: 目標工作表（前三欄為主鍵）
+            upload_df: 已依工作表欄位排列的資料
+            batch: SheetsWriteBatcher
+            has_rows: 工作表是否可能已有資料（剛建立的工作表不必讀取主鍵）
+            
+        Returns:
+            bool: 是否成功
+        """
+        # 同一鍵只保留最後一筆
+        keys = sheet_keys(upload_df[list(SHEET_KEY_COLUMNS)])
+        upload_df = upload_df[~keys.duplicated(keep='last')]
+        keys = keys[upload_df.index]
+        
+        width = len(upload_df.columns)
+        skip = {upload_df.columns.get_loc('更新時間')} if '更新時間' in upload_df.columns else set()
+        mirror = self.mirror
+        target_rows = pd.Series(np.nan, index=keys.index)
+        existing = {}
+        if has_rows:
+            values = mirror.get_all_values(worksheet.title)
+            if values and [str(cell).strip() for cell in values[0][:len(SHEET_KEY_COLUMNS)]] != list(SHEET_KEY_COLUMNS):
+                self.logger.warning(f"⚠️ {worksheet.title} 的前三欄不是 {'/'.join(SHEET_KEY_COLUMNS)}，改為附加上傳")
+                batch.append(worksheet, sheet_rows(upload_df))
+                return True
+            target_rows, existing = self._matched_rows(worksheet, keys, values, width)
+            if target_rows is None:
+                # 鏡像與工作表的列位置不一致（其他人插入或刪除了列），重新下載鏡像後再比對一次
+                values = mirror.get_all_values(worksheet.title, refresh=True)
+                target_rows, existing = self._matched_rows(worksheet, keys, values, width)
+        
+        # 比對基準：本批次已寫入的列優先，其次為工作表目前的內容
+        written = batch.keyed_rows.setdefault(worksheet.title, {})
+        update_rows, update_values = [], []
+        new_rows, new_keys = [], []
+        unchanged = rewritten = 0
+        for key, row, target in zip(keys, sheet_rows(upload_df), target_rows):
+            if pd.isna(target):
+                if batch.rewrite_appended(worksheet, key, row):
+                    rewritten += 1
+                else:
+                    new_rows.append(row)
+                    new_keys.append(key)
+                continue
+            current = written.get(key, existing[int(target)])
+            if _same_row(row, current, skip):
+                unchanged += 1
+                continue
+            written[key] = row
+            update_rows.append(int(target))
+            update_values.append(row)
+        
+        # 連續的列合併為一個範圍
+        order = np.argsort(update_rows, kind='stable')
+        update_rows = [update_rows[i] for i in order]
+        update_values = [update_values[i] for i in order]
+        runs = _row_runs(update_rows)
+        offset = 0
+        for first_row, last_row in runs:
+            count = last_row - first_row + 1
+            batch.update(worksheet, f"A{first_row}:{column_letter(width)}{last_row}", update_values[offset:offset + count])
+            offset += count
+        
+        batch.append(worksheet, new_rows, keys=new_keys)
+        
+        if update_rows or new_rows:
+            updates = dict(zip(update_rows, update_values))
+            batch.after_flush(lambda: mirror.apply_writes(worksheet.title, updates, new_rows), worksheet)
+        
+        self.logger.info(f"成功上傳到 {worksheet.title}: 更新 {len(update_rows)} 筆（{len(runs)} 個範圍），新增 {len(new_rows)} 筆，"
+                         f"未變動 {unchanged} 筆" + (f"，改寫本批次新增的 {rewritten} 筆" if rewritten else ""))
+        self._format_worksheet(worksheet)
+        return True
+    
+    def _matched_rows(self, worksheet, keys, values, width):
+        """
+        以鏡像的主鍵欄位找出上傳鍵所在的工作表列，再以一次 batch_get 只讀取這些列的目前內容
+        
+        Args:
+            worksheet: 目標工作表
+            keys: 上傳資料的鍵（sheet_keys() 格式）
+            values: 鏡像的工作表內容（只使用前三欄）
+            width: 上傳的欄數
+            
+        Returns:
+            tuple: (各鍵的工作表列號（不存在為 NaN）, {列號: 目前內容})；
+                   讀到的列主鍵與鏡像不符時為 (None, None)
+        """
+        key_width = len(SHEET_KEY_COLUMNS)
+        key_rows = pd.DataFrame([list(row[:key_width]) + [''] * (key_width - len(row)) for row in values[1:]],
+                                columns=list(SHEET_KEY_COLUMNS), dtype=str)
+        row_index = pd.Series(np.arange(2, len(key_rows) + 2), index=sheet_keys(key_rows))
+        row_index = row_index[~row_index.index.duplicated(keep='first')]
+        target_rows = keys.map(row_index)
+        
+        matched = np.unique(target_rows.dropna().to_numpy(dtype=np.int64))
+        runs = _row_runs(matched)
+        if not runs:
+            return target_rows, {}
+        ranges = worksheet.batch_get([f"A{first}:{column_letter(width)}{last}" for first, last in runs])
+        self.api_calls['read'] += 1
+        
+        existing = {}
+        for (first, last), rows in zip(runs, ranges):
+            rows = list(rows) + [[]] * (last - first + 1 - len(rows))
+            existing.update(zip(range(first, last + 1), rows))
+        
+        expected = pd.Series(row_index.index, index=row_index.to_numpy())
+        fetched = pd.DataFrame([list(existing[row][:key_width]) + [''] * (key_width - len(existing[row])) for row in matched],
+                               columns=list(SHEET_KEY_COLUMNS), dtype=str)
+        if not (sheet_keys(fetched).to_numpy() == expected[matched].to_numpy()).all():
+            return None, None
+        return target_rows, existing
+    
     def _format_worksheet(self, worksheet):
         """格式化工作表"""
         # 這裡可以添加格式化工作表的邏輯
@@ -359,8 +708,7 @@ class GoogleSheetsManager:
             return pd.DataFrame()
         
         try:
-            worksheet = self.spreadsheet.worksheet("歷史資料")
-            all_data = worksheet.get_all_records()
+            all_data = self.mirror.get_all_records("歷史資料")
             
             if not all_data:
                 return pd.DataFrame()
@@ -375,9 +723,8 @@ class GoogleSheetsManager:
             
             # 轉換日期格式並排序
             try:
-                df['日期'] = pd.to_datetime(df['日期'], errors='coerce')
-                # 移除無效日期
-                df = df.dropna(subset=['日期'])
+                # 統一型別（無效日期會被移除）
+                df = typed_frame(df)
                 df = df.sort_values('日期', ascending=False)
                 
                 # 取得最近N天的資料
@@ -403,30 +750,19 @@ class GoogleSheetsManager:
             return False
         
         try:
-            worksheet = self.spreadsheet.worksheet("每日摘要")
-            
-            # 清除舊資料
-            worksheet.batch_clear(["A2:Z1000"])
-            
-            # 準備摘要資料
-            data_to_upload = []
-            for _, row in summary_df.iterrows():
-                # 確保所有資料都轉換為字串或數字，避免 bytes 類型
-                data_row = [
-                    str(row.get('date', '')),
-                    int(row.get('total_contracts', 0)) if pd.notna(row.get('total_contracts', 0)) else 0,
-                    int(row.get('total_volume', 0)) if pd.notna(row.get('total_volume', 0)) else 0,
-                    int(row.get('foreign_net', 0)) if pd.notna(row.get('foreign_net', 0)) else 0,
-                    int(row.get('dealer_net', 0)) if pd.notna(row.get('dealer_net', 0)) else 0,
-                    int(row.get('trust_net', 0)) if pd.notna(row.get('trust_net', 0)) else 0,
-                    datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-                ]
-                data_to_upload.append(data_row)
+            worksheet = self._worksheet("每日摘要")
             
-            # 上傳資料
-            if data_to_upload:
-                worksheet.update('A2', data_to_upload)
-                self.logger.info(f"成功上傳 {len(data_to_upload)} 筆摘要資料")
+            with self.batch_writes() as batch:
+                # 清除舊資料
+                batch.clear(worksheet, "A2:Z1000")
+                
+                # 準備摘要資料（整欄轉換為int，避免 bytes 等無法上傳的型別）
+                data_to_upload = sheet_rows(summary_to_sheets(summary_df, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+                
+                # 上傳資料
+                if data_to_upload:
+                    batch.update(worksheet, 'A2', data_to_upload)
+                    self.logger.info(f"成功上傳 {len(data_to_upload)} 筆摘要資料")
             
             return True
             
@@ -434,13 +770,20 @@ class GoogleSheetsManager:
             self.logger.error(f"上傳摘要資料失敗: {e}")
             return False
     
-    def update_trend_analysis(self, summary_df):
-        """更新三大法人趨勢分析"""
+    def update_trend_analysis(self, summary_df, trend_df=None):
+        """
+        更新三大法人趨勢分析
+        
+        Args:
+            summary_df: 每日摘要資料
+            trend_df: 預先計算的7日平均（index 為日期、欄位為身份別），
+                      None 時以摘要資料即時計算
+        """
         if not self.spreadsheet or summary_df.empty:
             return False
         
         try:
-            worksheet = self.spreadsheet.worksheet("三大法人趨勢")
+            worksheet = self._worksheet("三大法人趨勢")
             
             # 檢查並轉換數值欄位
             numeric_columns = ['foreign_net', 'dealer_net', 'trust_net']
@@ -455,8 +798,16 @@ class GoogleSheetsManager:
                 self.logger.warning("沒有有效的摘要資料用於趨勢分析")
                 return False
             
+            # 優先使用滾動指標表的7日平均（涵蓋完整歷史，不受摘要期間限制）
+            if trend_df is not None and not trend_df.empty:
+                trend_dates = pd.to_datetime(summary_df['date'], format='%Y/%m/%d', errors='coerce')
+                for identity, column in (('外資', '外資7日平均'), ('自營商', '自營商7日平均'), ('投信', '投信7日平均')):
+                    if identity in trend_df.columns:
+                        summary_df[column] = trend_dates.map(trend_df[identity]).round(2).fillna(0).values
+                    else:
+                        summary_df[column] = 0
             # 計算移動平均（至少需要1筆資料）
-            if len(summary_df) >= 1:
+            elif len(summary_df) >= 1:
                 summary_df['外資7日平均'] = summary_df['foreign_net'].rolling(7, min_periods=1).mean().round(2)
                 summary_df['自營商7日平均'] = summary_df['dealer_net'].rolling(7, min_periods=1).mean().round(2)
                 summary_df['投信7日平均'] = summary_df['trust_net'].rolling(7, min_periods=1).mean().round(2)
@@ -466,27 +817,17 @@ class GoogleSheetsManager:
                 summary_df['自營商7日平均'] = 0  
                 summary_df['投信7日平均'] = 0
             
-            # 清除舊資料
-            worksheet.batch_clear(["A2:Z1000"])
-            
-            # 準備趨勢資料
-            data_to_upload = []
-            for _, row in summary_df.iterrows():
-                data_row = [
-                    str(row.get('date', '')),
-                    int(row.get('foreign_net', 0)) if pd.notna(row.get('foreign_net', 0)) else 0,
-                    int(row.get('dealer_net', 0)) if pd.notna(row.get('dealer_net', 0)) else 0,
-                    int(row.get('trust_net', 0)) if pd.notna(row.get('trust_net', 0)) else 0,
-                    round(float(row.get('外資7日平均', 0)), 2) if pd.notna(row.get('外資7日平均', 0)) else 0,
-                    round(float(row.get('自營商7日平均', 0)), 2) if pd.notna(row.get('自營商7日平均', 0)) else 0,
-                    round(float(row.get('投信7日平均', 0)), 2) if pd.notna(row.get('投信7日平均', 0)) else 0
-                ]
-                data_to_upload.append(data_row)
-            
-            # 上傳資料
-            if data_to_upload:
-                worksheet.update('A2', data_to_upload)
-                self.logger.info(f"成功更新趨勢分析資料")
+            with self.batch_writes() as batch:
+                # 清除舊資料
+                batch.clear(worksheet, "A2:Z1000")
+                
+                # 準備趨勢資料
+                data_to_upload = sheet_rows(trend_to_sheets(summary_df))
+                
+                # 上傳資料
+                if data_to_upload:
+                    batch.update(worksheet, 'A2', data_to_upload)
+                    self.logger.info(f"成功更新趨勢分析資料")
             
             return True
             
@@ -500,7 +841,7 @@ class GoogleSheetsManager:
             return False
         
         try:
-            worksheet = self.spreadsheet.worksheet("系統資訊")
+            worksheet = self._worksheet("系統資訊")
             
             # 系統資訊
             info_data = [
@@ -517,16 +858,16 @@ class GoogleSheetsManager:
                 ["分享功能", "點擊右上角分享按鈕", ""]
             ]
             
-            # 清除並更新
-            worksheet.clear()
-            worksheet.update('A1', [["項目", "數值", "說明"]])
-            worksheet.update('A2', info_data)
-            
-            # 格式化
-            worksheet.format('A1:C1', {
-                'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 0.9},
-                'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}}
-            })
+            with self.batch_writes() as batch:
+                # 清除並更新
+                batch.clear(worksheet)
+                batch.update(worksheet, 'A1', [["項目", "數值", "說明"]] + info_data)
+                
+                # 格式化
+                batch.format(worksheet, 'A1:C1', {
+                    'backgroundColor': {'red': 0.2, 'green': 0.6, 'blue': 0.9},
+                    'textFormat': {'bold': True, 'foregroundColor': {'red': 1, 'green': 1, 'blue': 1}}
+                })
             
             return True
             
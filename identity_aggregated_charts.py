@@ -13,6 +13,7 @@ import logging
 import os
 from datetime import datetime, timedelta
 import seaborn as sns
+from schema_mapping import typed_frame
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -22,6 +23,36 @@ logger = logging.getLogger("身分別圖表生成")
 plt.rcParams['font.sans-serif'] = ['Microsoft JhengHei', 'SimHei', 'Arial Unicode MS']
 plt.rcParams['axes.unicode_minus'] = False
 
+def load_identity_data_from_database(aggregate=True, days=30, db_path="data/taifex_data.db"):
+    """
+    從資料庫的滾動指標表載入身分別資料（整體市場已預先加總）
+    
+    Args:
+        aggregate (bool): True=讀取整體市場序列，False=三大法人分別讀取
+        days (int): 取最近幾個交易日
+        db_path (str): SQLite資料庫路徑
+    """
+    from rolling_metrics import RollingMetricsStore, MARKET_IDENTITY, INSTITUTIONS, ALL_CONTRACTS
+    
+    store = RollingMetricsStore(db_path)
+    identities = [MARKET_IDENTITY] if aggregate else list(INSTITUTIONS)
+    frames = []
+    for metric, column in (('net_trade_volume', '多空淨額交易口數'), ('net_position_volume', '多空淨額未平倉口數')):
+        series = store.get_series(metric, window=store.windows[0], identities=identities)
+        series = series[series['contract_code'] != ALL_CONTRACTS]
+        frames.append(series[['date', 'contract_code', 'identity_type', 'value']].rename(columns={'value': column}))
+    
+    df = frames[0].merge(frames[1], on=['date', 'contract_code', 'identity_type'], how='outer').fillna(0)
+    df = df.rename(columns={'date': '日期', 'contract_code': '契約名稱', 'identity_type': '身份別'})
+    
+    # 取最近N個交易日
+    recent_dates = sorted(df['日期'].unique())[-days:]
+    df = df[df['日期'].isin(recent_dates)].reset_index(drop=True)
+    
+    if not df.empty:
+        logger.info(f"✅ 從資料庫滾動指標表載入 {len(df)} 筆身分別資料")
+    return df
+
 def load_and_process_identity_data(aggregate=True):
     """
     載入並處理身分別資料
@@ -35,26 +66,15 @@ def load_and_process_identity_data(aggregate=True):
         logger.info("🔍 載入Google Sheets身分別資料...")
         
         gm = GoogleSheetsManager()
-        spreadsheet = gm.client.open('台期所資料分析')
-        ws = spreadsheet.worksheet('歷史資料')
+        gm.spreadsheet = gm.client.open('台期所資料分析')
         
-        # 獲取所有資料
-        all_values = ws.get_all_values()
+        # 獲取所有資料（本機鏡像，試算表沒有修改時不重新下載）
+        all_values = gm.mirror.get_all_values('歷史資料')
         headers = all_values[0]
         data_rows = all_values[1:]
         
-        df = pd.DataFrame(data_rows, columns=headers)
-        
-        # 過濾空行
-        df = df[df['日期'].str.strip() != '']
-        
-        # 轉換日期
-        df['日期'] = pd.to_datetime(df['日期'], format='%Y/%m/%d')
-        
-        # 轉換數值欄位
-        numeric_cols = ['多空淨額交易口數', '多空淨額未平倉口數']
-        for col in numeric_cols:
-            df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
+        # 統一型別（空行的日期無法解析會被移除）
+        df = typed_frame(pd.DataFrame(data_rows, columns=headers))
         
         # 過濾最近30個工作日
         end_date = datetime.now()
@@ -78,7 +98,7 @@ def load_and_process_identity_data(aggregate=True):
             # 加總模式：將三種身分別加總
             logger.info("📊 使用加總模式 - 將三種身分別加總為市場整體")
             
-            result_df = df_filtered.groupby(['日期', '契約名稱']).agg({
+            result_df = df_filtered.groupby(['日期', '契約名稱'], observed=True).agg({
                 '多空淨額交易口數': 'sum',
                 '多空淨額未平倉口數': 'sum'
             }).reset_index()
@@ -296,8 +316,15 @@ def main():
             separate_identities = False
             logger.info("📊 選擇模式: 整體市場加總")
         
-        # 1. 載入資料
-        df = load_and_process_identity_data(aggregate=aggregate_mode)
+        # 1. 載入資料（優先使用資料庫的預先彙總序列）
+        try:
+            df = load_identity_data_from_database(aggregate=aggregate_mode)
+        except Exception as e:
+            logger.warning(f"⚠️ 資料庫載入失敗，改從Google Sheets載入: {e}")
+            df = pd.DataFrame()
+        
+        if df.empty:
+            df = load_and_process_identity_data(aggregate=aggregate_mode)
         
         if df.empty:
             logger.error("❌ 無法載入資料")
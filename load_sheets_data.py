@@ -9,6 +9,7 @@ import pandas as pd
 import logging
 import os
 from datetime import datetime, timedelta
+from schema_mapping import typed_frame
 
 # 設定日誌
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -33,18 +34,8 @@ def load_all_sheets_data():
         
         # 嘗試從配置檔案載入試算表ID
         try:
-            import json
-            from pathlib import Path
-            
-            config_file = Path("config/spreadsheet_config.json")
-            if config_file.exists():
-                with open(config_file, 'r', encoding='utf-8') as f:
-                    config = json.load(f)
-                    spreadsheet_id = config.get('spreadsheet_id')
-                    
-                    if spreadsheet_id:
-                        sheets_manager.connect_spreadsheet(spreadsheet_id)
-                        logger.info(f"✅ 已連接到現有試算表: {config.get('spreadsheet_url', '')}")
+            if sheets_manager.connect_configured_spreadsheet():
+                logger.info(f"✅ 已連接到現有試算表: {sheets_manager.get_spreadsheet_url()}")
         except Exception as e:
             logger.warning(f"無法載入配置檔案: {e}")
         
@@ -73,7 +64,7 @@ def load_all_sheets_data():
         logger.info(f"📊 試算表包含 {len(worksheets)} 個工作表:")
         for ws in worksheets:
             try:
-                row_count = len(ws.get_all_values())
+                row_count = sheets_manager.row_count(ws.title)
                 logger.info(f"  • {ws.title}: {row_count} 行")
             except:
                 logger.info(f"  • {ws.title}: 無法讀取")
@@ -91,11 +82,10 @@ def load_all_sheets_data():
         
         for ws_name in worksheet_priority:
             try:
-                worksheet = sheets_manager.spreadsheet.worksheet(ws_name)
                 logger.info(f"📖 嘗試從工作表「{ws_name}」載入資料...")
                 
-                # 獲取所有資料
-                data = worksheet.get_all_records()
+                # 獲取所有資料（本機鏡像，試算表沒有修改時不重新下載）
+                data = sheets_manager.mirror.get_all_records(ws_name)
                 
                 if data:
                     df = pd.DataFrame(data)
@@ -115,7 +105,7 @@ def load_all_sheets_data():
             for ws in worksheets:
                 try:
                     logger.info(f"📖 嘗試從工作表「{ws.title}」載入資料...")
-                    data = ws.get_all_records()
+                    data = sheets_manager.mirror.get_all_records(ws.title)
                     
                     if data and len(data) > 10:  # 至少要有10筆資料才算有效
                         df = pd.DataFrame(data)
@@ -138,11 +128,9 @@ def load_all_sheets_data():
         
         logger.info(f"📊 總共載入 {len(final_df)} 筆資料")
         
-        # 資料預處理
+        # 資料預處理：統一型別（日期 datetime64、契約與身份別 category、數值 int64，無效日期移除）
+        final_df = typed_frame(final_df)
         if '日期' in final_df.columns:
-            final_df['日期'] = pd.to_datetime(final_df['日期'], errors='coerce')
-            final_df = final_df.dropna(subset=['日期'])
-            
             logger.info(f"📅 日期範圍: {final_df['日期'].min()} 到 {final_df['日期'].max()}")
             
             # 計算有多少天的資料
@@ -205,11 +193,9 @@ def generate_30day_charts_from_sheets():
             if col not in df.columns:
                 # 嘗試從其他欄位推導
                 if '多空淨額交易口數' not in df.columns and '多方交易口數' in df.columns and '空方交易口數' in df.columns:
-                    df['多空淨額交易口數'] = pd.to_numeric(df['多方交易口數'], errors='coerce').fillna(0) - pd.to_numeric(df['空方交易口數'], errors='coerce').fillna(0)
+                    df['多空淨額交易口數'] = df['多方交易口數'] - df['空方交易口數']
                 else:
                     df[col] = 0
-            else:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
         
         logger.info(f"✅ 資料預處理完成，最終有 {len(df)} 筆有效資料")
         
@@ -0,0 +1,243 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所Parquet歷史歸檔
+依 年度/契約 分割儲存，契約與身份別使用字典編碼、數值欄位為int64，
+讀取時支援條件下推（只讀需要的分割與列群組）與欄位裁剪
+"""
+
+import os
+import logging
+import pandas as pd
+from pathlib import Path
+from datetime import datetime
+from schema_mapping import KEY_COLUMNS, METRIC_COLUMNS, CSV_COLUMN_MAP
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    import pyarrow.dataset as ds
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+ARCHIVE_COLUMNS = KEY_COLUMNS + METRIC_COLUMNS
+
+
+def _archive_schema():
+    """歸檔檔案的欄位型別"""
+    return pa.schema(
+        [
+            ('date', pa.date32()),
+            ('contract_code', pa.dictionary(pa.int32(), pa.string())),
+            ('identity_type', pa.dictionary(pa.int32(), pa.string())),
+        ]
+        + [(col, pa.int64()) for col in METRIC_COLUMNS]
+    )
+
+
+def _partitioning():
+    """目錄分割方式：year=YYYY/contract=XXX"""
+    return ds.partitioning(
+        pa.schema([('year', pa.int16()), ('contract', pa.string())]),
+        flavor='hive'
+    )
+
+
+class ParquetArchive:
+    """依年度與契約分割的Parquet歸檔"""
+
+    def __init__(self, root="data/parquet_archive"):
+        """
+        初始化歸檔
+
+        Args:
+            root: 歸檔根目錄
+        """
+        if not PYARROW_AVAILABLE:
+            raise ImportError("Parquet歸檔需要 pyarrow，請執行 pip install pyarrow")
+
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.logger = logging.getLogger(__name__)
+
+    def attach(self, db_manager):
+        """掛到資料庫管理器上，每次寫入提交後同步受影響的分割"""
+        def sync(df):
+            self.sync_from_database(db_manager, df)
+        db_manager.register_commit_hook(sync)
+        return self
+
+    def _partition_path(self, year, contract):
+        """分割檔案路徑"""
+        return self.root / f"year={year}" / f"contract={contract}" / "part-0.parquet"
+
+    @staticmethod
+    def _normalize(df):
+        """轉為歸檔格式：資料庫欄位、日期型別、int64數值"""
+        df = df.rename(columns=CSV_COLUMN_MAP)
+        df = df[[col for col in ARCHIVE_COLUMNS if col in df.columns]].copy()
+        for col in METRIC_COLUMNS:
+            if col not in df.columns:
+                df[col] = 0
+        df['date'] = pd.to_datetime(df['date'].astype(str).str.replace('-', '/'), format='%Y/%m/%d')
+        df['contract_code'] = df['contract_code'].astype(str)
+        df['identity_type'] = df['identity_type'].astype(str)
+        df[METRIC_COLUMNS] = df[METRIC_COLUMNS].apply(pd.to_numeric, errors='coerce').fillna(0).astype('int64')
+        return df[ARCHIVE_COLUMNS]
+
+    def write(self, df):
+        """
+        寫入（upsert）資料，只重寫受影響的 年度/契約 分割
+
+        Args:
+            df: 資料庫格式或爬蟲中文欄位格式的DataFrame
+
+        Returns:
+            int: 重寫的分割數
+        """
+        if df is None or df.empty:
+            return 0
+
+        df = self._normalize(df)
+        schema = _archive_schema()
+        rewritten = 0
+
+        for (year, contract), rows in df.groupby([df['date'].dt.year, 'contract_code']):
+            path = self._partition_path(year, contract)
+            if path.exists():
+                existing = pq.read_table(path).to_pandas()
+                existing['date'] = pd.to_datetime(existing['date'])
+                existing['contract_code'] = existing['contract_code'].astype(str)
+                existing['identity_type'] = existing['identity_type'].astype(str)
+                rows = pd.concat([existing, rows], ignore_index=True)
+
+            rows = (
+                rows.drop_duplicates(subset=KEY_COLUMNS, keep='last')
+                .sort_values(['date', 'identity_type'])
+                .reset_index(drop=True)
+            )
+            rows['date'] = rows['date'].dt.date
+
+            table = pa.Table.from_pandas(rows, schema=schema, preserve_index=False)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.parquet.tmp')
+            pq.write_table(table, tmp_path, compression='zstd', use_dictionary=['contract_code', 'identity_type'])
+            os.replace(tmp_path, path)
+            rewritten += 1
+
+        self.logger.info(f"📦 Parquet歸檔已更新 {rewritten} 個分割（{len(df)} 筆）")
+        return rewritten
+
+    def sync_from_database(self, db_manager, df):
+        """依剛寫入的資料，從資料庫取完整欄位後更新歸檔"""
+        if df.empty or 'date' not in df.columns:
+            return 0
+        dates = pd.to_datetime(df['date'].astype(str).str.replace('-', '/'), format='%Y/%m/%d')
+        rows = db_manager.query(
+            start=dates.min(),
+            end=dates.max(),
+            contracts=sorted(df['contract_code'].astype(str).unique()),
+            columns=ARCHIVE_COLUMNS,
+            as_='records'
+        )
+        return self.write(pd.DataFrame(rows, columns=ARCHIVE_COLUMNS))
+
+    def import_csv(self, csv_path):
+        """匯入爬蟲輸出的CSV（中文欄位）"""
+        df = pd.read_csv(csv_path, encoding='utf-8-sig')
+        self.logger.info(f"📥 匯入 {csv_path}：{len(df)} 筆")
+        return self.write(df)
+
+    def import_database(self, db_manager):
+        """匯入資料庫中的全部資料"""
+        rows = db_manager.query(columns=ARCHIVE_COLUMNS, as_='records')
+        return self.write(pd.DataFrame(rows, columns=ARCHIVE_COLUMNS))
+
+    def dataset(self):
+        """取得整個歸檔的 pyarrow Dataset"""
+        return ds.dataset(self.root, format='parquet', partitioning=_partitioning(), schema=_archive_schema().append(pa.field('year', pa.int16())).append(pa.field('contract', pa.string())))
+
+    def read(self, start=None, end=None, contracts=None, identities=None, columns=None, as_='pandas'):
+        """
+        讀取歸檔資料
+
+        Args:
+            start: 起始日期（含），datetime 或 'YYYY/MM/DD' 字串
+            end: 結束日期（含）
+            contracts: 契約代碼列表（以目錄分割直接略過其他契約）
+            identities: 身份別列表
+            columns: 要讀取的欄位，None 表示全部
+            as_: 回傳格式，'pandas' 或 'arrow'
+
+        Returns:
+            DataFrame 或 pyarrow.Table
+        """
+        if as_ not in ('pandas', 'arrow'):
+            raise ValueError(f"不支援的回傳格式: {as_}")
+
+        columns = list(columns) if columns else ARCHIVE_COLUMNS
+        unknown = [col for col in columns if col not in ARCHIVE_COLUMNS]
+        if unknown:
+            raise ValueError(f"未知的欄位: {unknown}")
+
+        # 分割欄位的條件可以略過整個目錄，date 條件再下推到列群組統計
+        conditions = []
+        if start is not None:
+            start = pd.Timestamp(str(start).replace('/', '-')).date()
+            conditions += [ds.field('year') >= start.year, ds.field('date') >= start]
+        if end is not None:
+            end = pd.Timestamp(str(end).replace('/', '-')).date()
+            conditions += [ds.field('year') <= end.year, ds.field('date') <= end]
+        if contracts is not None:
+            contracts = [contracts] if isinstance(contracts, str) else list(contracts)
+            conditions.append(ds.field('contract').isin(contracts))
+        if identities is not None:
+            identities = [identities] if isinstance(identities, str) else list(identities)
+            conditions.append(ds.field('identity_type').isin(identities))
+
+        expression = None
+        for condition in conditions:
+            expression = condition if expression is None else expression & condition
+
+        if not any(self.root.glob('year=*/contract=*/*.parquet')):
+            table = _archive_schema().empty_table().select(columns)
+        else:
+            table = self.dataset().to_table(columns=columns, filter=expression)
+
+        if as_ == 'arrow':
+            return table
+
+        df = table.to_pandas()
+        if 'date' in df.columns:
+            df['date'] = pd.to_datetime(df['date'])
+        sort_columns = [col for col in KEY_COLUMNS if col in df.columns]
+        if sort_columns:
+            df = df.sort_values(sort_columns, ignore_index=True)
+        return df
+
+
+def main():
+    """將 output/ 的歷年CSV與資料庫內容匯入Parquet歸檔"""
+    from database_manager import TaifexDatabaseManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    print("📦 建立台期所Parquet歷史歸檔")
+    archive = ParquetArchive()
+
+    # 先匯入歷年CSV，資料庫中較新的資料最後寫入並覆蓋
+    for csv_path in sorted(Path("output").glob("taifex_*.csv")):
+        archive.import_csv(csv_path)
+
+    archive.import_database(TaifexDatabaseManager())
+
+    started = datetime.now()
+    df = archive.read(columns=['date', 'contract_code', 'identity_type', 'net_position_volume'])
+    elapsed = (datetime.now() - started).total_seconds() * 1000
+    print(f"✅ 歸檔完成，共 {len(df)} 筆，全量讀取耗時 {elapsed:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
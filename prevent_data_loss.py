@@ -7,10 +7,9 @@
 import sqlite3
 import pandas as pd
 from pathlib import Path
-import json
-import shutil
 from datetime import datetime
 from google_sheets_manager import GoogleSheetsManager
+from backup_manager import BackupManager
 
 class DataProtectionMonitor:
     """資料保護監控器"""
@@ -18,19 +17,20 @@ class DataProtectionMonitor:
     def __init__(self):
         self.backup_dir = Path("backup")
         self.backup_dir.mkdir(exist_ok=True)
+        self.backup_manager = BackupManager("data/taifex_data.db", self.backup_dir)
         
     def create_daily_backup(self):
-        """創建每日資料庫備份"""
+        """創建每日資料庫備份（每週一次線上基底備份，其餘日子只存增量）"""
         try:
             db_path = Path("data/taifex_data.db")
             if db_path.exists():
-                backup_name = f"taifex_data_backup_{datetime.now().strftime('%Y%m%d')}.db"
-                backup_path = self.backup_dir / backup_name
-                
-                shutil.copy2(db_path, backup_path)
-                print(f"✅ 每日備份完成: {backup_name}")
+                backup_path = self.backup_manager.backup()
+                if backup_path:
+                    print(f"✅ 每日備份完成: {backup_path.name}")
+                else:
+                    print("✅ 自上次備份後沒有異動，無需備份")
                 
-                # 清理7天前的備份
+                # 清理過舊的備份
                 self.cleanup_old_backups()
                 return True
             else:
@@ -41,17 +41,11 @@ class DataProtectionMonitor:
             print(f"❌ 備份失敗: {e}")
             return False
     
-    def cleanup_old_backups(self, keep_days=7):
-        """清理舊備份檔案"""
+    def cleanup_old_backups(self, keep_bases=4):
+        """清理舊備份檔案（保留最近N個基底備份及其增量）"""
         try:
-            backup_files = list(self.backup_dir.glob("taifex_data_backup_*.db"))
-            backup_files.sort(key=lambda x: x.stat().st_mtime, reverse=True)
-            
-            # 保留最近N天的備份
-            if len(backup_files) > keep_days:
-                for old_backup in backup_files[keep_days:]:
-                    old_backup.unlink()
-                    print(f"🗑️ 清理舊備份: {old_backup.name}")
+            for old_backup in self.backup_manager.cleanup(keep_bases):
+                print(f"🗑️ 清理舊備份: {old_backup}")
                     
         except Exception as e:
             print(f"⚠️ 清理舊備份失敗: {e}")
@@ -59,21 +53,15 @@ class DataProtectionMonitor:
     def check_sheets_data_integrity(self):
         """檢查Google Sheets資料完整性"""
         try:
-            config_file = Path("config/spreadsheet_config.json")
-            if not config_file.exists():
+            if not Path("config/spreadsheet_config.json").exists():
                 print("❌ 找不到Google Sheets設定檔")
                 return False
             
-            with open(config_file, 'r', encoding='utf-8') as f:
-                config = json.load(f)
-            
             sheets_manager = GoogleSheetsManager()
-            sheets_manager.connect_spreadsheet(config['spreadsheet_id'])
+            sheets_manager.connect_configured_spreadsheet()
             
             if sheets_manager.spreadsheet:
-                worksheet = sheets_manager.spreadsheet.worksheet("歷史資料")
-                all_data = worksheet.get_all_values()
-                current_rows = len(all_data)
+                current_rows = sheets_manager.row_count("歷史資料")
                 
                 print(f"📊 Google Sheets目前狀況:")
                 print(f"  - 總行數: {current_rows}")
@@ -82,7 +70,7 @@ class DataProtectionMonitor:
                     print("⚠️ 警告: Google Sheets資料量異常少，可能需要檢查")
                     return False
                 elif current_rows > 9500:
-                    print("⚠️ 警告: Google Sheets接近行數限制，建議整理資料")
+                    print("⚠️ 警告: Google Sheets接近行數限制，建議執行 python sheets_archiver.py 歸檔舊年度資料")
                     return False
                 else:
                     print("✅ Google Sheets資料量正常")
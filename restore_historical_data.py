@@ -7,10 +7,10 @@
 import pandas as pd
 import json
 from pathlib import Path
-from datetime import datetime, timedelta
+from datetime import datetime
 from google_sheets_manager import GoogleSheetsManager
 from database_manager import TaifexDatabaseManager
-import sqlite3
+from schema_mapping import db_to_sheets
 
 def restore_from_output_files():
     """從output目錄的CSV/Excel檔案恢復資料"""
@@ -44,54 +44,38 @@ def restore_from_output_files():
     
     return pd.DataFrame()
 
-def restore_from_database():
+def restore_from_backups():
+    """從線上備份（基底＋增量）重建資料庫後恢復資料"""
+    print("💾 從資料庫備份恢復資料...")
+    
+    try:
+        from backup_manager import BackupManager
+        
+        restored_path = Path("backup") / f"restored_{datetime.now().strftime('%Y%m%d_%H%M%S')}.db"
+        BackupManager().restore(target_path=restored_path)
+        return restore_from_database(restored_path)
+    
+    except FileNotFoundError:
+        print("ℹ️ 尚無資料庫備份")
+    except Exception as e:
+        print(f"❌ 從備份恢復失敗: {e}")
+    
+    return pd.DataFrame()
+
+def restore_from_database(db_path="data/taifex_data.db"):
     """從資料庫恢復所有資料"""
-    print("🗄️ 從資料庫恢復資料...")
+    print(f"🗄️ 從資料庫恢復資料: {db_path}")
     
     try:
-        db_manager = TaifexDatabaseManager()
+        db_manager = TaifexDatabaseManager(db_path)
         # 獲取所有歷史資料
-        query = """
-            SELECT date, contract_code, identity_type, 
-                   long_position, short_position, net_position,
-                   created_at
-            FROM futures_data 
-            ORDER BY date, contract_code, identity_type
-        """
+        df = db_manager.query()
         
-        db_path = Path("data/taifex_data.db")
-        if db_path.exists():
-            conn = sqlite3.connect(db_path)
-            df = pd.read_sql_query(query, conn)
-            conn.close()
-            
-            if not df.empty:
-                # 轉換為Google Sheets格式
-                converted_data = []
-                for _, row in df.iterrows():
-                    converted_row = {
-                        '日期': row.get('date', ''),
-                        '契約名稱': row.get('contract_code', ''),
-                        '身份別': row.get('identity_type', ''),
-                        '多方交易口數': row.get('long_position', 0),
-                        '多方契約金額': '',
-                        '空方交易口數': row.get('short_position', 0),
-                        '空方契約金額': '',
-                        '多空淨額交易口數': row.get('net_position', 0),
-                        '多空淨額契約金額': '',
-                        '多方未平倉口數': '',
-                        '多方未平倉契約金額': '',
-                        '空方未平倉口數': '',
-                        '空方未平倉契約金額': '',
-                        '多空淨額未平倉口數': '',
-                        '多空淨額未平倉契約金額': '',
-                        '更新時間': row.get('created_at', '')
-                    }
-                    converted_data.append(converted_row)
-                
-                result_df = pd.DataFrame(converted_data)
-                print(f"✅ 從資料庫恢復 {len(result_df)} 筆資料")
-                return result_df
+        if not df.empty:
+            # 轉換為Google Sheets格式
+            result_df = db_to_sheets(df, updated_at_column='created_at')
+            print(f"✅ 從資料庫恢復 {len(result_df)} 筆資料")
+            return result_df
         
     except Exception as e:
         print(f"❌ 從資料庫恢復失敗: {e}")
@@ -115,7 +99,7 @@ def check_google_sheets_backup():
             
             print("📋 可用的工作表:")
             for ws in worksheets:
-                row_count = len(ws.get_all_values())
+                row_count = sheets_manager.row_count(ws.title)
                 print(f"  - {ws.title}: {row_count} 行")
                 
                 # 如果找到有資料的工作表（除了歷史資料）
@@ -136,10 +120,13 @@ def main():
     # 2. 從資料庫恢復
     db_data = restore_from_database()
     
-    # 3. 從輸出檔案恢復
+    # 3. 從資料庫備份恢復（資料庫本身損毀或被誤刪時）
+    backup_data = restore_from_backups()
+    
+    # 4. 從輸出檔案恢復
     file_data = restore_from_output_files()
     
-    # 4. 合併所有資料
+    # 5. 合併所有資料
     print("\n🔄 合併恢復的資料...")
     all_restored_data = []
     
@@ -147,6 +134,10 @@ def main():
         all_restored_data.append(db_data)
         print(f"  ✅ 資料庫: {len(db_data)} 筆")
     
+    if not backup_data.empty:
+        all_restored_data.append(backup_data)
+        print(f"  ✅ 資料庫備份: {len(backup_data)} 筆")
+    
     if not file_data.empty:
         all_restored_data.append(file_data)
         print(f"  ✅ 輸出檔案: {len(file_data)} 筆")
@@ -160,7 +151,7 @@ def main():
         
         print(f"\n📊 總共恢復 {len(final_data)} 筆資料")
         
-        # 5. 詢問是否要恢復到Google Sheets
+        # 6. 詢問是否要恢復到Google Sheets
         print("\n⚠️  重要提醒：")
         print("1. 此操作將恢復歷史資料到Google Sheets")
         print("2. 如果資料量過大，可能會接近Google Sheets限制")
@@ -0,0 +1,423 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所滾動指標物化表
+為每個 (契約, 身份別, 指標) 序列維護多個視窗的滾動總和、平均與標準差，
+新交易日寫入時只需 O(視窗數) 的增量更新，報告與圖表直接讀取現成序列；
+futures_data 有資料列被刪除時由觸發器標記過期，下次寫入或讀取前全量重建
+"""
+
+import sqlite3
+import math
+import logging
+import pandas as pd
+from pathlib import Path
+from database_writer import get_writer
+from database_manager import _format_db_date
+
+# 預設的滾動視窗（交易日數）
+DEFAULT_WINDOWS = (5, 7, 20, 60, 250)
+
+# 預設維護的指標欄位
+DEFAULT_METRICS = ('net_trade_volume', 'net_position_volume')
+
+# 三大法人身份別（整體市場由這三者加總）
+INSTITUTIONS = ('自營商', '投信', '外資')
+
+# 彙總序列使用的代號
+MARKET_IDENTITY = '整體市場'
+ALL_CONTRACTS = 'ALL'
+
+SERIES_KEYS = ['contract_code', 'identity_type', 'metric']
+
+
+def _std(value_sum, value_sumsq, count):
+    """由總和與平方和計算樣本標準差（與 pandas rolling std 相同，ddof=1）"""
+    if count < 2:
+        return None
+    variance = (value_sumsq - value_sum * value_sum / count) / (count - 1)
+    return math.sqrt(max(variance, 0))
+
+
+class RollingMetricsStore:
+    """滾動視窗指標的物化表"""
+
+    def __init__(self, db_path="data/taifex_data.db", windows=DEFAULT_WINDOWS, metrics=DEFAULT_METRICS):
+        """
+        初始化滾動指標表
+
+        Args:
+            db_path: SQLite資料庫路徑
+            windows: 要維護的視窗長度（交易日數）
+            metrics: 要維護的 futures_data 指標欄位
+        """
+        self.db_path = Path(db_path)
+        self.windows = tuple(sorted(set(int(w) for w in windows)))
+        self.metrics = tuple(metrics)
+        self.logger = logging.getLogger(__name__)
+
+        self.init_tables()
+        if self._needs_rebuild():
+            self.rebuild()
+
+    def init_tables(self):
+        """建立滾動指標資料表與刪除觸發器（經由共用寫入器執行）"""
+        get_writer(self.db_path).submit_statements([self._init_tables]).result()
+
+    def _init_tables(self, conn):
+        """在寫入器的交易中建立資料表"""
+        cursor = conn.cursor()
+
+        # 各序列的原始值，seq 為該序列的交易日序號
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rolling_values (
+                contract_code TEXT NOT NULL,
+                identity_type TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                value INTEGER,
+                PRIMARY KEY (contract_code, identity_type, metric, seq)
+            )
+        ''')
+
+        # 各視窗的滾動統計
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rolling_metrics (
+                contract_code TEXT NOT NULL,
+                identity_type TEXT NOT NULL,
+                metric TEXT NOT NULL,
+                window_size INTEGER NOT NULL,
+                seq INTEGER NOT NULL,
+                date TEXT NOT NULL,
+                value_sum INTEGER,
+                value_sumsq INTEGER,
+                value_count INTEGER,
+                mean REAL,
+                std REAL,
+                PRIMARY KEY (contract_code, identity_type, metric, window_size, seq)
+            )
+        ''')
+
+        cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_rolling_values_date ON rolling_values(contract_code, identity_type, metric, date)')
+        cursor.execute('CREATE INDEX IF NOT EXISTS idx_rolling_metrics_date ON rolling_metrics(metric, window_size, date)')
+
+        # 刪除資料無法增量扣回（後續所有視窗都會改變），只標記過期，之後重建
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS rolling_state (
+                name TEXT PRIMARY KEY,
+                value TEXT
+            )
+        ''')
+        has_futures = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'futures_data'"
+        ).fetchone() is not None
+        if has_futures:
+            cursor.execute('''
+                CREATE TRIGGER IF NOT EXISTS trg_futures_data_rolling_delete AFTER DELETE ON futures_data
+                BEGIN
+                    INSERT OR REPLACE INTO rolling_state (name, value) VALUES ('stale', '1');
+                END
+            ''')
+        return 0
+
+    @staticmethod
+    def _is_stale(conn):
+        """futures_data 自上次重建後是否有資料被刪除"""
+        return conn.execute("SELECT 1 FROM rolling_state WHERE name = 'stale'").fetchone() is not None
+
+    def attach(self, db_manager):
+        """掛到資料庫管理器上，之後每次寫入都在同一交易中增量更新"""
+        db_manager.register_insert_hook(self.apply)
+        return self
+
+    def _needs_rebuild(self):
+        """視窗/指標設定變更、futures_data 有資料被刪除，或已有資料但尚未建立滾動表時需要重建"""
+        conn = sqlite3.connect(self.db_path)
+        try:
+            stored = conn.execute('SELECT DISTINCT metric, window_size FROM rolling_metrics').fetchall()
+            has_data = conn.execute('SELECT 1 FROM futures_data LIMIT 1').fetchone() is not None
+            stale = self._is_stale(conn)
+        except sqlite3.OperationalError:
+            return False
+        finally:
+            conn.close()
+
+        if stale:
+            return True
+        expected = {(metric, window) for metric in self.metrics for window in self.windows}
+        if not stored:
+            return has_data
+        return set(stored) != expected
+
+    def rebuild(self):
+        """從 futures_data 全量重建滾動指標（經由共用寫入器執行）"""
+        get_writer(self.db_path).submit_statements([self._rebuild]).result()
+        self.logger.info("✅ 滾動指標重建完成")
+
+    def _series_frame(self, conn, dates=None):
+        """
+        從 futures_data 取出各序列的值（長格式），含整體市場與全部契約彙總
+
+        Args:
+            conn: 資料庫連線
+            dates: 只取指定日期（None 表示全部）
+
+        Returns:
+            DataFrame: date, contract_code, identity_type, metric, value
+        """
+        sql = f"SELECT date, contract_code, identity_type, {', '.join(self.metrics)} FROM futures_data"
+        params = []
+        if dates is not None:
+            # 以日期範圍讀取再篩選，大量回補時不會超過SQLite的參數個數上限
+            dates = sorted(set(dates))
+            sql += " WHERE date BETWEEN ? AND ?"
+            params = [dates[0], dates[-1]]
+
+        df = pd.read_sql_query(sql, conn, params=params)
+        if dates is not None:
+            df = df[df['date'].isin(dates)]
+        df = df[df['identity_type'] != MARKET_IDENTITY]
+        df[list(self.metrics)] = df[list(self.metrics)].fillna(0).astype('int64')
+
+        # 三大法人加總為整體市場
+        institutions = df[df['identity_type'].isin(INSTITUTIONS)]
+        market = institutions.groupby(['date', 'contract_code'], as_index=False)[list(self.metrics)].sum()
+        market['identity_type'] = MARKET_IDENTITY
+        by_contract = pd.concat([df, market], ignore_index=True)
+
+        # 各身份別跨契約加總
+        all_contracts = by_contract.groupby(['date', 'identity_type'], as_index=False)[list(self.metrics)].sum()
+        all_contracts['contract_code'] = ALL_CONTRACTS
+        full = pd.concat([by_contract, all_contracts], ignore_index=True)
+
+        return full.melt(
+            id_vars=['date', 'contract_code', 'identity_type'],
+            value_vars=list(self.metrics),
+            var_name='metric',
+            value_name='value'
+        )
+
+    def _rebuild(self, conn):
+        """在寫入交易中全量重建"""
+        conn.execute('DELETE FROM rolling_values')
+        conn.execute('DELETE FROM rolling_metrics')
+        conn.execute("DELETE FROM rolling_state WHERE name = 'stale'")
+
+        values = self._series_frame(conn).sort_values(SERIES_KEYS + ['date'], ignore_index=True)
+        if values.empty:
+            return 0
+
+        values['seq'] = values.groupby(SERIES_KEYS).cumcount() + 1
+        values['value_sq'] = values['value'] * values['value']
+        conn.executemany(
+            'INSERT INTO rolling_values (contract_code, identity_type, metric, seq, date, value) VALUES (?, ?, ?, ?, ?, ?)',
+            values[SERIES_KEYS + ['seq', 'date', 'value']].astype(object).itertuples(index=False, name=None)
+        )
+
+        # 以累積和相減得到各視窗總和
+        grouped = values.groupby(SERIES_KEYS)
+        cum_sum = grouped['value'].cumsum()
+        cum_sumsq = grouped['value_sq'].cumsum()
+
+        for window in self.windows:
+            value_sum = cum_sum - cum_sum.groupby([values[k] for k in SERIES_KEYS]).shift(window, fill_value=0)
+            value_sumsq = cum_sumsq - cum_sumsq.groupby([values[k] for k in SERIES_KEYS]).shift(window, fill_value=0)
+            value_count = values['seq'].clip(upper=window)
+
+            rows = (
+                (contract, identity, metric, window, int(seq), date,
+                 int(total), int(total_sq), int(count), total / count, _std(total, total_sq, count))
+                for contract, identity, metric, seq, date, total, total_sq, count in zip(
+                    values['contract_code'], values['identity_type'], values['metric'],
+                    values['seq'], values['date'], value_sum, value_sumsq, value_count
+                )
+            )
+            conn.executemany('''
+                INSERT INTO rolling_metrics
+                (contract_code, identity_type, metric, window_size, seq, date,
+                 value_sum, value_sumsq, value_count, mean, std)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', rows)
+
+        return 0
+
+    def apply(self, conn, df):
+        """
+        資料寫入後的增量更新（在寫入交易中執行）
+
+        Args:
+            conn: 寫入交易使用的連線
+            df: 本次寫入的資料庫格式DataFrame
+        """
+        if df.empty or 'date' not in df.columns:
+            return
+        if self._is_stale(conn):
+            # 之前有資料被刪除：重建時一併納入本次寫入
+            self.logger.info("🗑️ 偵測到已刪除的資料，重建滾動指標")
+            self._rebuild(conn)
+            return
+
+        dates = sorted({_format_db_date(d) for d in df['date'].unique()})
+        values = self._series_frame(conn, dates).sort_values(['date'] + SERIES_KEYS)
+
+        for date, contract, identity, metric, value in values[['date'] + SERIES_KEYS + ['value']].itertuples(index=False, name=None):
+            if not self._apply_point(conn, (contract, identity, metric), date, int(value)):
+                # 補寫較舊的日期會改變後續所有視窗，直接重建
+                self.logger.info(f"📅 補入歷史日期 {date}，重建滾動指標")
+                self._rebuild(conn)
+                return
+
+    def _apply_point(self, conn, key, date, value):
+        """
+        更新單一序列的一個交易日，成本與視窗數成正比
+
+        Returns:
+            bool: False 表示日期早於序列最後一天，需要重建
+        """
+        last = conn.execute('''
+            SELECT seq, date, value FROM rolling_values
+            WHERE contract_code = ? AND identity_type = ? AND metric = ?
+            ORDER BY seq DESC LIMIT 1
+        ''', key).fetchone()
+
+        if last is not None and date < last[1]:
+            return False
+
+        if last is not None and date == last[1]:
+            # 同一天重新寫入：只影響以該天結尾的各視窗
+            seq, _, old_value = last
+            if old_value == value:
+                return True
+            conn.execute('''
+                UPDATE rolling_values SET value = ?
+                WHERE contract_code = ? AND identity_type = ? AND metric = ? AND seq = ?
+            ''', (value,) + key + (seq,))
+
+            rows = conn.execute('''
+                SELECT window_size, value_sum, value_sumsq, value_count FROM rolling_metrics
+                WHERE contract_code = ? AND identity_type = ? AND metric = ? AND seq = ?
+            ''', key + (seq,)).fetchall()
+            updates = []
+            for window, total, total_sq, count in rows:
+                total += value - old_value
+                total_sq += value * value - old_value * old_value
+                updates.append((total, total_sq, total / count, _std(total, total_sq, count)) + key + (window, seq))
+            conn.executemany('''
+                UPDATE rolling_metrics SET value_sum = ?, value_sumsq = ?, mean = ?, std = ?
+                WHERE contract_code = ? AND identity_type = ? AND metric = ? AND window_size = ? AND seq = ?
+            ''', updates)
+            return True
+
+        # 新的交易日：前一天的視窗加上新值、減去移出視窗的舊值
+        seq = last[0] + 1 if last is not None else 1
+        conn.execute('''
+            INSERT INTO rolling_values (contract_code, identity_type, metric, seq, date, value)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', key + (seq, date, value))
+
+        previous = {
+            window: (total, total_sq, count)
+            for window, total, total_sq, count in conn.execute('''
+                SELECT window_size, value_sum, value_sumsq, value_count FROM rolling_metrics
+                WHERE contract_code = ? AND identity_type = ? AND metric = ? AND seq = ?
+            ''', key + (seq - 1,))
+        }
+        drop_seqs = [seq - window for window in self.windows if seq - window >= 1]
+        dropped = {}
+        if drop_seqs:
+            dropped = dict(conn.execute(f'''
+                SELECT seq, value FROM rolling_values
+                WHERE contract_code = ? AND identity_type = ? AND metric = ?
+                AND seq IN ({', '.join('?' * len(drop_seqs))})
+            ''', key + tuple(drop_seqs)).fetchall())
+
+        rows = []
+        for window in self.windows:
+            total, total_sq, count = previous.get(window, (0, 0, 0))
+            old_value = dropped.get(seq - window)
+            total += value
+            total_sq += value * value
+            if old_value is not None:
+                total -= old_value
+                total_sq -= old_value * old_value
+            else:
+                count += 1
+            rows.append(key + (window, seq, date, total, total_sq, count, total / count, _std(total, total_sq, count)))
+
+        conn.executemany('''
+            INSERT INTO rolling_metrics
+            (contract_code, identity_type, metric, window_size, seq, date,
+             value_sum, value_sumsq, value_count, mean, std)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ''', rows)
+        return True
+
+    def get_series(self, metric='net_trade_volume', window=7, contracts=None, identities=None,
+                   start=None, end=None, min_count=1):
+        """
+        讀取現成的滾動序列
+
+        Args:
+            metric: 指標欄位
+            window: 視窗長度（需為已維護的視窗）
+            contracts: 契約代碼列表，ALL 代表全部契約加總
+            identities: 身份別列表，整體市場代表三大法人加總
+            start: 起始日期（含）
+            end: 結束日期（含）
+            min_count: 視窗內至少要有的交易日數，未達者平均與標準差為空值
+
+        Returns:
+            DataFrame: date, contract_code, identity_type, value, sum, mean, std, count
+        """
+        if window not in self.windows:
+            raise ValueError(f"未維護的視窗長度: {window}（可用: {self.windows}）")
+        if self._needs_rebuild():
+            self.rebuild()
+
+        conditions = ['m.metric = ?', 'm.window_size = ?']
+        params = [metric, window]
+        if start is not None:
+            conditions.append('m.date >= ?')
+            params.append(_format_db_date(start))
+        if end is not None:
+            conditions.append('m.date <= ?')
+            params.append(_format_db_date(end))
+        for column, values in (('contract_code', contracts), ('identity_type', identities)):
+            if values is not None:
+                values = [values] if isinstance(values, str) else list(values)
+                conditions.append(f"m.{column} IN ({', '.join('?' * len(values))})")
+                params.extend(values)
+
+        sql = f'''
+            SELECT m.date, m.contract_code, m.identity_type, v.value,
+                   m.value_sum AS sum, m.mean, m.std, m.value_count AS count
+            FROM rolling_metrics m
+            JOIN rolling_values v
+              ON v.contract_code = m.contract_code AND v.identity_type = m.identity_type
+             AND v.metric = m.metric AND v.seq = m.seq
+            WHERE {' AND '.join(conditions)}
+            ORDER BY m.date, m.contract_code, m.identity_type
+        '''
+
+        conn = sqlite3.connect(self.db_path)
+        df = pd.read_sql_query(sql, conn, params=params)
+        conn.close()
+
+        df['date'] = pd.to_datetime(df['date'], format='%Y/%m/%d')
+        df['mean'] = df['mean'].astype('float64')
+        df['std'] = df['std'].astype('float64')
+        df.loc[df['count'] < min_count, ['mean', 'std']] = float('nan')
+        return df
+
+    def get_wide(self, metric='net_trade_volume', window=7, contract=ALL_CONTRACTS,
+                 identities=INSTITUTIONS, start=None, end=None, min_count=1):
+        """
+        以日期為列、身份別為欄的滾動平均表（趨勢分析使用）
+
+        Returns:
+            DataFrame: index 為日期，欄位為各身份別的滾動平均
+        """
+        series = self.get_series(metric, window, [contract], identities, start, end, min_count)
+        return series.pivot(index='date', columns='identity_type', values='mean')
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所資料欄位對照
+集中定義爬蟲/CSV/Google Sheets 的中文欄位與資料庫欄位的對應與型別，
+各種格式之間的轉換都以整欄向量化的 rename/select/astype 完成，不逐列處理
+"""
+
+import pandas as pd
+
+# futures_data：(資料庫欄位, 中文欄位)；爬蟲輸出、CSV 與 Google Sheets 都使用中文欄位
+FUTURES_FIELDS = [
+    ('date', '日期'),
+    ('contract_code', '契約名稱'),
+    ('identity_type', '身份別'),
+    ('long_trade_volume', '多方交易口數'),
+    ('long_trade_amount', '多方契約金額'),
+    ('short_trade_volume', '空方交易口數'),
+    ('short_trade_amount', '空方契約金額'),
+    ('net_trade_volume', '多空淨額交易口數'),
+    ('net_trade_amount', '多空淨額契約金額'),
+    ('long_position_volume', '多方未平倉口數'),
+    ('long_position_amount', '多方未平倉契約金額'),
+    ('short_position_volume', '空方未平倉口數'),
+    ('short_position_amount', '空方未平倉契約金額'),
+    ('net_position_volume', '多空淨額未平倉口數'),
+    ('net_position_amount', '多空淨額未平倉契約金額'),
+]
+
+# futures_data 的主鍵欄位與數值欄位
+KEY_COLUMNS = [db for db, _ in FUTURES_FIELDS[:3]]
+METRIC_COLUMNS = [db for db, _ in FUTURES_FIELDS[3:]]
+
+# 資料庫欄位 → 中文欄位（Google Sheets）
+SHEETS_COLUMN_MAP = dict(FUTURES_FIELDS)
+# 中文欄位（爬蟲/CSV） → 資料庫欄位
+CSV_COLUMN_MAP = {zh: db for db, zh in FUTURES_FIELDS}
+
+# 「每日摘要」工作表：(資料庫欄位, 中文欄位)
+SUMMARY_FIELDS = [
+    ('date', '日期'),
+    ('total_contracts', '總契約數'),
+    ('total_volume', '總成交量'),
+    ('foreign_net', '外資淨部位'),
+    ('dealer_net', '自營商淨部位'),
+    ('trust_net', '投信淨部位'),
+]
+
+# 「三大法人趨勢」工作表的淨部位欄位與對應的7日平均欄位
+TREND_FIELDS = [
+    ('foreign_net', '外資', '外資7日平均'),
+    ('dealer_net', '自營商', '自營商7日平均'),
+    ('trust_net', '投信', '投信7日平均'),
+]
+
+# 爬蟲資料沒有身份別時使用的值
+DEFAULT_IDENTITY = '總計'
+
+
+def format_dates(values):
+    """
+    日期欄位統一為 'YYYY/MM/DD' 字串（接受字串、datetime、date）
+
+    Args:
+        values: 日期的 Series
+
+    Returns:
+        Series: 'YYYY/MM/DD' 字串，無法解析者維持原字串
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.dt.strftime('%Y/%m/%d')
+    text = values.astype(str).str.replace('-', '/').str.slice(0, 10)
+    return text.where(values.notna(), None)
+
+
+def parse_dates(values):
+    """
+    日期欄位解析為 datetime64（明確指定 'YYYY/MM/DD' 格式，不逐筆猜測格式）
+
+    Args:
+        values: 日期的 Series（'YYYY/MM/DD'、'YYYY-MM-DD' 字串或 datetime）
+
+    Returns:
+        Series: datetime64[ns]，無法解析者為 NaT
+    """
+    if not pd.api.types.is_datetime64_any_dtype(values):
+        text = values.astype(str).str.strip().str.replace('-', '/').str.slice(0, 10)
+        values = pd.to_datetime(text, format='%Y/%m/%d', errors='coerce')
+    # 維持 ns 精度：pandas 2 之前不支援其他精度的 datetime64
+    return values.dt.normalize().astype('datetime64[ns]')
+
+
+def to_int64(values):
+    """數值欄位轉為 int64（無法轉換或缺值為0；千分位逗號與舊版存成8位元組blob的整數一併還原）"""
+    if not pd.api.types.is_numeric_dtype(values):
+        numbers = pd.to_numeric(values, errors='coerce')
+        # 只有整欄轉換失敗的少數值才逐筆處理
+        failed = numbers.isna() & values.notna()
+        if failed.any():
+            numbers[failed] = pd.to_numeric(values[failed].map(_decode_number), errors='coerce')
+        values = numbers
+    return pd.to_numeric(values, errors='coerce').fillna(0).astype('int64')
+
+
+def _decode_number(value):
+    """單一無法直接轉換的數值：8位元組blob或含千分位的字串"""
+    if isinstance(value, bytes) and len(value) == 8:
+        return int.from_bytes(value, 'little', signed=True)
+    if isinstance(value, str):
+        return value.replace(',', '').strip()
+    return value
+
+
+def typed_frame(df):
+    """
+    期貨資料統一為標準型別：日期為 datetime64、契約與身份別為 category、數值為 int64
+
+    欄位名稱維持輸入的中文或資料庫欄位，日期無法解析的資料列會被移除；
+    分組與篩選可直接使用 category 代碼（groupby 需加 observed=True）
+
+    Args:
+        df: 中文欄位或資料庫欄位的DataFrame（例如 Google Sheets get_all_values() 的字串資料）
+
+    Returns:
+        DataFrame: 型別化的資料（不修改輸入）
+    """
+    if df.empty:
+        return df.copy()
+
+    zh = '日期' in df.columns
+    date_col, contract_col, identity_col = [zh_col if zh else db_col for db_col, zh_col in FUTURES_FIELDS[:3]]
+    metrics = [zh_col if zh else db_col for db_col, zh_col in FUTURES_FIELDS[3:]]
+
+    result = df.copy()
+    if date_col in result.columns:
+        result[date_col] = parse_dates(result[date_col])
+        result = result[result[date_col].notna()]
+    for col in (contract_col, identity_col):
+        if col in result.columns:
+            result[col] = result[col].astype(str).str.strip().astype('category')
+    for col in metrics:
+        if col in result.columns:
+            result[col] = to_int64(result[col])
+    return result.reset_index(drop=True)
+
+
+def crawler_to_db(df):
+    """
+    爬蟲/CSV 的中文欄位資料轉為資料庫格式
+
+    只保留資料中有的數值欄位（例如交易量資料沒有未平倉欄位），寫入時缺少的欄位沿用資料庫既有值
+
+    Args:
+        df: 中文欄位的DataFrame
+
+    Returns:
+        DataFrame: 資料庫欄位，日期為 'YYYY/MM/DD' 字串、數值為 int64
+    """
+    if df.empty:
+        return pd.DataFrame()
+
+    result = df.rename(columns=CSV_COLUMN_MAP)
+    if 'identity_type' not in result.columns:
+        result['identity_type'] = DEFAULT_IDENTITY
+    columns = [col for col in KEY_COLUMNS + METRIC_COLUMNS if col in result.columns]
+    result = result[columns].copy()
+
+    result['date'] = format_dates(result['date'])
+    result['contract_code'] = result['contract_code'].astype(str)
+    result['identity_type'] = result['identity_type'].fillna(DEFAULT_IDENTITY).astype(str)
+    for col in columns[len(KEY_COLUMNS):]:
+        result[col] = to_int64(result[col])
+    return result.reset_index(drop=True)
+
+
+def db_to_sheets(df, fill_missing=True, updated_at_column=None):
+    """
+    資料庫格式資料轉為 Google Sheets/CSV 的中文欄位
+
+    Args:
+        df: 資料庫欄位的DataFrame
+        fill_missing: 是否補齊缺少的數值欄位（補0）並依標準順序排列
+        updated_at_column: 要轉為「更新時間」欄位的資料庫欄位（如 'created_at'），None 表示不輸出
+
+    Returns:
+        DataFrame: 中文欄位，日期為 'YYYY/MM/DD' 字串、數值為 int64
+    """
+    if df.empty:
+        return pd.DataFrame(columns=list(SHEETS_COLUMN_MAP.values()) if fill_missing else None)
+
+    columns = KEY_COLUMNS + [col for col in METRIC_COLUMNS if fill_missing or col in df.columns]
+    result = pd.DataFrame(index=df.index)
+    result['date'] = format_dates(df['date'])
+    result['contract_code'] = df['contract_code'].astype(str)
+    result['identity_type'] = df['identity_type'].astype(str)
+    for col in columns[len(KEY_COLUMNS):]:
+        result[col] = to_int64(df[col]) if col in df.columns else 0
+
+    result = result[columns].rename(columns=SHEETS_COLUMN_MAP)
+    if updated_at_column:
+        result['更新時間'] = df[updated_at_column].fillna('').astype(str) if updated_at_column in df.columns else ''
+    return result.reset_index(drop=True)
+
+
+def sheet_rows(df):
+    """
+    DataFrame 轉為 gspread 可上傳的列表（逐欄轉為Python原生型別，不逐列處理）
+
+    Args:
+        df: 已排好欄位順序的DataFrame
+
+    Returns:
+        list: 每列一個列表
+    """
+    if df.empty:
+        return []
+    columns = [df[col].tolist() for col in df.columns]
+    return [list(row) for row in zip(*columns)]
+
+
+def summary_to_sheets(summary_df, updated_at):
+    """
+    每日摘要（資料庫 daily_summary）轉為「每日摘要」工作表的欄位
+
+    Args:
+        summary_df: daily_summary 資料
+        updated_at: 更新時間字串
+
+    Returns:
+        DataFrame: 日期、總契約數、總成交量、外資/自營商/投信淨部位、更新時間
+    """
+    result = pd.DataFrame(index=summary_df.index)
+    for db_col, zh_col in SUMMARY_FIELDS:
+        if db_col == 'date':
+            result[zh_col] = summary_df['date'].astype(str) if 'date' in summary_df.columns else ''
+        else:
+            result[zh_col] = to_int64(summary_df[db_col]) if db_col in summary_df.columns else 0
+    result['更新時間'] = updated_at
+    return result.reset_index(drop=True)
+
+
+def trend_to_sheets(summary_df):
+    """
+    含7日平均的每日摘要轉為「三大法人趨勢」工作表的欄位
+
+    Args:
+        summary_df: daily_summary 資料，已加上 外資7日平均 等欄位
+
+    Returns:
+        DataFrame: 日期、三大法人淨部位、三大法人7日平均
+    """
+    result = pd.DataFrame(index=summary_df.index)
+    result['日期'] = summary_df['date'].astype(str)
+    for db_col, identity, _ in TREND_FIELDS:
+        result[f'{identity}淨部位'] = to_int64(summary_df[db_col]) if db_col in summary_df.columns else 0
+    for _, _, average_col in TREND_FIELDS:
+        if average_col in summary_df.columns:
+            result[average_col] = pd.to_numeric(summary_df[average_col], errors='coerce').fillna(0).astype(float).round(2)
+        else:
+            result[average_col] = 0.0
+    return result.reset_index(drop=True)
@@ -0,0 +1,262 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Google Sheets 歷史資料分年歸檔
+常用的資料工作表（歷史資料/完整資料/交易量資料）只保留最近的年度，已結束年度的資料列搬到
+「<工作表>_YYYY」歸檔工作表；複製與刪除在同一次 spreadsheets.batchUpdate 完成（全部成功或全部不生效），
+並維護「資料分區」清單工作表，讀取端可依日期範圍只抓需要的分區
+"""
+
+import logging
+import pandas as pd
+from datetime import datetime
+from schema_mapping import parse_dates, typed_frame
+from sheets_mirror import column_letter, numericise_value
+from google_sheets_manager import SHEET_KEY_COLUMNS, sheet_keys
+
+MANIFEST_WORKSHEET = "資料分區"
+MANIFEST_HEADERS = ["工作表", "來源工作表", "年度", "起始日期", "結束日期", "資料筆數", "更新時間"]
+
+# 預設歸檔的資料工作表
+HOT_WORKSHEETS = ("歷史資料", "完整資料", "交易量資料")
+
+
+def archive_name(source, year):
+    """歸檔工作表名稱，如 歷史資料_2024"""
+    return f"{source}_{year}"
+
+
+class SheetsArchiver:
+    """資料工作表的分年歸檔與分區清單"""
+
+    def __init__(self, sheets_manager, keep_years=1):
+        """
+        初始化歸檔器
+
+        Args:
+            sheets_manager: 已連接試算表的 GoogleSheetsManager
+            keep_years: 常用工作表保留的年度數（1 表示只保留今年）
+        """
+        self.sheets_manager = sheets_manager
+        self.keep_years = keep_years
+        self.logger = logging.getLogger(__name__)
+        self._manifest = None
+
+    def cutoff_year(self, today=None):
+        """早於此年度的資料列要歸檔"""
+        today = today or datetime.now()
+        return today.year - self.keep_years + 1
+
+    def archive_due(self, source, today=None):
+        """
+        常用工作表是否有需要歸檔的年度（只讀取日期欄位）
+
+        Returns:
+            bool
+        """
+        dates = parse_dates(pd.Series(self.sheets_manager.column_values(source, '日期'), dtype=str))
+        return bool((dates.dt.year < self.cutoff_year(today)).any())
+
+    def manifest(self, refresh=False):
+        """
+        分區清單
+
+        Returns:
+            DataFrame: MANIFEST_HEADERS 欄位；清單工作表不存在時為空
+        """
+        if self._manifest is not None and not refresh:
+            return self._manifest
+        try:
+            values = self.sheets_manager.read_range(MANIFEST_WORKSHEET, f"A1:{column_letter(len(MANIFEST_HEADERS))}")
+        except Exception as e:
+            self.logger.debug(f"讀取分區清單失敗: {e}")
+            values = []
+        rows = [row + [''] * (len(MANIFEST_HEADERS) - len(row)) for row in values[1:]]
+        self._manifest = pd.DataFrame(rows, columns=MANIFEST_HEADERS, dtype=str)
+        return self._manifest
+
+    def partitions(self, source, start=None, end=None):
+        """
+        涵蓋日期範圍的工作表（常用工作表本身一定包含在內，放在最後）
+
+        Args:
+            source: 常用工作表名稱
+            start: 起始日期（含），None 表示不限
+            end: 結束日期（含），None 表示不限
+
+        Returns:
+            list: 工作表名稱，依年度排序
+        """
+        manifest = self.manifest()
+        archived = manifest[(manifest['來源工作表'] == source) & (manifest['工作表'] != source)]
+        if start is not None:
+            archived = archived[parse_dates(archived['結束日期']) >= pd.Timestamp(start).normalize()]
+        if end is not None:
+            archived = archived[parse_dates(archived['起始日期']) <= pd.Timestamp(end).normalize()]
+        return list(archived.sort_values('年度')['工作表']) + [source]
+
+    def frame(self, source, start=None, end=None):
+        """
+        讀取日期範圍內的資料（只抓涵蓋範圍的分區）
+
+        Returns:
+            DataFrame: 統一型別（typed_frame）的資料，已篩選日期範圍
+        """
+        mirror = self.sheets_manager.mirror
+        frames = []
+        for name in self.partitions(source, start, end):
+            try:
+                frames.append(mirror.frame(name))
+            except Exception as e:
+                self.logger.warning(f"⚠️ 無法讀取分區 {name}: {e}")
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+
+        df = typed_frame(pd.concat(frames, ignore_index=True))
+        if start is not None:
+            df = df[df['日期'] >= pd.Timestamp(start).normalize()]
+        if end is not None:
+            df = df[df['日期'] <= pd.Timestamp(end).normalize()]
+        return df.reset_index(drop=True)
+
+    def _archive_worksheet(self, name, header, rows):
+        """取得或建立歸檔工作表"""
+        try:
+            return self.sheets_manager._worksheet(name), False
+        except Exception:
+            worksheet = self.sheets_manager._add_worksheet(name, rows=rows + 1, cols=len(header))
+            return worksheet, True
+
+    def archive(self, sources=HOT_WORKSHEETS, today=None):
+        """
+        把已結束年度的資料列搬到歸檔工作表，並更新分區清單
+
+        Args:
+            sources: 要歸檔的常用工作表
+            today: 基準日期（預設今天）
+
+        Returns:
+            dict: {歸檔工作表名稱: 搬移筆數}
+        """
+        manager = self.sheets_manager
+        cutoff = self.cutoff_year(today)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        entries = {row['工作表']: list(row) for _, row in self.manifest(refresh=True).iterrows()}
+        moved = {}
+        touched = []
+
+        def manifest_entry(name, source, year, dates, count):
+            dates = dates.dropna()
+            first = dates.min().strftime('%Y/%m/%d') if not dates.empty else ''
+            last = dates.max().strftime('%Y/%m/%d') if not dates.empty else ''
+            entries[name] = [name, source, year, first, last, str(count), now]
+            touched.append(name)
+
+        with manager.batch_writes() as batch:
+            for source in sources:
+                try:
+                    hot = manager._worksheet(source)
+                except Exception:
+                    continue
+
+                # 搬移前一定重新下載，避免依據過期的鏡像刪錯列
+                values = manager.mirror.get_all_values(source, refresh=True)
+                if len(values) < 2:
+                    continue
+                header = values[0]
+                if list(header[:len(SHEET_KEY_COLUMNS)]) != list(SHEET_KEY_COLUMNS):
+                    self.logger.warning(f"⚠️ {source} 的前三欄不是主鍵欄位，略過歸檔")
+                    continue
+
+                data = pd.DataFrame(values[1:], columns=header)
+                dates = parse_dates(data['日期'])
+                years = dates.dt.year
+                archive_mask = (years < cutoff).to_numpy()
+                if not archive_mask.any():
+                    continue
+
+                for year in sorted(years[archive_mask].unique().astype(int)):
+                    year_mask = (years == year).to_numpy()
+                    year_rows = data[year_mask]
+                    name = archive_name(source, year)
+                    worksheet, created = self._archive_worksheet(name, header, len(year_rows))
+
+                    if created:
+                        batch.append(worksheet, [header])
+                        existing = pd.DataFrame(columns=list(SHEET_KEY_COLUMNS), dtype=str)
+                    else:
+                        existing = manager.key_values(name)
+
+                    # 歸檔中已有的鍵覆寫該列（常用工作表的值較新），其餘附加到尾端
+                    existing_rows = pd.Series(range(2, len(existing) + 2), index=sheet_keys(existing), dtype='int64')
+                    existing_rows = existing_rows[~existing_rows.index.duplicated(keep='first')]
+                    target_rows = sheet_keys(year_rows).map(existing_rows)
+                    rows = [[numericise_value(value) for value in row] for row in year_rows.values.tolist()]
+                    for row_number, row in zip(target_rows, rows):
+                        if pd.notna(row_number):
+                            batch.update(worksheet, f"A{int(row_number)}", [row])
+                    new_rows = [row for row_number, row in zip(target_rows, rows) if pd.isna(row_number)]
+                    batch.append(worksheet, new_rows)
+                    moved[name] = len(year_rows)
+
+                    partition_dates = pd.concat([parse_dates(existing['日期']), dates[year_mask]])
+                    manifest_entry(name, source, str(year), partition_dates, len(existing) + len(new_rows))
+
+                # 由下往上刪除已搬移的連續列（工作表列號 = 資料索引 + 2）
+                row_numbers = pd.Series(archive_mask.nonzero()[0] + 2)
+                runs = (row_numbers.diff() != 1).cumsum()
+                for _, run in reversed(list(row_numbers.groupby(runs))):
+                    batch.delete_rows(hot, int(run.iloc[0]), int(run.iloc[-1]))
+
+                manifest_entry(source, source, '', dates[~archive_mask], int((~archive_mask).sum()))
+                self.logger.info(f"🗄️ {source}: {int(archive_mask.sum())} 筆 {cutoff} 年以前的資料移到歸檔工作表")
+
+            if touched:
+                try:
+                    manifest_ws = manager._worksheet(MANIFEST_WORKSHEET)
+                    batch.clear(manifest_ws, f"A2:{column_letter(len(MANIFEST_HEADERS))}")
+                except Exception:
+                    manifest_ws = manager._add_worksheet(MANIFEST_WORKSHEET, rows=100, cols=len(MANIFEST_HEADERS))
+                    batch.append(manifest_ws, [MANIFEST_HEADERS])
+                batch.append(manifest_ws, sorted(entries.values(), key=lambda entry: (entry[1], entry[2])))
+
+                def invalidate_mirror():
+                    for name in touched + [MANIFEST_WORKSHEET]:
+                        manager.mirror.invalidate(name)
+                batch.after_flush(invalidate_mirror)
+
+        self._manifest = None
+        if moved:
+            self.logger.info(f"✅ 歸檔完成: {moved}")
+        return moved
+
+
+def main():
+    """將所有常用資料工作表中已結束年度的資料歸檔"""
+    import json
+    from pathlib import Path
+    from google_sheets_manager import GoogleSheetsManager
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    config_file = Path("config/spreadsheet_config.json")
+    if not config_file.exists():
+        print("❌ 找不到Google Sheets設定檔")
+        return
+
+    with open(config_file, 'r', encoding='utf-8') as f:
+        config = json.load(f)
+
+    sheets_manager = GoogleSheetsManager()
+    if not sheets_manager.client or not sheets_manager.connect_spreadsheet(config['spreadsheet_id']):
+        print("❌ 無法連接到Google Sheets")
+        return
+
+    moved = SheetsArchiver(sheets_manager).archive()
+    print(f"🗄️ 歸檔結果: {moved or '沒有需要歸檔的資料'}")
+
+
+if __name__ == "__main__":
+    main()
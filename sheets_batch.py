@@ -0,0 +1,350 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Google Sheets 批次寫入
+收集一次執行中所有工作表的清除、格式、附加與資料更新，最後只送出一次 spreadsheets.batchUpdate
+（清除/格式/附加/刪除列，資料範圍轉為 updateCells 接在最後），取代逐一呼叫 update/clear/format/append_rows；
+單一 batchUpdate 由 API 整批套用，任一請求失敗時全部不生效
+
+workers > 1 時改為各工作表獨立送出：每個工作表的寫入合併為一次 spreadsheets.batchUpdate，
+以有上限的執行緒池同時送出，單一工作表失敗不影響其他工作表
+"""
+
+import math
+import time
+import logging
+import threading
+import concurrent.futures
+from collections import Counter
+from sheets_mirror import column_letter
+
+
+def column_index(letters):
+    """A1表示法的欄位字母轉為序號（1起算）"""
+    index = 0
+    for ch in letters.upper():
+        index = index * 26 + ord(ch) - ord('A') + 1
+    return index
+
+
+def _split_cell(ref):
+    """'B12' → ('B', 12)；只有欄位或只有列號時另一個為空"""
+    letters = ref.rstrip('0123456789')
+    digits = ref[len(letters):]
+    return letters, int(digits) if digits else None
+
+
+def grid_range(sheet_id, a1_range=None):
+    """
+    A1範圍（'A1:C1'、'A2:Z1000'、'A2'、'A:C'）轉為 Sheets API 的 GridRange
+
+    Args:
+        sheet_id: 工作表ID
+        a1_range: A1範圍，None 表示整個工作表
+    """
+    grid = {'sheetId': sheet_id}
+    if not a1_range:
+        return grid
+
+    start, _, end = a1_range.partition(':')
+    start_col, start_row = _split_cell(start)
+    end_col, end_row = _split_cell(end or start)
+    if start_col:
+        grid['startColumnIndex'] = column_index(start_col) - 1
+    if start_row:
+        grid['startRowIndex'] = start_row - 1
+    if end_col:
+        grid['endColumnIndex'] = column_index(end_col)
+    if end_row:
+        grid['endRowIndex'] = end_row
+    return grid
+
+
+def _cell_data(value):
+    """值轉為 CellData（與 valueInputOption=RAW 相同：數字為數值，其餘為字串）"""
+    if value is None or value == '':
+        return {}
+    if isinstance(value, bool):
+        return {'userEnteredValue': {'boolValue': value}}
+    if isinstance(value, (int, float)):
+        if isinstance(value, float) and math.isnan(value):
+            return {}
+        return {'userEnteredValue': {'numberValue': value}}
+    return {'userEnteredValue': {'stringValue': str(value)}}
+
+
+def _start_coordinate(sheet_id, start):
+    """'A2' 或 'A2:P10' 的左上角轉為 GridCoordinate"""
+    col, row = _split_cell(start.partition(':')[0])
+    return {'sheetId': sheet_id, 'rowIndex': (row or 1) - 1, 'columnIndex': column_index(col) - 1}
+
+
+def _update_cells(worksheet, start, rows):
+    """資料範圍轉為 updateCells 請求（值的寫法與 valueInputOption=RAW 相同）"""
+    return {
+        'updateCells': {
+            'start': _start_coordinate(worksheet.id, start),
+            'rows': [{'values': [_cell_data(value) for value in row]} for row in rows],
+            'fields': 'userEnteredValue',
+        }
+    }
+
+
+class SheetsWriteBatcher:
+    """跨工作表收集寫入，flush() 時以一次 API 呼叫送出（或各工作表一次、同時送出）"""
+
+    def __init__(self, spreadsheet, stats=None, workers=1):
+        """
+        初始化批次
+
+        Args:
+            spreadsheet: gspread Spreadsheet
+            stats: API 呼叫計數（collections.Counter，可與其他批次共用以累計整次執行）
+            workers: 1 表示所有工作表的寫入合併為一次 batchUpdate 送出（全部成功或全部不生效）；
+                     大於1時各工作表獨立送出，最多同時 workers 個請求（只有單一工作表內是全部成功或全部不生效）
+        """
+        self.spreadsheet = spreadsheet
+        self.stats = stats if stats is not None else Counter()
+        self.workers = workers
+        self.logger = logging.getLogger(__name__)
+
+        # 依加入順序：(工作表, 請求) 與 (工作表, 起始儲存格或範圍, 資料列)
+        self.requests = []
+        self.data = []
+        self._callbacks = []
+        # 本批次已寫入、尚未送出的資料列（{工作表名稱: {主鍵: 列}}），同一批次再次寫入相同的鍵時用來比對與改寫
+        self.keyed_rows = {}
+        self._appended_cells = {}
+        self._lock = threading.Lock()
+
+        # 最近一次 flush 的各工作表耗時與失敗原因（workers > 1）
+        self.timings = {}
+        self.errors = {}
+
+    def __len__(self):
+        return len(self.requests) + len(self.data)
+
+    def update(self, worksheet, start, rows):
+        """
+        寫入資料範圍（同 worksheet.update(start, rows)）
+
+        Args:
+            worksheet: 目標工作表
+            start: 左上角儲存格（如 'A2'）或完整範圍（如 'A2:P10'）
+            rows: 二維列表
+        """
+        if not rows:
+            return
+        if ':' not in start:
+            col, row = _split_cell(start)
+            width = max(len(r) for r in rows)
+            start = f"{start}:{column_letter(column_index(col) + width - 1)}{row + len(rows) - 1}"
+        self.data.append((worksheet, start, rows))
+
+    def clear(self, worksheet, a1_range=None):
+        """
+        清除儲存格的值（同 worksheet.clear()/batch_clear()，保留格式）
+
+        Args:
+            worksheet: 目標工作表
+            a1_range: A1範圍，None 表示整個工作表
+        """
+        self.requests.append((worksheet, {
+            'updateCells': {
+                'range': grid_range(worksheet.id, a1_range),
+                'fields': 'userEnteredValue',
+            }
+        }))
+
+    def format(self, worksheet, a1_range, cell_format):
+        """
+        設定儲存格格式（同 worksheet.format()）
+
+        Args:
+            worksheet: 目標工作表
+            a1_range: A1範圍
+            cell_format: userEnteredFormat 內容
+        """
+        self.requests.append((worksheet, {
+            'repeatCell': {
+                'range': grid_range(worksheet.id, a1_range),
+                'cell': {'userEnteredFormat': cell_format},
+                'fields': f"userEnteredFormat({','.join(cell_format.keys())})",
+            }
+        }))
+
+    def append(self, worksheet, rows, keys=None):
+        """
+        附加資料列到工作表尾端（同 worksheet.append_rows()，空間不足時自動增加列數）
+
+        Args:
+            worksheet: 目標工作表
+            rows: 二維列表
+            keys: 各列的主鍵；提供時記錄在 keyed_rows，之後可用 rewrite_appended() 改寫
+        """
+        if not rows:
+            return
+        cells = [{'values': [_cell_data(value) for value in row]} for row in rows]
+        self.requests.append((worksheet, {
+            'appendCells': {
+                'sheetId': worksheet.id,
+                'rows': cells,
+                'fields': 'userEnteredValue',
+            }
+        }))
+        if keys is not None:
+            written = self.keyed_rows.setdefault(worksheet.title, {})
+            appended = self._appended_cells.setdefault(worksheet.title, {})
+            for key, row, cell in zip(keys, rows, cells):
+                written[key] = row
+                appended[key] = (row, cell)
+
+    def rewrite_appended(self, worksheet, key, row):
+        """
+        改寫本批次尚未送出的附加列（同一批次再次寫入相同的新鍵時，不再附加第二列）
+
+        Args:
+            worksheet: 目標工作表
+            key: 主鍵
+            row: 新的資料列
+
+        Returns:
+            bool: 該鍵是否為本批次附加的列
+        """
+        entry = self._appended_cells.get(worksheet.title, {}).get(key)
+        if entry is None:
+            return False
+        appended_row, cell = entry
+        appended_row[:] = row
+        cell['values'] = [_cell_data(value) for value in row]
+        return True
+
+    def delete_rows(self, worksheet, first_row, last_row):
+        """
+        刪除工作表列（同 worksheet.delete_rows()；同一批次刪除多段時請由下往上加入，列號才不會位移）
+
+        Args:
+            worksheet: 目標工作表
+            first_row: 起始列號（1起算，含）
+            last_row: 結束列號（含）
+        """
+        self.requests.append((worksheet, {
+            'deleteDimension': {
+                'range': {
+                    'sheetId': worksheet.id,
+                    'dimension': 'ROWS',
+                    'startIndex': first_row - 1,
+                    'endIndex': last_row,
+                }
+            }
+        }))
+
+    def after_flush(self, callback, *worksheets):
+        """
+        登記送出成功後才執行的動作（例如更新本機鏡像、確認同步進度）
+
+        Args:
+            callback: 無參數函數
+            worksheets: 此動作依賴的工作表（物件或名稱）；各工作表獨立送出時只在這些工作表都成功後執行，
+                        未指定表示依賴整個批次
+        """
+        titles = tuple(worksheet if isinstance(worksheet, str) else worksheet.title for worksheet in worksheets)
+        self._callbacks.append((callback, titles))
+
+    def _count(self, name):
+        with self._lock:
+            self.stats[name] += 1
+
+    def flush(self):
+        """
+        送出所有寫入：一次 spreadsheets.batchUpdate，先依加入順序執行清除、格式、附加、刪除列，再寫入資料範圍；
+        workers > 1 時改由 _flush_worksheets() 各工作表同時送出
+
+        Returns:
+            int: 本次的 API 呼叫次數
+        """
+        if self.workers > 1:
+            return self._flush_worksheets()
+
+        calls = 0
+        requests, data, callbacks = self.requests, self.data, self._callbacks
+        self.requests, self.data, self._callbacks = [], [], []
+        self.keyed_rows, self._appended_cells = {}, {}
+
+        if requests or data:
+            self.spreadsheet.batch_update({'requests': [request for _, request in requests]
+                                                       + [_update_cells(worksheet, start, rows) for worksheet, start, rows in data]})
+            self._count('batch_update')
+            calls += 1
+        for callback, _ in callbacks:
+            callback()
+
+        if calls:
+            self.logger.info(f"📤 Google Sheets 批次寫入: {len(requests)} 個清除/格式/附加請求、{len(data)} 個資料範圍，"
+                             f"API 呼叫 {calls} 次（累計 {sum(self.stats.values())} 次）")
+        return calls
+
+    def _worksheet_requests(self):
+        """
+        依工作表分組的請求：資料範圍轉為 updateCells 接在該工作表的清除/附加之後，同一工作表只需一次 batchUpdate
+
+        Returns:
+            dict: {工作表名稱: 請求列表}，依第一次加入的順序
+        """
+        units = {}
+        for worksheet, request in self.requests:
+            units.setdefault(worksheet.title, []).append(request)
+        for worksheet, start, rows in self.data:
+            units.setdefault(worksheet.title, []).append(_update_cells(worksheet, start, rows))
+        return units
+
+    def _send_worksheet(self, title, requests):
+        """送出單一工作表的請求，回傳耗時秒數"""
+        started = time.monotonic()
+        self.spreadsheet.batch_update({'requests': requests})
+        self._count('batch_update')
+        return time.monotonic() - started
+
+    def _flush_worksheets(self):
+        """
+        各工作表獨立送出（最多同時 workers 個）；失敗的工作表記錄在 errors，不影響其他工作表，
+        依賴失敗工作表的 after_flush 動作不執行
+
+        Returns:
+            int: 本次的 API 呼叫次數（含失敗的呼叫）
+        """
+        units = self._worksheet_requests()
+        callbacks = self._callbacks
+        self.requests, self.data, self._callbacks = [], [], []
+        self.keyed_rows, self._appended_cells = {}, {}
+        self.timings, self.errors = {}, {}
+        if not units:
+            for callback, _ in callbacks:
+                callback()
+            return 0
+
+        started = time.monotonic()
+        with concurrent.futures.ThreadPoolExecutor(max_workers=min(self.workers, len(units))) as executor:
+            future_to_title = {executor.submit(self._send_worksheet, title, requests): title
+                               for title, requests in units.items()}
+            for future in concurrent.futures.as_completed(future_to_title):
+                title = future_to_title[future]
+                try:
+                    self.timings[title] = future.result()
+                    self.logger.debug(f"📤 {title}: {len(units[title])} 個請求，{self.timings[title]:.2f} 秒")
+                except Exception as e:
+                    self.errors[title] = e
+                    self.logger.error(f"❌ Google Sheets 工作表 {title} 寫入失敗: {e}")
+        elapsed = time.monotonic() - started
+
+        for callback, titles in callbacks:
+            if any(title in self.errors for title in titles) or (not titles and self.errors):
+                continue
+            callback()
+
+        slowest = max(self.timings, key=self.timings.get) if self.timings else None
+        self.logger.info(f"📤 Google Sheets 平行寫入: {len(self.timings)}/{len(units)} 個工作表成功，耗時 {elapsed:.2f} 秒"
+                         + (f"（最慢 {slowest} {self.timings[slowest]:.2f} 秒）" if slowest else "")
+                         + f"，累計 API 呼叫 {sum(self.stats.values())} 次")
+        return len(units)
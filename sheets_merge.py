@@ -0,0 +1,233 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Google Sheets 增量合併
+以工作表主鍵（日期/契約名稱/身份別）的排序索引比對本地資料：每筆本地資料以二分搜尋找到工作表列，
+逐格比較後只寫入有變動的儲存格與新的鍵，不重新上傳整份資料
+工作表內容取自本機鏡像（SheetsMirror），沒有修改時不必重新下載
+"""
+
+import logging
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from schema_mapping import format_dates, sheet_rows
+from sheets_mirror import column_letter, numericise_value
+from google_sheets_manager import SHEET_KEY_COLUMNS, WorksheetNotFound, sheet_keys
+
+UPDATED_AT_COLUMN = '更新時間'
+
+
+def _same(local, remote):
+    """本地值與工作表顯示值是否相同（數字以數值比較，'100' 與 100.0 視為相同）"""
+    return numericise_value(str(local)) == numericise_value(remote)
+
+
+def _runs(positions):
+    """排序後的欄位序號切成連續的區段 [(起, 迄), ...]"""
+    runs = []
+    for position in positions:
+        if runs and position == runs[-1][1] + 1:
+            runs[-1][1] = position
+        else:
+            runs.append([position, position])
+    return [tuple(run) for run in runs]
+
+
+class SheetKeyIndex:
+    """工作表主鍵的排序索引（鍵 → 工作表列號），查詢為二分搜尋"""
+
+    def __init__(self, values):
+        """
+        由工作表內容建立索引
+
+        Args:
+            values: get_all_values() 格式的工作表內容（第一列為表頭）
+        """
+        self.keys = np.array([], dtype=str)
+        self.rows = np.array([], dtype=np.int64)
+        self.covered = 1
+        self.extend(values)
+
+    def __len__(self):
+        return len(self.keys)
+
+    @staticmethod
+    def _row_keys(rows):
+        width = len(SHEET_KEY_COLUMNS)
+        frame = pd.DataFrame([list(row[:width]) + [''] * (width - len(row)) for row in rows],
+                             columns=list(SHEET_KEY_COLUMNS), dtype=str)
+        return sheet_keys(frame).to_numpy(dtype=str)
+
+    def extend(self, values):
+        """
+        加入工作表尾端新增的列（只處理索引尚未涵蓋的列；重複的鍵以較前面的列為準）
+
+        Args:
+            values: 目前的工作表內容
+        """
+        new_rows = values[self.covered:]
+        if not new_rows:
+            return
+        keys = self._row_keys(new_rows)
+        rows = np.arange(self.covered + 1, self.covered + 1 + len(new_rows), dtype=np.int64)
+        order = np.argsort(keys, kind='stable')
+        keys, rows = keys[order], rows[order]
+
+        # 新的列號一定大於既有列號，插在相同鍵的右側即可維持「較前面的列優先」
+        positions = np.searchsorted(self.keys, keys, side='right')
+        self.keys = np.insert(self.keys.astype(np.result_type(self.keys, keys)), positions, keys)
+        self.rows = np.insert(self.rows, positions, rows)
+        self.covered = len(values)
+
+    def lookup(self, keys):
+        """
+        查詢鍵所在的工作表列號
+
+        Args:
+            keys: sheet_keys() 格式的鍵
+
+        Returns:
+            ndarray: 列號，不存在的鍵為 0
+        """
+        keys = np.asarray(keys, dtype=str)
+        if not len(self.keys):
+            return np.zeros(len(keys), dtype=np.int64)
+        positions = np.searchsorted(self.keys, keys, side='left')
+        clipped = np.minimum(positions, len(self.keys) - 1)
+        found = (positions < len(self.keys)) & (self.keys[clipped] == keys)
+        return np.where(found, self.rows[clipped], 0)
+
+
+class SheetsMerger:
+    """把本地資料增量合併到資料工作表"""
+
+    def __init__(self, sheets_manager):
+        """
+        初始化合併器
+
+        Args:
+            sheets_manager: 已連接試算表的 GoogleSheetsManager
+        """
+        self.sheets_manager = sheets_manager
+        self.logger = logging.getLogger(__name__)
+        self._indexes = {}
+
+    def _headers(self, worksheet_name):
+        manager = self.sheets_manager
+        if worksheet_name == "交易量資料":
+            return manager.get_trading_headers()
+        if worksheet_name == "完整資料":
+            return manager.get_complete_headers()
+        return manager.get_history_headers()
+
+    def index(self, worksheet_name, values):
+        """
+        工作表的主鍵索引（同一份鏡像內容只在尾端新增時延伸，否則重新建立）
+
+        Args:
+            worksheet_name: 工作表名稱
+            values: 鏡像的工作表內容
+        """
+        cached = self._indexes.get(worksheet_name)
+        if cached is not None and cached[0] is values and cached[1].covered <= len(values):
+            index = cached[1]
+            index.extend(values)
+        else:
+            index = SheetKeyIndex(values)
+            self._indexes[worksheet_name] = (values, index)
+        return index
+
+    def merge(self, df, worksheet_name):
+        """
+        合併本地資料：已存在且內容相同的列略過，有變動的列只寫入變動的儲存格（及更新時間），新的鍵附加到尾端
+
+        Args:
+            df: 本地資料（工作表欄位名稱，需包含 日期/契約名稱/身份別）
+            worksheet_name: 目標工作表
+
+        Returns:
+            dict: inserted、updated_rows、updated_cells、unchanged 筆數
+        """
+        manager = self.sheets_manager
+        result = {'inserted': 0, 'updated_rows': 0, 'updated_cells': 0, 'unchanged': 0}
+        if df.empty:
+            return result
+
+        # 同一鍵只保留最後一筆（只處理本地資料，與工作表大小無關）
+        local = df.copy()
+        local['日期'] = format_dates(local['日期'])
+        keys = sheet_keys(local[list(SHEET_KEY_COLUMNS)])
+        local = local[~keys.duplicated(keep='last')]
+        keys = keys[local.index].to_numpy(dtype=str)
+        now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+        with manager.batch_writes() as batch:
+            try:
+                worksheet = manager._worksheet(worksheet_name)
+                values = manager.mirror.get_all_values(worksheet_name)
+            except WorksheetNotFound:
+                headers = self._headers(worksheet_name) + [UPDATED_AT_COLUMN]
+                worksheet = manager._add_worksheet(worksheet_name, rows=len(local) + 1, cols=len(headers))
+                batch.append(worksheet, [headers])
+                values = [headers]
+
+            if not values:
+                values = [self._headers(worksheet_name) + [UPDATED_AT_COLUMN]]
+                batch.append(worksheet, values)
+            header = list(values[0])
+            if [str(cell).strip() for cell in header[:len(SHEET_KEY_COLUMNS)]] != list(SHEET_KEY_COLUMNS):
+                raise ValueError(f"{worksheet_name} 的前三欄不是 {'/'.join(SHEET_KEY_COLUMNS)}")
+
+            # 本地資料依工作表欄位排列；工作表沒有的欄位不寫入，本地沒有的欄位維持工作表的值
+            columns = [column for column in header if column in local.columns and column != UPDATED_AT_COLUMN]
+            positions = [header.index(column) for column in columns]
+            updated_at = header.index(UPDATED_AT_COLUMN) if UPDATED_AT_COLUMN in header else None
+            local_rows = sheet_rows(local[columns].astype(object).where(local[columns].notna(), ''))
+
+            row_numbers = self.index(worksheet_name, values).lookup(keys)
+            updates = {}
+            new_rows = []
+            for row_number, local_row in zip(row_numbers, local_rows):
+                if not row_number:
+                    row = [''] * len(header)
+                    for position, value in zip(positions, local_row):
+                        row[position] = value
+                    if updated_at is not None:
+                        row[updated_at] = now
+                    new_rows.append(row)
+                    continue
+
+                current = values[row_number - 1]
+                changed = [position for position, value in zip(positions, local_row)
+                           if not _same(value, current[position] if position < len(current) else '')]
+                if not changed:
+                    result['unchanged'] += 1
+                    continue
+
+                row = list(current) + [''] * (len(header) - len(current))
+                for position, value in zip(positions, local_row):
+                    if position in changed:
+                        row[position] = value
+                if updated_at is not None:
+                    row[updated_at] = now
+                    changed.append(updated_at)
+                # 每段連續的變動儲存格各寫一個範圍：中間未變動的格子不重寫（鏡像裡是顯示字串，RAW寫回會把數字變成文字）
+                for first, last in _runs(sorted(set(changed))):
+                    batch.update(worksheet, f"{column_letter(first + 1)}{row_number}:{column_letter(last + 1)}{row_number}",
+                                 [row[first:last + 1]])
+                updates[int(row_number)] = row
+                result['updated_rows'] += 1
+                result['updated_cells'] += len(changed)
+
+            batch.append(worksheet, new_rows)
+            result['inserted'] = len(new_rows)
+
+            if updates or new_rows:
+                mirror = manager.mirror
+                batch.after_flush(lambda: mirror.apply_writes(worksheet_name, updates, new_rows), worksheet)
+
+        self.logger.info(f"🔀 {worksheet_name}: 新增 {result['inserted']} 筆、更新 {result['updated_rows']} 筆"
+                         f"（{result['updated_cells']} 格）、未變動 {result['unchanged']} 筆")
+        return result
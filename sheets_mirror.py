@@ -0,0 +1,320 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Google Sheets 本機鏡像
+每個工作表的內容存一份在本機SQLite（gzip壓縮的JSON），讀取前只查詢試算表的最後修改時間（Drive modifiedTime）：
+沒有變動直接使用鏡像；有變動時先嘗試只抓尾端新增的列（與鏡像重疊的列比對一致才採用），否則才重新下載整個工作表
+鏡像使用SQLite而不是Parquet：pyarrow 是選用套件（見 requirements.txt），鏡像不應依賴它
+"""
+
+import json
+import gzip
+import math
+import time
+import sqlite3
+import logging
+import pandas as pd
+from datetime import datetime, timedelta
+from pathlib import Path
+
+
+def column_letter(index):
+    """欄位序號（1起算）轉為A1表示法的欄位字母"""
+    letters = ''
+    while index:
+        index, remainder = divmod(index - 1, 26)
+        letters = chr(ord('A') + remainder) + letters
+    return letters
+
+
+def _pad(rows):
+    """各列補齊為相同欄數（與 get_all_values() 的格式相同）"""
+    width = max((len(row) for row in rows), default=0)
+    return [list(row) + [''] * (width - len(row)) for row in rows]
+
+
+def display_value(value):
+    """寫入的值在工作表上顯示的字串（與 valueInputOption=RAW 相同：None/NaN 為空白、布林為 TRUE/FALSE、整數值的浮點數不帶小數）"""
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        if math.isnan(value):
+            return ''
+        if value.is_integer():
+            return str(int(value))
+    return str(value)
+
+
+def _displayed_row(row):
+    """寫入的一列轉為工作表顯示的字串（尾端的空白格與 API 回傳相同不保留，之後再以 _pad 補齊）"""
+    row = [display_value(cell) for cell in row]
+    while row and row[-1] == '':
+        row.pop()
+    return row
+
+
+def numericise_value(value):
+    """與 gspread get_all_records() 相同的數字轉換：整數、浮點數，其餘維持字串"""
+    if value == '':
+        return value
+    try:
+        return int(value)
+    except ValueError:
+        pass
+    try:
+        return float(value)
+    except ValueError:
+        return value
+
+
+def spreadsheet_modified_time(spreadsheet):
+    """試算表最後修改時間（Drive API 的 modifiedTime，一次輕量的中繼資料查詢）"""
+    getter = getattr(spreadsheet, 'get_lastUpdateTime', None)
+    if callable(getter):
+        return getter()
+    return spreadsheet.lastUpdateTime
+
+
+class SheetsMirror:
+    """Google Sheets 工作表內容的本機鏡像"""
+
+    def __init__(self, spreadsheet, path="data/sheets_mirror.db", overlap=5, full_refresh_hours=24, check_interval=60):
+        """
+        初始化鏡像
+
+        Args:
+            spreadsheet: gspread Spreadsheet
+            path: 鏡像SQLite檔案路徑
+            overlap: 尾端增量更新時與鏡像比對的重疊列數
+            full_refresh_hours: 距上次完整下載超過此時數就完整重新下載（尾端比對無法發現中間列的修改）
+            check_interval: 同一執行期間內重複讀取時，幾秒內不再查詢修改時間
+        """
+        self.spreadsheet = spreadsheet
+        self.spreadsheet_id = spreadsheet.id
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.overlap = overlap
+        self.full_refresh_hours = full_refresh_hours
+        self.check_interval = check_interval
+        self.logger = logging.getLogger(__name__)
+
+        self._entries = {}
+        self._fetched = {}
+        self._modified = None
+        self._modified_checked = None
+        self.init_table()
+
+    def init_table(self):
+        """建立鏡像資料表"""
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS sheet_mirror (
+                spreadsheet_id TEXT NOT NULL,
+                worksheet TEXT NOT NULL,
+                modified_time TEXT,
+                full_fetched_at TEXT NOT NULL,
+                row_count INTEGER NOT NULL,
+                data BLOB NOT NULL,
+                PRIMARY KEY (spreadsheet_id, worksheet)
+            )
+        ''')
+        conn.commit()
+        conn.close()
+
+    def modified_time(self, force=False):
+        """
+        試算表最後修改時間（check_interval 秒內重複呼叫使用上次結果）
+
+        Returns:
+            str: modifiedTime，無法取得時為 None
+        """
+        now = time.monotonic()
+        if force or self._modified_checked is None or now - self._modified_checked > self.check_interval:
+            try:
+                self._modified = spreadsheet_modified_time(self.spreadsheet)
+            except Exception as e:
+                self.logger.debug(f"無法取得試算表修改時間: {e}")
+                self._modified = None
+            self._modified_checked = now
+        return self._modified
+
+    def _load(self, worksheet_name):
+        """從鏡像檔讀取工作表"""
+        conn = sqlite3.connect(self.path)
+        row = conn.execute('''
+            SELECT modified_time, full_fetched_at, data FROM sheet_mirror
+            WHERE spreadsheet_id = ? AND worksheet = ?
+        ''', (self.spreadsheet_id, worksheet_name)).fetchone()
+        conn.close()
+        if row is None:
+            return None
+        return {
+            'modified': row[0],
+            'full_fetched_at': row[1],
+            'values': json.loads(gzip.decompress(row[2]).decode('utf-8')),
+        }
+
+    def _save(self, worksheet_name, entry):
+        """寫入鏡像檔"""
+        data = gzip.compress(json.dumps(entry['values'], ensure_ascii=False).encode('utf-8'))
+        conn = sqlite3.connect(self.path)
+        conn.execute('''
+            INSERT OR REPLACE INTO sheet_mirror
+            (spreadsheet_id, worksheet, modified_time, full_fetched_at, row_count, data)
+            VALUES (?, ?, ?, ?, ?, ?)
+        ''', (self.spreadsheet_id, worksheet_name, entry['modified'], entry['full_fetched_at'],
+              len(entry['values']), data))
+        conn.commit()
+        conn.close()
+        self._entries[worksheet_name] = entry
+
+    def _full_refresh_due(self, entry):
+        """是否超過完整重新下載的間隔"""
+        fetched_at = datetime.fromisoformat(entry['full_fetched_at'])
+        return datetime.now() - fetched_at > timedelta(hours=self.full_refresh_hours)
+
+    def _fetch_tail(self, worksheet, cached):
+        """
+        只抓取鏡像最後 overlap 列之後的資料
+
+        Returns:
+            list: 更新後的完整內容；重疊列與鏡像不一致（中間有修改或刪除）時為 None
+        """
+        start = max(1, len(cached) - self.overlap + 1)
+        width = max(len(cached[0]) if cached else 0, worksheet.col_count)
+        tail = _pad(worksheet.get(f"A{start}:{column_letter(width)}"))
+        known = cached[start - 1:]
+        if len(tail) < len(known):
+            return None
+
+        cached_width = len(cached[0]) if cached else 0
+        tail_width = len(tail[0]) if tail else 0
+        if tail_width > cached_width:
+            # 新增了欄位，整份重新下載較單純
+            return None
+        tail = [row + [''] * (cached_width - len(row)) for row in tail]
+        if tail[:len(known)] != known:
+            return None
+        return cached + tail[len(known):]
+
+    def get_all_values(self, worksheet_name, refresh=False):
+        """
+        取得工作表內容（與 gspread Worksheet.get_all_values() 相同格式，請勿修改回傳的列表）
+
+        Args:
+            worksheet_name: 工作表名稱
+            refresh: 強制完整重新下載
+
+        Returns:
+            list: 每列一個字串列表，第一列為表頭
+        """
+        fetched = self._fetched.get(worksheet_name)
+        if not refresh and fetched is not None and time.monotonic() - fetched < self.check_interval:
+            return self._entries[worksheet_name]['values']
+
+        entry = self._entries.get(worksheet_name) or self._load(worksheet_name)
+        modified = self.modified_time()
+
+        if entry and not refresh and modified is not None and entry['modified'] == modified:
+            self._entries[worksheet_name] = entry
+            self._fetched[worksheet_name] = time.monotonic()
+            return entry['values']
+
+        worksheet = self.spreadsheet.worksheet(worksheet_name)
+        values = None
+        full_fetched_at = entry['full_fetched_at'] if entry else None
+        if entry and entry['values'] and not refresh and not self._full_refresh_due(entry):
+            values = self._fetch_tail(worksheet, entry['values'])
+            if values is not None:
+                self.logger.debug(f"🪞 {worksheet_name} 增量更新 {len(values) - len(entry['values'])} 列")
+        if values is None:
+            values = _pad(worksheet.get_all_values())
+            full_fetched_at = datetime.now().isoformat(timespec='seconds')
+            self.logger.debug(f"🪞 {worksheet_name} 完整下載 {len(values)} 列")
+
+        entry = {'modified': modified, 'full_fetched_at': full_fetched_at, 'values': values}
+        self._save(worksheet_name, entry)
+        self._fetched[worksheet_name] = time.monotonic()
+        return values
+
+    def get_all_records(self, worksheet_name, numericise=True, refresh=False):
+        """
+        取得工作表資料（與 gspread Worksheet.get_all_records() 相同格式）
+
+        Args:
+            worksheet_name: 工作表名稱
+            numericise: 是否把數字字串轉為數值
+            refresh: 強制完整重新下載
+
+        Returns:
+            list: 每列一個以表頭為鍵的字典
+        """
+        values = self.get_all_values(worksheet_name, refresh)
+        if len(values) < 2:
+            return []
+        headers = values[0]
+        convert = numericise_value if numericise else (lambda value: value)
+        return [dict(zip(headers, map(convert, row))) for row in values[1:]]
+
+    def frame(self, worksheet_name, refresh=False):
+        """
+        取得工作表資料的 DataFrame（欄位為表頭，值為字串；可再用 schema_mapping.typed_frame 轉型）
+
+        Args:
+            worksheet_name: 工作表名稱
+            refresh: 強制完整重新下載
+        """
+        values = self.get_all_values(worksheet_name, refresh)
+        if len(values) < 2:
+            return pd.DataFrame(columns=values[0] if values else None)
+        return pd.DataFrame(values[1:], columns=values[0])
+
+    def row_count(self, worksheet_name):
+        """工作表的資料列數（含表頭）"""
+        return len(self.get_all_values(worksheet_name))
+
+    def apply_writes(self, worksheet_name, updates=None, appended=None):
+        """
+        把本程式寫入的內容同步到鏡像（寫入後的修改時間未知，下次讀取會以尾端比對確認）
+
+        Args:
+            worksheet_name: 工作表名稱
+            updates: {工作表列號(1起算): 該列的值}
+            appended: 附加到尾端的列
+        """
+        entry = self._entries.get(worksheet_name) or self._load(worksheet_name)
+        if not entry:
+            return
+        values = entry['values']
+        for row_number, row in (updates or {}).items():
+            if 0 < row_number <= len(values):
+                values[row_number - 1] = _displayed_row(row)
+        for row in appended or []:
+            values.append(_displayed_row(row))
+        entry['values'] = _pad(values)
+        entry['modified'] = None
+        self._save(worksheet_name, entry)
+        self._fetched[worksheet_name] = time.monotonic()
+
+    def invalidate(self, worksheet_name=None):
+        """
+        捨棄鏡像（下次讀取完整重新下載）
+
+        Args:
+            worksheet_name: 工作表名稱，None 表示整個試算表
+        """
+        conn = sqlite3.connect(self.path)
+        if worksheet_name is None:
+            conn.execute('DELETE FROM sheet_mirror WHERE spreadsheet_id = ?', (self.spreadsheet_id,))
+            self._entries.clear()
+            self._fetched.clear()
+        else:
+            conn.execute('DELETE FROM sheet_mirror WHERE spreadsheet_id = ? AND worksheet = ?',
+                         (self.spreadsheet_id, worksheet_name))
+            self._entries.pop(worksheet_name, None)
+            self._fetched.pop(worksheet_name, None)
+        conn.commit()
+        conn.close()
@@ -0,0 +1,232 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Google Sheets API 配額控管
+包住 gspread 客戶端的每一次 HTTP 請求：依配額類別（讀取/寫入/Drive）以令牌桶控制速率，
+遇到 429 或 5xx 以指數退避加隨機抖動重試，同時進行中的相同讀取請求合併為一次
+"""
+
+import time
+import random
+import logging
+import threading
+from collections import Counter
+
+try:
+    import requests
+    NETWORK_ERRORS = (requests.exceptions.ConnectionError, requests.exceptions.Timeout)
+except ImportError:
+    NETWORK_ERRORS = (ConnectionError, TimeoutError)
+
+# 每分鐘請求上限（Sheets API 每位使用者的讀取/寫入配額皆為每分鐘60次；Drive 中繼資料查詢另計）
+DEFAULT_LIMITS = {'read': 60, 'write': 60, 'drive': 300}
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+def _status_code(error):
+    """gspread APIError（或其他帶 response 的例外）的 HTTP 狀態碼"""
+    response = getattr(error, 'response', None)
+    return getattr(response, 'status_code', None)
+
+
+def _retry_after(error):
+    """回應標頭 Retry-After 的秒數（沒有或無法解析時為 None）"""
+    response = getattr(error, 'response', None)
+    headers = getattr(response, 'headers', None) or {}
+    try:
+        return float(headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+class TokenBucket:
+    """令牌桶：每分鐘補充 rate 個令牌，最多累積 burst 個"""
+
+    def __init__(self, rate, burst, clock=time.monotonic, sleep=time.sleep):
+        """
+        Args:
+            rate: 每分鐘請求數
+            burst: 可連續送出的請求數
+        """
+        self.rate = rate / 60.0
+        self.capacity = float(burst)
+        self.tokens = float(burst)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def acquire(self):
+        """
+        取得一個令牌（不足時等待）
+
+        Returns:
+            float: 等待的秒數
+        """
+        waited = 0.0
+        while True:
+            with self._lock:
+                self._refill()
+                # 容許浮點誤差，否則補充到 0.999... 時會以極短的等待無限循環
+                if self.tokens >= 1 - 1e-9:
+                    self.tokens = max(self.tokens - 1, 0.0)
+                    return waited
+                delay = (1 - self.tokens) / self.rate
+            self.sleep(delay)
+            waited += delay
+
+    def drain(self):
+        """收到 429 後清空令牌，讓其他執行緒也一起放慢"""
+        with self._lock:
+            self._refill()
+            self.tokens = min(self.tokens, 0.0)
+
+
+class _InFlight:
+    """進行中的請求（供合併的等待者取得結果）"""
+
+    __slots__ = ('done', 'result', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class QuotaGate:
+    """所有 gspread 請求的共同關卡"""
+
+    def __init__(self, limits=None, burst=10, max_retries=6, base_delay=1.0, max_delay=64.0,
+                 clock=time.monotonic, sleep=time.sleep):
+        """
+        初始化配額關卡
+
+        Args:
+            limits: 各配額類別的每分鐘請求數（預設 DEFAULT_LIMITS）
+            burst: 各類別可連續送出的請求數
+            max_retries: 429/5xx/網路錯誤的最多重試次數
+            base_delay: 第一次退避的秒數（之後每次加倍）
+            max_delay: 單次退避的上限秒數
+        """
+        limits = {**DEFAULT_LIMITS, **(limits or {})}
+        self.buckets = {name: TokenBucket(rate, min(burst, rate), clock, sleep) for name, rate in limits.items()}
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.sleep = sleep
+        self.logger = logging.getLogger(__name__)
+        self.stats = Counter()
+
+        self._lock = threading.Lock()
+        self._inflight = {}
+
+    @staticmethod
+    def bucket_for(method, endpoint):
+        """請求所屬的配額類別"""
+        if 'googleapis.com/drive' in str(endpoint):
+            return 'drive'
+        return 'read' if method.upper() == 'GET' else 'write'
+
+    def _backoff(self, attempt, error):
+        """第 attempt 次重試前的等待秒數（截斷的指數退避 + 完整抖動；有 Retry-After 時至少等待該秒數）"""
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        retry_after = _retry_after(error)
+        if retry_after is not None:
+            delay = max(delay, retry_after)
+        return delay
+
+    def _send(self, send, bucket, method, endpoint, args, kwargs):
+        """依配額送出請求，可重試的錯誤以退避重試"""
+        for attempt in range(self.max_retries + 1):
+            waited = self.buckets[bucket].acquire()
+            if waited:
+                self.stats['throttled_seconds'] += waited
+            self.stats[bucket] += 1
+            try:
+                return send(method, endpoint, *args, **kwargs)
+            except Exception as e:
+                status = _status_code(e)
+                if status not in RETRY_STATUS and not isinstance(e, NETWORK_ERRORS):
+                    raise
+                if attempt == self.max_retries:
+                    self.logger.error(f"❌ Google Sheets API 重試 {self.max_retries} 次仍失敗（{status or type(e).__name__}）: {method} {endpoint}")
+                    raise
+                if status == 429:
+                    self.buckets[bucket].drain()
+                delay = self._backoff(attempt, e)
+                self.stats['retries'] += 1
+                self.logger.warning(f"⏳ Google Sheets API {status or type(e).__name__}，{delay:.1f} 秒後重試（第 {attempt + 1} 次）")
+                self.sleep(delay)
+
+    def request(self, send, method, endpoint, *args, **kwargs):
+        """
+        經由關卡送出請求
+
+        Args:
+            send: 原本的 request(method, endpoint, ...) 函數
+            method: HTTP 方法
+            endpoint: 請求網址
+
+        Returns:
+            send 的回傳值（requests.Response）
+        """
+        bucket = self.bucket_for(method, endpoint)
+        if method.upper() != 'GET':
+            return self._send(send, bucket, method, endpoint, args, kwargs)
+
+        # 相同的讀取請求正在進行時，等待並共用其結果
+        key = (endpoint, repr(args), repr(sorted(kwargs.items())))
+        with self._lock:
+            call = self._inflight.get(key)
+            leader = call is None
+            if leader:
+                call = self._inflight[key] = _InFlight()
+        if not leader:
+            self.stats['coalesced'] += 1
+            call.done.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._send(send, bucket, method, endpoint, args, kwargs)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            call.done.set()
+
+    def install(self, client):
+        """
+        把關卡裝到 gspread 客戶端（gspread 6 的 client.http_client.request，舊版的 client.request）
+
+        Returns:
+            client
+        """
+        target = getattr(client, 'http_client', None) or client
+        send = target.request
+        if getattr(send, 'quota_gate', None) is not None:
+            return client
+
+        def request(method, endpoint, *args, **kwargs):
+            return self.request(send, method, endpoint, *args, **kwargs)
+
+        request.quota_gate = self
+        target.request = request
+        return client
+
+    def summary(self):
+        """統計摘要字串"""
+        counts = ', '.join(f"{name} {self.stats[name]}" for name in self.buckets if self.stats[name])
+        return (f"{counts or '無請求'}；重試 {self.stats['retries']} 次、合併 {self.stats['coalesced']} 次、"
+                f"限速等待 {self.stats['throttled_seconds']:.1f} 秒")
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Google Sheets 程序層級的連線快取
+同一個程序內的所有 GoogleSheetsManager 共用已認證的客戶端（含存取權杖）、配額關卡、
+已開啟的試算表、工作表清單與本機鏡像，避免每建立一個管理器就重新認證、重新 open_by_key、重新查詢工作表
+"""
+
+import json
+import hashlib
+import logging
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from pathlib import Path
+from sheets_mirror import SheetsMirror
+from sheets_quota import QuotaGate
+
+# 權杖剩餘有效時間少於此秒數時，沿用客戶端前先更新
+TOKEN_REFRESH_MARGIN = 300
+
+
+def credentials_key(credentials_json=None, credentials_file=None):
+    """
+    認證來源的快取鍵（環境變數內容的雜湊，或檔案路徑加修改時間；認證檔更換後會重新認證）
+
+    Returns:
+        tuple: 無可用認證時為 None
+    """
+    if credentials_json:
+        return ('env', hashlib.sha256(credentials_json.encode('utf-8')).hexdigest())
+    if credentials_file is not None and Path(credentials_file).exists():
+        path = Path(credentials_file).resolve()
+        return ('file', str(path), path.stat().st_mtime_ns)
+    return None
+
+
+def _credentials(client):
+    """客戶端使用的 google-auth 認證物件（gspread 6 在 http_client.auth，舊版在 client.auth）"""
+    return getattr(getattr(client, 'http_client', None), 'auth', None) or getattr(client, 'auth', None)
+
+
+class SheetsSession:
+    """程序內共用的 Google Sheets 連線狀態"""
+
+    def __init__(self):
+        self.logger = logging.getLogger(__name__)
+        self.stats = Counter()
+        self._lock = threading.RLock()
+        self._quota_gate = None
+        self._clients = {}
+        self._spreadsheets = {}
+        self._worksheets = {}
+        self._mirrors = {}
+        self._configs = {}
+
+    @property
+    def quota_gate(self):
+        """共用的配額關卡（配額以使用者計算，同一程序的所有請求應經過同一個關卡）"""
+        with self._lock:
+            if self._quota_gate is None:
+                self._quota_gate = QuotaGate()
+            return self._quota_gate
+
+    def client(self, key):
+        """
+        已認證的客戶端（權杖接近到期時先更新）
+
+        Args:
+            key: credentials_key() 的回傳值
+
+        Returns:
+            快取的客戶端，沒有時為 None
+        """
+        with self._lock:
+            client = self._clients.get(key)
+        if client is None:
+            return None
+        self.stats['client_reused'] += 1
+        self.ensure_token(client)
+        return client
+
+    def add_client(self, key, client):
+        """登記新認證的客戶端"""
+        with self._lock:
+            self._clients[key] = client
+        self.stats['authorize'] += 1
+        return client
+
+    def ensure_token(self, client, margin=TOKEN_REFRESH_MARGIN):
+        """
+        存取權杖剩餘不到 margin 秒（或尚未取得）時更新；其餘情況沿用，不另外呼叫 OAuth
+
+        Returns:
+            bool: 是否更新了權杖
+        """
+        credentials = _credentials(client)
+        if credentials is None or not hasattr(credentials, 'refresh'):
+            return False
+        expiry = getattr(credentials, 'expiry', None)
+        if getattr(credentials, 'token', None) and expiry is not None:
+            now = datetime.now(timezone.utc).replace(tzinfo=None)
+            if (expiry - now).total_seconds() > margin:
+                return False
+        elif getattr(credentials, 'token', None):
+            return False
+
+        try:
+            from google.auth.transport.requests import Request
+            with self._lock:
+                credentials.refresh(Request())
+            self.stats['token_refresh'] += 1
+            self.logger.debug("🔑 Google存取權杖已更新")
+            return True
+        except Exception as e:
+            # 交給 gspread 的 AuthorizedSession 在下一次請求時處理
+            self.logger.debug(f"更新Google存取權杖失敗: {e}")
+            return False
+
+    def spreadsheet(self, client, spreadsheet_id):
+        """
+        開啟試算表（同一客戶端的同一試算表只 open_by_key 一次）
+
+        Returns:
+            gspread Spreadsheet
+        """
+        key = (id(client), spreadsheet_id)
+        with self._lock:
+            spreadsheet = self._spreadsheets.get(key)
+        if spreadsheet is not None:
+            self.stats['spreadsheet_reused'] += 1
+            return spreadsheet
+
+        spreadsheet = client.open_by_key(spreadsheet_id)
+        self.stats['open'] += 1
+        return self.add_spreadsheet(client, spreadsheet)
+
+    def add_spreadsheet(self, client, spreadsheet):
+        """登記已開啟（或剛建立）的試算表"""
+        with self._lock:
+            self._spreadsheets[(id(client), spreadsheet.id)] = spreadsheet
+        return spreadsheet
+
+    def worksheets(self, spreadsheet):
+        """
+        快取的工作表清單
+
+        Returns:
+            dict: {工作表名稱: Worksheet}（共用的字典），尚未查詢過時為 None
+        """
+        with self._lock:
+            entry = self._worksheets.get(spreadsheet.id)
+        if entry is None or entry[0] is not spreadsheet:
+            return None
+        return entry[1]
+
+    def load_worksheets(self, spreadsheet):
+        """以一次 worksheets() 查詢工作表清單並快取"""
+        worksheets = {ws.title: ws for ws in spreadsheet.worksheets()}
+        with self._lock:
+            self._worksheets[spreadsheet.id] = (spreadsheet, worksheets)
+        self.stats['metadata'] += 1
+        return worksheets
+
+    def forget_worksheet(self, spreadsheet, title):
+        """工作表刪除後移出快取"""
+        worksheets = self.worksheets(spreadsheet)
+        if worksheets is not None:
+            with self._lock:
+                worksheets.pop(title, None)
+
+    def mirror(self, spreadsheet, path, create=True):
+        """
+        試算表的本機鏡像（同一程序共用，鏡像內的讀取時間記錄才能跨管理器沿用）
+
+        Args:
+            spreadsheet: gspread Spreadsheet
+            path: 鏡像SQLite檔案路徑
+            create: 沒有時是否建立
+
+        Returns:
+            SheetsMirror，create=False 且尚未建立時為 None
+        """
+        key = (spreadsheet.id, str(Path(path).resolve()))
+        with self._lock:
+            mirror = self._mirrors.get(key)
+            if mirror is not None and mirror.spreadsheet is spreadsheet:
+                return mirror
+            if not create:
+                return None
+            mirror = self._mirrors[key] = SheetsMirror(spreadsheet, path)
+            return mirror
+
+    def configured_spreadsheet_id(self, config_file="config/spreadsheet_config.json"):
+        """
+        設定檔中的試算表ID（依修改時間快取，檔案更新後重新讀取）
+
+        Returns:
+            str: 設定檔不存在或沒有ID時為 None
+        """
+        config_file = Path(config_file)
+        if not config_file.exists():
+            return None
+        key = str(config_file.resolve())
+        mtime = config_file.stat().st_mtime_ns
+        with self._lock:
+            cached = self._configs.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+
+        with open(config_file, 'r', encoding='utf-8') as f:
+            spreadsheet_id = json.load(f).get('spreadsheet_id')
+        with self._lock:
+            self._configs[key] = (mtime, spreadsheet_id)
+        return spreadsheet_id
+
+    def summary(self):
+        """統計摘要字串"""
+        return (f"認證 {self.stats['authorize']} 次（沿用 {self.stats['client_reused']} 次）、"
+                f"開啟試算表 {self.stats['open']} 次（沿用 {self.stats['spreadsheet_reused']} 次）、"
+                f"查詢工作表 {self.stats['metadata']} 次、更新權杖 {self.stats['token_refresh']} 次")
+
+    def clear(self):
+        """清除所有快取（例如切換帳號）"""
+        with self._lock:
+            self._clients.clear()
+            self._spreadsheets.clear()
+            self._worksheets.clear()
+            self._mirrors.clear()
+            self._configs.clear()
+
+
+_session = SheetsSession()
+
+
+def get_session():
+    """目前程序的 SheetsSession"""
+    return _session
@@ -7,9 +7,9 @@
 
 from google_sheets_manager import GoogleSheetsManager
 from database_manager import TaifexDatabaseManager
+from schema_mapping import db_to_sheets
 import json
 from pathlib import Path
-import pandas as pd
 
 def main():
     print("🚀 開始同步最近資料到Google Sheets歷史資料工作表...")
@@ -47,30 +47,7 @@ def main():
     print(f"📅 日期範圍: {dates}")
     
     # 準備Google Sheets格式的資料
-    sheets_data = []
-    for _, row in recent_data.iterrows():
-        # 轉換資料格式以符合Google Sheets
-        sheets_row = {
-            '日期': row['date'],
-            '契約名稱': row['contract_code'],
-            '身份別': row['identity_type'],
-            '多方交易口數': row.get('long_trade_volume', 0),
-            '多方契約金額': row.get('long_trade_amount', 0),
-            '空方交易口數': row.get('short_trade_volume', 0),
-            '空方契約金額': row.get('short_trade_amount', 0),
-            '多空淨額交易口數': row.get('net_trade_volume', 0),
-            '多空淨額契約金額': row.get('net_trade_amount', 0),
-            '多方未平倉口數': row.get('long_position_volume', 0),
-            '多方未平倉契約金額': row.get('long_position_amount', 0),
-            '空方未平倉口數': row.get('short_position_volume', 0),
-            '空方未平倉契約金額': row.get('short_position_amount', 0),
-            '多空淨額未平倉口數': row.get('net_position_volume', 0),
-            '多空淨額未平倉契約金額': row.get('net_position_amount', 0),
-        }
-        sheets_data.append(sheets_row)
-    
-    # 轉換為DataFrame
-    df = pd.DataFrame(sheets_data)
+    df = db_to_sheets(recent_data)
     print(f"📝 準備上傳 {len(df)} 筆資料")
     
     # 顯示將要上傳的資料概覽
@@ -21,10 +21,18 @@ import random
 import json
 from pathlib import Path
 import pytz
+from futures_records import FuturesRecord, RecordAccumulator, TRADING_METRICS, COMPLETE_METRICS
+from data_quality import DataQualityChecker
 try:
     from database_manager import TaifexDatabaseManager
+    from schema_mapping import crawler_to_db, db_to_sheets, parse_dates
+    from change_log import ChangeLog
     from daily_report_generator import DailyReportGenerator
+    from rolling_metrics import RollingMetricsStore
+    from parquet_archive import ParquetArchive, PYARROW_AVAILABLE
+    from timeseries_cube import TimeSeriesCube
     from google_sheets_manager import GoogleSheetsManager
+    from sheets_archiver import SheetsArchiver
     from telegram_notifier import TelegramNotifier
     from chart_generator import ChartGenerator
     DB_AVAILABLE = True
@@ -121,6 +129,10 @@ class TaifexCrawler:
         
         # 確保輸出目錄存在
         os.makedirs(self.output_dir, exist_ok=True)
+        
+        # 資料品質檢查（有資料庫時由主程式換成以資料庫歷史為基準的檢查器）
+        self.quality_checker = DataQualityChecker()
+        self.last_quality_report = None
     
     def fetch_data(self, date_str, contract, query_type='2', market_code='0', identity=None):
         """
@@ -324,44 +336,14 @@ class TaifexCrawler:
             return None
     
     def _build_data_dict(self, date_str, contract, identity, cell_texts, start_idx):
-        """構建資料字典"""
+        """構建資料列（依資料類型取交易量或交易量 + 未平倉欄位）"""
         try:
-            # 基本資料
-            data = {
-                '日期': date_str,
-                '契約名稱': contract,
-                '身份別': identity,
-            }
-            
-            # 根據資料類型決定要提取的欄位
-            if self.data_type == 'TRADING':
-                # 僅提取交易量資料
-                data.update({
-                    '多方交易口數': self._parse_number(cell_texts[start_idx]) if len(cell_texts) > start_idx else 0,
-                    '多方契約金額': self._parse_number(cell_texts[start_idx+1]) if len(cell_texts) > start_idx+1 else 0,
-                    '空方交易口數': self._parse_number(cell_texts[start_idx+2]) if len(cell_texts) > start_idx+2 else 0,
-                    '空方契約金額': self._parse_number(cell_texts[start_idx+3]) if len(cell_texts) > start_idx+3 else 0,
-                    '多空淨額交易口數': self._parse_number(cell_texts[start_idx+4]) if len(cell_texts) > start_idx+4 else 0,
-                    '多空淨額契約金額': self._parse_number(cell_texts[start_idx+5]) if len(cell_texts) > start_idx+5 else 0,
-                })
-            else:
-                # 提取完整資料（交易量 + 未平倉）
-                data.update({
-                    '多方交易口數': self._parse_number(cell_texts[start_idx]) if len(cell_texts) > start_idx else 0,
-                    '多方契約金額': self._parse_number(cell_texts[start_idx+1]) if len(cell_texts) > start_idx+1 else 0,
-                    '空方交易口數': self._parse_number(cell_texts[start_idx+2]) if len(cell_texts) > start_idx+2 else 0,
-                    '空方契約金額': self._parse_number(cell_texts[start_idx+3]) if len(cell_texts) > start_idx+3 else 0,
-                    '多空淨額交易口數': self._parse_number(cell_texts[start_idx+4]) if len(cell_texts) > start_idx+4 else 0,
-                    '多空淨額契約金額': self._parse_number(cell_texts[start_idx+5]) if len(cell_texts) > start_idx+5 else 0,
-                    '多方未平倉口數': self._parse_number(cell_texts[start_idx+6]) if len(cell_texts) > start_idx+6 else 0,
-                    '多方未平倉契約金額': self._parse_number(cell_texts[start_idx+7]) if len(cell_texts) > start_idx+7 else 0,
-                    '空方未平倉口數': self._parse_number(cell_texts[start_idx+8]) if len(cell_texts) > start_idx+8 else 0,
-                    '空方未平倉契約金額': self._parse_number(cell_texts[start_idx+9]) if len(cell_texts) > start_idx+9 else 0,
-                    '多空淨額未平倉口數': self._parse_number(cell_texts[start_idx+10]) if len(cell_texts) > start_idx+10 else 0,
-                    '多空淨額未平倉契約金額': self._parse_number(cell_texts[start_idx+11]) if len(cell_texts) > start_idx+11 else 0
-                })
-            
-            return data
+            metrics = TRADING_METRICS if self.data_type == 'TRADING' else COMPLETE_METRICS
+            values = [
+                self._parse_number(cell_texts[start_idx + i]) if len(cell_texts) > start_idx + i else 0
+                for i in range(len(metrics))
+            ]
+            return FuturesRecord(date_str, contract, identity, values)
         except Exception as e:
             logger.error(f"構建資料字典時發生錯誤: {str(e)}")
             return None
@@ -512,40 +494,9 @@ class TaifexCrawler:
                     return self._parse_number(cell_texts[idx])
                 return 0
             
-            # 構建資料字典
-            data = {
-                '日期': date_str,
-                '契約名稱': contract,
-                '身份別': identity,
-            }
-            
-            # 根據資料類型決定要提取的欄位
-            if self.data_type == 'TRADING':
-                # 僅提取交易量資料
-                data.update({
-                    '多方交易口數': safe_get('多方交易口數'),
-                    '多方契約金額': safe_get('多方契約金額'),
-                    '空方交易口數': safe_get('空方交易口數'),
-                    '空方契約金額': safe_get('空方契約金額'),
-                    '多空淨額交易口數': safe_get('多空淨額交易口數'),
-                    '多空淨額契約金額': safe_get('多空淨額契約金額'),
-                })
-            else:
-                # 提取完整資料（交易量 + 未平倉）
-                data.update({
-                    '多方交易口數': safe_get('多方交易口數'),
-                    '多方契約金額': safe_get('多方契約金額'),
-                    '空方交易口數': safe_get('空方交易口數'),
-                    '空方契約金額': safe_get('空方契約金額'),
-                    '多空淨額交易口數': safe_get('多空淨額交易口數'),
-                    '多空淨額契約金額': safe_get('多空淨額契約金額'),
-                    '多方未平倉口數': safe_get('多方未平倉口數'),
-                    '多方未平倉契約金額': safe_get('多方未平倉契約金額'),
-                    '空方未平倉口數': safe_get('空方未平倉口數'),
-                    '空方未平倉契約金額': safe_get('空方未平倉契約金額'),
-                    '多空淨額未平倉口數': safe_get('多空淨額未平倉口數'),
-                    '多空淨額未平倉契約金額': safe_get('多空淨額未平倉契約金額')
-                })
+            # 根據資料類型決定要提取的欄位（交易量，或交易量 + 未平倉）
+            metrics = TRADING_METRICS if self.data_type == 'TRADING' else COMPLETE_METRICS
+            data = FuturesRecord(date_str, contract, identity, [safe_get(field) for field in metrics])
             
             # 記錄日誌信息
             logger.debug(f"使用絕對位置解析 {contract} {identity}，在第 {target_index} 行")
@@ -647,8 +598,8 @@ class TaifexCrawler:
         
         logger.info(f"準備執行 {len(tasks)} 個爬取任務")
         
-        # 使用多線程加速爬取
-        all_results = []
+        # 使用多線程加速爬取，結果直接存入各欄位的型別陣列
+        all_results = RecordAccumulator()
         with concurrent.futures.ThreadPoolExecutor(max_workers=self.max_workers) as executor:
             # 創建任務
             future_to_task = {}
@@ -676,9 +627,8 @@ class TaifexCrawler:
                 logger.debug(f"{date_str} {contract} {identity or '總計'}: {status}")
         
         # 將結果轉換為 DataFrame
-        if all_results:
-            df = pd.DataFrame(all_results)
-            return df
+        if len(all_results):
+            return all_results.to_frame()
         else:
             logger.warning("沒有找到任何資料")
             return pd.DataFrame()
@@ -709,40 +659,15 @@ class TaifexCrawler:
         return csv_path, excel_path
         
     def _verify_data_consistency(self, df):
-        """驗證資料一致性，檢查是否有契約類型混淆的情況"""
-        if '契約名稱' not in df.columns or '身份別' not in df.columns:
-            return
-            
-        # 檢查每個身份別和契約的組合
-        for identity in df['身份別'].dropna().unique():
-            if not identity:
-                continue
-                
-            for contract in CONTRACTS:
-                contract_data = df[(df['身份別'] == identity) & (df['契約名稱'] == contract)]
-                
-                if len(contract_data) == 0:
-                    continue
-                    
-                # 檢查數據是否合理
-                has_suspicious_data = False
-                
-                # 如果同一契約有多筆資料，可能是錯誤識別
-                if len(contract_data) > len(contract_data['日期'].unique()):
-                    logger.warning(f"偵測到 {contract} {identity} 可能有重複資料")
-                    has_suspicious_data = True
-                
-                # 檢查口數差距是否過大（可能是不同契約的資料被錯誤識別）
-                if len(contract_data) > 3:
-                    avg_vol = contract_data['多方交易口數'].mean()
-                    max_vol = contract_data['多方交易口數'].max()
-                    
-                    if max_vol > 5 * avg_vol and max_vol > 1000:
-                        logger.warning(f"偵測到 {contract} {identity} 可能有異常值，最大值 {max_vol} 遠大於平均值 {avg_vol}")
-                        has_suspicious_data = True
-                
-                if has_suspicious_data:
-                    logger.info(f"請檢查 {contract} {identity} 的資料是否正確，可能存在契約識別錯誤")
+        """
+        資料品質檢查（重複資料、多空淨額、身份別加總、與近期歷史相比的異常值）
+
+        Returns:
+            QualityReport: 檢查結果，同時保存在 self.last_quality_report
+        """
+        self.last_quality_report = self.quality_checker.check(df)
+        self.last_quality_report.log(logger)
+        return self.last_quality_report
 
     def _find_column_indices(self, table):
         """尋找表頭中各欄位的索引位置"""
@@ -851,6 +776,9 @@ def parse_arguments():
                         help='請求間隔時間 (秒)')
     parser.add_argument('--max_retries', type=int, default=3,
                         help='最大重試次數')
+    parser.add_argument('--sheets_workers', type=int, default=1,
+                        help='Google Sheets 各工作表同時寫入的最大數量 (預設1=所有工作表一次送出、全部成功或全部不生效；'
+                             '大於1時各工作表獨立送出，可能只有部分工作表寫入成功)')
     
     # 資料完整性檢查參數
     parser.add_argument('--check_days', type=int, default=10,
@@ -956,10 +884,22 @@ def main():
     # 初始化資料庫管理器
     if DB_AVAILABLE:
         db_manager = TaifexDatabaseManager()
-        report_generator = DailyReportGenerator(db_manager)
+        # 滾動指標隨每次寫入增量更新
+        rolling_store = RollingMetricsStore(db_manager.db_path).attach(db_manager)
+        # 寫入後同步Parquet歷史歸檔（需要 pyarrow）
+        if PYARROW_AVAILABLE:
+            ParquetArchive().attach(db_manager)
+        # 圖表用的時間序列資料方塊隨寫入增量更新
+        time_cube = TimeSeriesCube().attach(db_manager)
+        # 資料異動紀錄：各下游只處理新的異動
+        change_log = ChangeLog(db_manager.db_path)
+        report_generator = DailyReportGenerator(db_manager, rolling_store)
         logger.info("資料庫系統已啟用")
     else:
         db_manager = None
+        rolling_store = None
+        time_cube = None
+        change_log = None
         report_generator = None
     
     # 初始化Google Sheets管理器
@@ -1009,6 +949,9 @@ def main():
         max_retries=args.max_retries,
         data_type=args.data_type
     )
+    # 異常值以資料庫中的近期歷史為比對基準
+    if db_manager:
+        crawler.quality_checker = DataQualityChecker(db_manager)
     
     # 爬取資料
     df = crawler.crawl_date_range(
@@ -1060,29 +1003,48 @@ def main():
         # 用於儲存資料庫相關資料
         recent_data = pd.DataFrame()
         summary_data = pd.DataFrame()
+        trend_data = None
+        db_saved = False
+        data_changed = True
         
         # 2. 保存到資料庫（如果可用）
         if db_manager and not df.empty:
             try:
                 # 轉換資料格式以符合資料庫結構
                 db_df = prepare_data_for_db(df)
-                db_manager.insert_data(db_df)
-                logger.info("資料已成功存入資料庫")
+                ingest_stats = db_manager.insert_data(db_df)
+                db_saved = True
+                data_changed = ingest_stats['inserted'] + ingest_stats['updated'] > 0
+                if data_changed:
+                    logger.info("資料已成功存入資料庫")
+                else:
+                    # 重新爬取到的內容與資料庫完全相同（內容雜湊一致），下游只需處理先前未完成的同步
+                    logger.info(f"ℹ️ {ingest_stats['unchanged']} 筆資料與資料庫內容相同，沒有實際異動")
                 
-                # 生成30天日報（如果資料足夠）
+                # 生成30天日報（如果資料足夠且有異動）
                 recent_data = db_manager.get_recent_data(30)
-                if not recent_data.empty and len(recent_data) > 50:  # 確保有足夠資料
+                if data_changed and not recent_data.empty and len(recent_data) > 50:  # 確保有足夠資料
                     report = report_generator.generate_30day_report()
                     if report:
                         logger.info("30天分析報告已生成")
                 
-                # 匯出最新30天資料到固定檔案
+                # 匯出最新30天資料到固定檔案（資料有異動或檔案不存在時才重新匯出）
                 latest_30d_path = Path(args.output_dir) / "台期所最新30天資料.xlsx"
-                db_manager.export_to_excel(latest_30d_path, days=30)
-                logger.info(f"最新30天資料已匯出: {latest_30d_path}")
+                if change_log.has_pending('excel_export') or not latest_30d_path.exists():
+                    export_seq = change_log.latest_seq()
+                    db_manager.export_to_excel(latest_30d_path, days=30)
+                    change_log.ack('excel_export', export_seq)
+                    logger.info(f"最新30天資料已匯出: {latest_30d_path}")
+                else:
+                    logger.info("ℹ️ 資料無異動，沿用既有的最新30天資料檔")
                 
                 # 取得摘要資料
                 summary_data = db_manager.get_daily_summary(30)
+                logger.debug(f"資料庫查詢快取: {db_manager.cache_info()}")
+                
+                # 取得預先計算的三大法人7日平均
+                if not summary_data.empty:
+                    trend_data = rolling_store.get_wide(window=7, start=summary_data['date'].min())
                 
             except Exception as e:
                 logger.error(f"資料庫操作失敗: {e}")
@@ -1094,15 +1056,9 @@ def main():
                 # 連接或建立試算表
                 spreadsheet_config_file = Path("config/spreadsheet_config.json")
                 
-                if spreadsheet_config_file.exists():
-                    # 載入現有試算表配置
-                    with open(spreadsheet_config_file, 'r', encoding='utf-8') as f:
-                        config = json.load(f)
-                        spreadsheet_id = config.get('spreadsheet_id')
-                        
-                        if spreadsheet_id:
-                            sheets_manager.connect_spreadsheet(spreadsheet_id)
-                            logger.info("已連接到現有的Google試算表")
+                # 載入現有試算表配置（同一程序內之後的圖表、檢查步驟沿用同一個連線）
+                if sheets_manager.connect_configured_spreadsheet(spreadsheet_config_file):
+                    logger.info("已連接到現有的Google試算表")
                 
                 if not sheets_manager.spreadsheet:
                     # 建立新試算表
@@ -1126,26 +1082,55 @@ def main():
                         logger.info("📱 現在可以在任何裝置上存取台期所資料了！")
                 
                 if sheets_manager.spreadsheet:
-                    # 上傳資料到Google Sheets
-                    # 上傳主要資料 - 根據爬取的資料類型選擇工作表
-                    if not recent_data.empty:
-                        sheets_manager.upload_data(recent_data, data_type=args.data_type)
-                        logger.info(f"✅ {DATA_TYPES.get(args.data_type, args.data_type)}已上傳到Google Sheets")
-                    
-                    # 如果有當前爬取的資料，也上傳它
-                    if not df.empty:
-                        sheets_manager.upload_data(df, data_type=args.data_type)
-                        logger.info(f"✅ 當前爬取的{DATA_TYPES.get(args.data_type, args.data_type)}已上傳到Google Sheets")
-                    
-                    # 上傳摘要資料
-                    if not summary_data.empty:
-                        sheets_manager.upload_summary(summary_data)
-                        sheets_manager.update_trend_analysis(summary_data)
-                        logger.info("✅ 摘要和趨勢分析已更新")
+                    # 各工作表互不相依：寫入依工作表合併，由執行緒池同時送出，該工作表成功後才確認同步進度
+                    uploaded_sheet = "完整資料" if args.data_type == 'COMPLETE' else "交易量資料"
+                    with sheets_manager.batch_writes(workers=args.sheets_workers) as sheets_batch:
+                        # 上傳資料到Google Sheets - 根據爬取的資料類型選擇工作表
+                        if db_saved:
+                            # 只上傳上次同步後真正異動的資料列（每個工作表各自一個游標）
+                            sheets_sink = f"google_sheets:{uploaded_sheet}"
+                            changed_rows, last_seq = change_log.pending(sheets_sink)
+                            if last_seq is None:
+                                logger.info("ℹ️ 資料無異動，略過Google Sheets資料上傳")
+                            elif changed_rows.empty:
+                                # 只有刪除的異動：工作表不處理刪除，批次送出成功後一併確認
+                                sheets_batch.after_flush(lambda: change_log.ack(sheets_sink, last_seq), uploaded_sheet)
+                            else:
+                                sheets_df = db_to_sheets(changed_rows)
+                                if sheets_manager.upload_data(sheets_df, data_type=args.data_type):
+                                    sheets_batch.after_flush(lambda: change_log.ack(sheets_sink, last_seq), uploaded_sheet)
+                                    logger.info(f"✅ {len(sheets_df)} 筆異動的{DATA_TYPES.get(args.data_type, args.data_type)}已加入Google Sheets上傳")
+                        elif not df.empty:
+                            # 資料庫不可用時直接上傳當前爬取的資料
+                            sheets_manager.upload_data(df, data_type=args.data_type)
+                            logger.info(f"✅ 當前爬取的{DATA_TYPES.get(args.data_type, args.data_type)}已加入Google Sheets上傳")
+                        
+                        # 上傳摘要資料（每日摘要有異動時才更新）
+                        if not summary_data.empty:
+                            summary_changed = change_log is None or change_log.has_pending('google_sheets_summary', 'daily_summary')
+                            if summary_changed:
+                                summary_seq = change_log.latest_seq('daily_summary') if change_log else None
+                                sheets_manager.upload_summary(summary_data)
+                                sheets_manager.update_trend_analysis(summary_data, trend_data)
+                                if change_log:
+                                    sheets_batch.after_flush(lambda: change_log.ack('google_sheets_summary', summary_seq, 'daily_summary'),
+                                                             "每日摘要", "三大法人趨勢")
+                                logger.info("✅ 摘要和趨勢分析已加入Google Sheets上傳")
+                            else:
+                                logger.info("ℹ️ 每日摘要無異動，略過摘要和趨勢分析更新")
+                        
+                        # 更新系統資訊
+                        sheets_manager.update_system_info()
                     
-                    # 更新系統資訊
-                    sheets_manager.update_system_info()
+                    logger.info(f"📡 Google Sheets API 呼叫: {sum(sheets_manager.api_calls.values())} 次 {dict(sheets_manager.api_calls)}")
+                    logger.info(f"🚦 Google Sheets 配額: {sheets_manager.quota_gate.summary()}")
+                    if sheets_batch.errors:
+                        logger.warning(f"⚠️ 寫入失敗的工作表（下次執行會重新上傳）: {', '.join(sheets_batch.errors)}")
                     
+                    # 已結束年度的資料移到「<工作表>_YYYY」歸檔工作表，常用工作表只保留今年
+                    sheets_archiver = SheetsArchiver(sheets_manager)
+                    if uploaded_sheet not in sheets_batch.errors and sheets_archiver.archive_due(uploaded_sheet):
+                        sheets_archiver.archive([uploaded_sheet])
                     logger.info(f"🌐 Google試算表網址: {sheets_manager.get_spreadsheet_url()}")
                     if args.data_type == 'TRADING':
                         logger.info("💡 提示: 下午2點的交易量資料已上傳到「交易量資料」分頁")
@@ -1163,7 +1148,13 @@ def main():
                 # 初始化Telegram通知器
                 notifier = TelegramNotifier()
                 
-                if notifier.is_configured() and notifier.test_connection():
+                # 資料已存入資料庫時，只有新異動才需要通知
+                notify_seq = change_log.latest_seq() if db_saved else None
+                has_new_changes = not db_saved or change_log.has_pending('telegram')
+                
+                if not has_new_changes:
+                    logger.info("ℹ️ 資料無異動，略過Telegram通知")
+                elif notifier.is_configured() and notifier.test_connection():
                     if args.data_type == 'TRADING':
                         # 交易量資料：發送簡單文字摘要
                         logger.info("📱 發送交易量資料摘要到Telegram...")
@@ -1171,6 +1162,8 @@ def main():
                         success = notifier.send_simple_message(summary_text)
                         
                         if success:
+                            if db_saved:
+                                change_log.ack('telegram', notify_seq)
                             logger.info("📱 交易量摘要已發送到Telegram")
                         else:
                             logger.warning("⚠️ Telegram交易量摘要發送失敗")
@@ -1192,7 +1185,7 @@ def main():
                         if chart_data is None or chart_data.empty:
                             if db_manager:
                                 logger.info("📊 從資料庫載入歷史資料...")
-                                chart_data = db_manager.get_recent_data(30)
+                                chart_data = chart_generator.load_data_from_database(db_manager, 30)
                             else:
                                 # 最後嘗試從當前爬取的資料
                                 chart_data = df
@@ -1201,7 +1194,7 @@ def main():
                             logger.info(f"📊 使用 {len(chart_data)} 筆資料生成圖表")
                             
                             # 生成所有圖表
-                            chart_paths = chart_generator.generate_all_charts(chart_data)
+                            chart_paths = chart_generator.generate_all_charts(chart_data, cube=time_cube)
                             
                             if chart_paths:
                                 logger.info(f"📊 已生成 {len(chart_paths)} 個圖表")
@@ -1213,6 +1206,8 @@ def main():
                                 success = notifier.send_chart_report(chart_paths, summary_text)
                                 
                                 if success:
+                                    if db_saved:
+                                        change_log.ack('telegram', notify_seq)
                                     logger.info("📱 圖表報告已成功發送到Telegram")
                                 else:
                                     logger.warning("⚠️ Telegram圖表報告發送部分失敗")
@@ -1233,6 +1228,13 @@ def main():
         else:
             logger.info("�� Telegram通知模組未啟用")
         
+        # 所有下游都已確認的異動紀錄不再需要
+        if change_log:
+            try:
+                change_log.prune()
+            except Exception as e:
+                logger.warning(f"清理異動紀錄失敗: {e}")
+        
         logger.info("程式執行完成")
         return 0  # 成功退出
         
@@ -1366,12 +1368,13 @@ def check_and_get_missing_dates(db_manager, sheets_manager, contracts, identitie
         existing_dates_db = set()
         if db_manager:
             try:
-                # 從資料庫查詢已存在的日期
-                existing_data = db_manager.get_recent_data(check_days + 5)  # 多查幾天確保完整
+                # 從資料庫查詢已存在的日期（多查幾天確保完整，只取日期欄位）
+                existing_data = db_manager.query(
+                    start=start_check_date - datetime.timedelta(days=5),
+                    columns=['date']
+                )
                 if not existing_data.empty:
-                    # 轉換日期格式並去重
-                    db_dates = pd.to_datetime(existing_data['date']).dt.date
-                    existing_dates_db = set(db_dates.unique())
+                    existing_dates_db = set(existing_data['date'].dt.date.unique())
                     logger.info(f"📊 資料庫中找到 {len(existing_dates_db)} 個不同日期的資料")
             except Exception as e:
                 logger.warning(f"⚠️ 從資料庫檢查資料時發生錯誤: {e}")
@@ -1382,19 +1385,11 @@ def check_and_get_missing_dates(db_manager, sheets_manager, contracts, identitie
             try:
                 # 根據資料類型選擇工作表
                 worksheet_name = "完整資料" if data_type == 'COMPLETE' else "交易量資料"
-                worksheet = sheets_manager.get_or_create_worksheet(worksheet_name)
-                
-                if worksheet:
-                    # 獲取現有資料
-                    records = worksheet.get_all_records()
-                    if records:
-                        sheets_dates = [
-                            datetime.datetime.strptime(record.get('日期', ''), '%Y/%m/%d').date()
-                            for record in records
-                            if record.get('日期')
-                        ]
-                        existing_dates_sheets = set(sheets_dates)
-                        logger.info(f"📊 Google Sheets中找到 {len(existing_dates_sheets)} 個不同日期的資料")
+                # 只讀取日期欄位
+                sheet_dates = sheets_manager.column_values(worksheet_name, '日期')
+                if sheet_dates:
+                    existing_dates_sheets = set(parse_dates(pd.Series(sheet_dates)).dropna().dt.date)
+                    logger.info(f"📊 Google Sheets中找到 {len(existing_dates_sheets)} 個不同日期的資料")
             except Exception as e:
                 logger.warning(f"⚠️ 從Google Sheets檢查資料時發生錯誤: {e}")
         
@@ -1426,40 +1421,7 @@ def check_and_get_missing_dates(db_manager, sheets_manager, contracts, identitie
 
 def prepare_data_for_db(df):
     """將爬蟲資料轉換為資料庫格式"""
-    if df.empty:
-        return pd.DataFrame()
-    
-    # 簡化的資料庫記錄格式，避免複雜的position_type結構
-    db_records = []
-    
-    for _, row in df.iterrows():
-        # 直接保存原始資料到資料庫
-        record = {
-            'date': row.get('日期', ''),
-            'contract_code': row.get('契約名稱', ''),
-            'identity_type': row.get('身份別', '總計'),
-            'long_trade_volume': row.get('多方交易口數', 0),
-            'short_trade_volume': row.get('空方交易口數', 0),
-            'net_trade_volume': row.get('多空淨額交易口數', 0),
-            'long_trade_amount': row.get('多方契約金額', 0),
-            'short_trade_amount': row.get('空方契約金額', 0),
-            'net_trade_amount': row.get('多空淨額契約金額', 0),
-        }
-        
-        # 如果是完整資料，也包含未平倉資料
-        if '多方未平倉口數' in df.columns:
-            record.update({
-                'long_position_volume': row.get('多方未平倉口數', 0),
-                'short_position_volume': row.get('空方未平倉口數', 0),
-                'net_position_volume': row.get('多空淨額未平倉口數', 0),
-                'long_position_amount': row.get('多方未平倉契約金額', 0),
-                'short_position_amount': row.get('空方未平倉契約金額', 0),
-                'net_position_amount': row.get('多空淨額未平倉契約金額', 0),
-            })
-        
-        db_records.append(record)
-    
-    return pd.DataFrame(db_records)
+    return crawler_to_db(df)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試DuckDB分析查詢引擎（使用暫存SQLite，不需要網路）
+"""
+
+import shutil
+import tempfile
+import pandas as pd
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from analytics_engine import AnalyticsEngine
+
+
+def make_history(days, contracts=('TX', 'TE')):
+    """產生多個契約、逐日變化的外資資料"""
+    rows = []
+    for n, date in enumerate(pd.bdate_range('2025-05-01', periods=days)):
+        for k, contract in enumerate(contracts):
+            rows.append({
+                'date': date.strftime('%Y/%m/%d'),
+                'contract_code': contract,
+                'identity_type': '外資',
+                'net_position_volume': (n * n) % 17 * (k + 1) + n,
+            })
+    return pd.DataFrame(rows)
+
+
+def test_analytics_engine():
+    """測試未指定結束日期時，往回的年數以資料最新日為準"""
+    print("🦆 測試分析查詢引擎...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="analytics_test_"))
+    try:
+        db_path = work_dir / "taifex.db"
+        TaifexDatabaseManager(db_path).insert_data(make_history(30))
+        engine = AnalyticsEngine(db_path, csv_dir=work_dir / "output", parquet_root=work_dir / "parquet")
+
+        daily = engine.net_oi_by_identity(years=1)
+        assert len(daily) == 30, daily
+        matrix = engine.correlations()
+        assert list(matrix.index) == ['TE', 'TX'] and matrix.loc['TX', 'TX'] == 1.0
+        assert matrix.equals(engine.correlations(end='2025/06/11'))
+        print(f"✅ 預設以最新資料日為準: {len(daily)} 個交易日、{matrix.shape[0]}×{matrix.shape[1]} 相關係數矩陣")
+
+        engine.close()
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_analytics_engine()
@@ -0,0 +1,70 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試資料庫線上備份（基底 + 增量備份與還原，不需要網路）
+"""
+
+import gzip
+import json
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from backup_manager import BackupManager
+from change_log import ChangeLog
+from test_cloud_sync import make_day, count_rows
+
+
+def test_backup_restore():
+    """測試沒有異動時不產生增量檔，還原結果與原資料庫一致且不產生新的異動紀錄"""
+    print("💾 測試增量備份與還原...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="backup_test_"))
+    try:
+        db_path = work_dir / "taifex.db"
+        db = TaifexDatabaseManager(db_path)
+        change_log = ChangeLog(db_path)
+        manager = BackupManager(db_path, work_dir / "backup")
+
+        db.insert_data(make_day('2025/06/02', 100))
+        change_log.ack('telegram', change_log.latest_seq())
+        assert manager.backup().name.startswith('taifex_base_')
+
+        # 水位線那一秒已備份的資料列不會再被寫入增量檔
+        assert manager.backup() is None
+        assert manager.backup() is None
+        print("✅ 沒有異動時不產生增量檔")
+
+        # 同一秒內又修改已備份的資料列：內容摘要不同，仍會進入增量
+        changed = make_day('2025/06/02', 100)
+        changed.loc[0, 'net_position_volume'] = 99999
+        db.insert_data(changed)
+        db.insert_data(make_day('2025/06/03', 200))
+        delta = manager.backup()
+        assert delta is not None and delta.name.startswith('taifex_delta_')
+        with gzip.open(delta, 'rt', encoding='utf-8') as f:
+            futures_rows = json.load(f)['tables']['futures_data']['rows']
+        assert len(futures_rows) == 4
+        assert manager.backup() is None
+
+        # 還原後與原資料庫一致；重播增量不寫入 change_log，基底備份時已處理完的下游沒有待同步資料
+        restored = manager.restore(target_path=work_dir / "restored.db")
+        assert count_rows(restored, 'futures_data') == 6
+        conn = sqlite3.connect(restored)
+        value = conn.execute(
+            "SELECT net_position_volume FROM futures_data WHERE date = '2025/06/02' AND identity_type = '自營商'"
+        ).fetchone()[0]
+        triggers = conn.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'trigger'").fetchone()[0]
+        conn.close()
+        assert value == 99999 and triggers == 6
+        assert not ChangeLog(restored).has_pending('telegram')
+        print("✅ 還原結果一致，重播不會把資料列標記為待同步")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_backup_restore()
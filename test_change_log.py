@@ -0,0 +1,102 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試資料異動紀錄與各下游游標（使用暫存SQLite，不需要網路）
+"""
+
+import shutil
+import sqlite3
+import tempfile
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from change_log import ChangeLog, SINKS, TRACKED_TABLES
+from test_cloud_sync import make_day
+
+
+def logged_rows(db_path, table='futures_data'):
+    """change_log 中指定資料表的紀錄筆數"""
+    conn = sqlite3.connect(db_path)
+    count = conn.execute("SELECT COUNT(*) FROM change_log WHERE table_name = ?", (table,)).fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_change_log():
+    """測試只記錄實際異動、各工作表游標互不影響、清理只刪除所有下游都處理過的紀錄"""
+    print("🔄 測試資料異動紀錄...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="change_log_test_"))
+    try:
+        db_path = work_dir / "taifex.db"
+        db = TaifexDatabaseManager(db_path)
+        change_log = ChangeLog(db_path)
+        trading, complete = SINKS['futures_data'][:2]
+
+        db.insert_data(make_day('2025/06/02', 100))
+        rows, seq = change_log.pending(trading)
+        assert len(rows) == 3 and seq == change_log.latest_seq()
+
+        # 重複寫入相同內容不產生異動
+        db.insert_data(make_day('2025/06/02', 100))
+        assert change_log.latest_seq() == seq
+        print("✅ 只記錄實際異動")
+
+        # 記錄的雜湊就是資料表本身的 row_hash（futures_data 與 daily_summary 同一種算法）
+        conn = sqlite3.connect(db_path)
+        for table in TRACKED_TABLES:
+            mismatched = conn.execute(f'''
+                SELECT COUNT(*) FROM change_log c JOIN {table} t ON t.id = c.row_id
+                WHERE c.table_name = '{table}' AND c.row_hash IS NOT t.row_hash
+            ''').fetchone()[0]
+            assert mismatched == 0, table
+
+        # 回填遺失的雜湊不是內容異動
+        conn.execute("UPDATE futures_data SET row_hash = NULL")
+        conn.commit()
+        conn.close()
+        TaifexDatabaseManager(db_path)
+        assert change_log.latest_seq() == seq
+        print("✅ 異動紀錄使用資料表的內容雜湊，回填雜湊不產生異動")
+
+        # 交易量資料確認後，完整資料的待同步資料不受影響
+        change_log.ack(trading, seq)
+        assert not change_log.has_pending(trading)
+        rows, _ = change_log.pending(complete)
+        assert len(rows) == 3
+
+        changed = make_day('2025/06/02', 100)
+        changed.loc[0, 'net_position_volume'] = 99999
+        db.insert_data(changed)
+        rows, _ = change_log.pending(trading)
+        assert len(rows) == 1 and rows.loc[0, 'net_position_volume'] == 99999
+        print("✅ 各工作表游標互不影響")
+
+        # 清理只刪除所有下游都處理過的紀錄
+        change_log.prune()
+        assert logged_rows(db_path) == 4
+        for sink in SINKS['futures_data']:
+            change_log.ack(sink, seq)
+        change_log.prune()
+        assert logged_rows(db_path) == 1
+        rows, _ = change_log.pending(complete)
+        assert len(rows) == 1
+        print("✅ 清理保留尚未處理的異動")
+
+        # 舊版共用的 google_sheets 游標轉為各工作表游標
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM sync_cursors WHERE sink LIKE 'google_sheets:%'")
+        conn.execute("INSERT INTO sync_cursors (sink, table_name, last_seq) VALUES ('google_sheets', 'futures_data', ?)", (seq,))
+        conn.commit()
+        conn.close()
+        change_log = ChangeLog(db_path)
+        assert change_log.get_cursor(trading) == seq and change_log.get_cursor(complete) == seq
+        assert change_log.get_cursor('google_sheets') == 0
+        print("✅ 舊版游標已轉換")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_change_log()
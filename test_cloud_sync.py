@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試雲端增量同步（使用本機SQLite替身，不需要網路）
+"""
+
+import json
+import shutil
+import sqlite3
+import tempfile
+import pandas as pd
+from pathlib import Path
+from database_manager import TaifexDatabaseManager, CloudDatabaseManager
+
+
+def make_day(date, base):
+    """產生一天的測試資料"""
+    rows = []
+    for i, identity in enumerate(['自營商', '投信', '外資']):
+        rows.append({
+            'date': date,
+            'contract_code': 'TX',
+            'identity_type': identity,
+            'long_trade_volume': base + i,
+            'short_trade_volume': base - i,
+            'net_trade_volume': 2 * i,
+            'net_position_volume': base * 10 + i,
+        })
+    return pd.DataFrame(rows)
+
+
+def count_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    count = conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    conn.close()
+    return count
+
+
+def test_cloud_sync():
+    """測試水位線增量同步與中斷續傳"""
+    print("☁️ 測試雲端增量同步...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="cloud_sync_test_"))
+    try:
+        local_db = TaifexDatabaseManager(work_dir / "local.db")
+        cloud_path = work_dir / "cloud.db"
+
+        config_file = work_dir / "cloud_db.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "supabase": {"enabled": False},
+                "postgres": {"dsn": f"sqlite:///{cloud_path}", "enabled": True},
+                "sync_batch_size": 2,
+                "sync_max_retries": 1,
+                "sync_interval_hours": 24
+            }, f)
+
+        cloud = CloudDatabaseManager(config_file)
+
+        # 1. 首次同步
+        for day, base in [('2025/06/02', 100), ('2025/06/03', 200)]:
+            local_db.insert_data(make_day(day, base))
+        result = cloud.sync_to_cloud(local_db, force=True)
+        print(f"📊 首次同步: {result}")
+        assert count_rows(cloud_path, 'futures_data') == 6
+        assert count_rows(cloud_path, 'daily_summary') == 2
+
+        # 2. 未達同步間隔時略過
+        assert cloud.sync_to_cloud(local_db) is None
+        print("✅ 未達 sync_interval_hours 時略過同步")
+
+        # 3. 增量同步：只有新資料與異動的資料
+        local_db.insert_data(make_day('2025/06/04', 300))
+        changed = make_day('2025/06/02', 100)
+        changed.loc[0, 'net_position_volume'] = 99999
+        local_db.insert_data(changed)
+        result = cloud.sync_to_cloud(local_db, force=True)
+        print(f"📊 增量同步: {result}")
+        assert count_rows(cloud_path, 'futures_data') == 9
+
+        conn = sqlite3.connect(cloud_path)
+        value = conn.execute(
+            "SELECT net_position_volume FROM futures_data WHERE date = '2025/06/02' AND identity_type = '自營商'"
+        ).fetchone()[0]
+        conn.close()
+        assert value == 99999
+        print("✅ 異動的資料已更新到雲端")
+
+        # 4. 中斷續傳：第二批失敗時，水位線停在第一批
+        local_db.insert_data(make_day('2025/06/05', 400))
+        target = cloud._get_target()
+        original_upsert = target.upsert
+        calls = {'count': 0}
+
+        def flaky_upsert(*args, **kwargs):
+            calls['count'] += 1
+            if calls['count'] == 2:
+                raise ConnectionError("模擬網路中斷")
+            return original_upsert(*args, **kwargs)
+
+        target.upsert = flaky_upsert
+        cloud.sync_to_cloud(local_db, force=True)
+        watermark = cloud.get_watermark(local_db, 'futures_data')
+        print(f"📍 中斷後水位線: {watermark}")
+
+        target.upsert = original_upsert
+        cloud.sync_to_cloud(local_db, force=True)
+        assert count_rows(cloud_path, 'futures_data') == 12
+        print("✅ 中斷後續傳完成，資料一致")
+
+        cloud.close()
+        print("🎉 雲端增量同步測試通過")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_idle_sync_interval():
+    """測試沒有資料需要同步時，同步間隔仍以完成同步的時間計算"""
+    work_dir = Path(tempfile.mkdtemp(prefix="cloud_sync_test_"))
+    try:
+        local_db = TaifexDatabaseManager(work_dir / "local.db")
+        config_file = work_dir / "cloud_db.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({
+                "supabase": {"enabled": False},
+                "postgres": {"dsn": f"sqlite:///{work_dir / 'cloud.db'}", "enabled": True},
+                "sync_interval_hours": 24
+            }, f)
+
+        cloud = CloudDatabaseManager(config_file)
+        assert cloud.sync_to_cloud(local_db) == {'futures_data': 0, 'daily_summary': 0}
+        assert not cloud.is_sync_due(local_db)
+        assert cloud.sync_to_cloud(local_db) is None
+
+        conn = sqlite3.connect(work_dir / "local.db")
+        conn.execute("UPDATE cloud_sync_state SET last_attempt_at = datetime('now', '-25 hours')")
+        conn.commit()
+        conn.close()
+        assert cloud.is_sync_due(local_db)
+        cloud.close()
+        print("✅ 沒有異動時不會每次都重新同步")
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_cloud_sync()
+    test_idle_sync_interval()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試規則式資料品質檢查（不需要網路）
+"""
+
+import json
+import shutil
+import tempfile
+import pandas as pd
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from data_quality import DataQualityChecker, INSTITUTIONS
+from schema_mapping import DEFAULT_IDENTITY
+
+
+def make_history(days):
+    """產生三大法人與總計一致、逐日小幅變動的交易量資料"""
+    rows = []
+    for n, date in enumerate(pd.bdate_range('2025-05-01', periods=days)):
+        for k, identity in enumerate(INSTITUTIONS):
+            long_volume = 10000 + (n * 37 + k * 11) % 200
+            short_volume = 9000 + (n * 53 + k * 7) % 200
+            rows.append({
+                'date': date.strftime('%Y/%m/%d'),
+                'contract_code': 'TX',
+                'identity_type': identity,
+                'long_trade_volume': long_volume,
+                'short_trade_volume': short_volume,
+                'net_trade_volume': long_volume - short_volume,
+            })
+        day = pd.DataFrame(rows[-len(INSTITUTIONS):])
+        rows.append({**day.iloc[0].to_dict(), 'identity_type': DEFAULT_IDENTITY,
+                     **day[['long_trade_volume', 'short_trade_volume', 'net_trade_volume']].sum().to_dict()})
+    return pd.DataFrame(rows)
+
+
+def test_data_quality():
+    """測試正常資料通過檢查，重複、淨額錯誤、加總不符、身份別不完整與異常值都會被找出"""
+    print("🔍 測試資料品質檢查...")
+
+    checker = DataQualityChecker(min_history=10)
+    clean = make_history(20)
+    report = checker.check(clean)
+    assert report.ok and report.issues.empty and report.rows_checked == len(clean)
+    assert str(report.issues['date'].dtype) == 'datetime64[ns]'
+    json.dumps(report.to_dict())
+    print("✅ 正常資料通過檢查")
+
+    broken = clean.copy()
+    last = broken['date'] == broken['date'].max()
+    broken.loc[last & (broken['identity_type'] == '外資'), 'long_trade_volume'] += 50000
+    broken.loc[last & (broken['identity_type'] == '外資'), 'net_trade_volume'] += 50000
+    broken.loc[0, 'net_trade_volume'] += 1
+    broken = pd.concat([broken, broken.iloc[[8]]], ignore_index=True)
+    broken = broken.drop(broken.index[(broken['date'] == '2025/05/02') & (broken['identity_type'] == '投信')])
+
+    report = checker.check(broken)
+    assert not report.ok
+    assert report.counts() == {'identity_sum': 3, 'outlier': 2, 'duplicate_key': 1, 'net_mismatch': 1, 'missing_identity': 1}, report.counts()
+    assert report.by_rule('net_mismatch')['date'].dt.strftime('%Y/%m/%d').tolist() == ['2025/05/01']
+    outliers = report.by_rule('outlier')
+    assert set(outliers['metric']) == {'long_trade_volume', 'net_trade_volume'}
+    assert set(outliers['identity_type']) == {'外資'}
+    assert json.loads(json.dumps(report.to_dict(), ensure_ascii=False))['ok'] is False
+    print(f"✅ 找出問題: {report.counts()}")
+
+
+def test_check_database():
+    """測試以資料庫的歷史比對新寫入的資料"""
+    work_dir = Path(tempfile.mkdtemp(prefix="quality_test_"))
+    try:
+        db = TaifexDatabaseManager(work_dir / "taifex.db")
+        history = make_history(21)
+        last = history['date'] == history['date'].max()
+        db.insert_data(history[~last])
+
+        checker = DataQualityChecker(db)
+        assert checker.check_database().ok
+        today = history[last].copy()
+        assert checker.check(today).issues.empty
+        today.loc[today['identity_type'] == '投信', ['long_trade_volume', 'net_trade_volume']] += 40000
+        outliers = checker.check(today).by_rule('outlier')
+        assert list(outliers['identity_type'].unique()) == ['投信']
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_data_quality()
+    test_check_database()
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試資料庫單一寫入器（group commit、提交通知、提交後處理，不需要網路）
+"""
+
+import gc
+import time
+import sqlite3
+import shutil
+import tempfile
+import threading
+import pandas as pd
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from database_writer import get_writer
+from test_cloud_sync import make_day, count_rows
+
+
+def test_database_writer():
+    """測試多執行緒同時寫入、提交通知只註冊一次、耗時的提交後處理不阻擋其他寫入"""
+    print("✍️ 測試單一寫入器...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="writer_test_"))
+    try:
+        db_path = work_dir / "taifex.db"
+        db = TaifexDatabaseManager(db_path)
+        writer = get_writer(db_path)
+
+        # 初始化資料庫結構也經由寫入器
+        jobs = writer.stats['jobs']
+        TaifexDatabaseManager(db_path)
+        assert writer.stats['jobs'] == jobs + 1
+
+        # 多執行緒同時寫入，全部由同一個寫入器提交
+        dates = [f"2025/06/{day:02d}" for day in range(2, 22)]
+        threads = [threading.Thread(target=db.insert_data, args=(make_day(date, 100 + i),))
+                   for i, date in enumerate(dates)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert count_rows(db_path, 'futures_data') == 3 * len(dates)
+        assert writer.stats['failed_jobs'] == 0
+        print(f"✅ {len(dates)} 個執行緒同時寫入，提交 {writer.stats['commits']} 次")
+
+        # 大量回補的日期數超過SQLite的參數個數上限時仍可寫入
+        writer.submit_statements([lambda conn: conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)]).result()
+        backfill = pd.DataFrame({
+            'date': pd.bdate_range('2015-01-01', periods=1200).strftime('%Y/%m/%d'),
+            'contract_code': 'TX',
+            'identity_type': '外資',
+            'net_position_volume': range(1200),
+        })
+        assert db.insert_data(backfill)['inserted'] == 1200
+        assert db.insert_data(backfill)['unchanged'] == 1200
+        print("✅ 超過參數上限的日期數分批比對")
+
+        # 多次取用 writer 不會重複註冊；管理器回收後通知自動移除
+        listeners = len(writer._commit_listeners)
+        for _ in range(5):
+            db.writer
+        other = TaifexDatabaseManager(db_path)
+        assert len(writer._commit_listeners) == listeners + 1
+        del other
+        gc.collect()
+        writer.flush()
+        db.insert_data(make_day('2025/06/23', 500))
+        assert len(writer._commit_listeners) == listeners
+        print("✅ 提交通知只註冊一次，不會延長管理器的生命週期")
+
+        # 耗時的提交後處理在獨立執行緒執行，不阻擋其他寫入
+        release = threading.Event()
+        db.register_commit_hook(lambda df: release.wait(5))
+        pending = db.insert_data_async(make_day('2025/06/24', 600))
+        started = time.monotonic()
+        writer.execute("UPDATE futures_data SET net_trade_volume = 1 WHERE date = '2025/06/02'")
+        assert time.monotonic() - started < 1 and not pending.done()
+        release.set()
+        assert pending.result(5)['inserted'] == 3
+        print("✅ 提交後處理不阻擋寫入器")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_database_writer()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試爬蟲資料列與欄位彙整（不需要網路）
+"""
+
+from futures_records import (
+    FuturesRecord, RecordAccumulator, TRADING_METRICS, COMPLETE_METRICS, KEY_FIELDS,
+)
+
+
+def test_futures_record():
+    """測試資料列以中文鍵存取，數值轉為整數"""
+    record = FuturesRecord('2025/06/02', 'TX', '外資', [1, 2.6, None, 4, 5, 6])
+    assert list(record) == list(KEY_FIELDS) + TRADING_METRICS
+    assert record['契約名稱'] == 'TX' and record['多方交易口數'] == 1
+    assert record[TRADING_METRICS[1]] == 3 and record[TRADING_METRICS[2]] == 0
+    assert dict(record)['身份別'] == '外資' and len(record) == 9
+    assert COMPLETE_METRICS[-1] not in record
+
+
+def test_record_accumulator():
+    """測試彙整為 DataFrame 的欄位、型別與排序"""
+    print("🧮 測試資料列彙整...")
+
+    accumulator = RecordAccumulator()
+    assert accumulator.to_frame().empty
+    accumulator.extend([
+        FuturesRecord('2025/06/03', 'TX', '投信', range(12)),
+        FuturesRecord('2025/06/02', 'TX', '外資', range(100, 112)),
+        FuturesRecord('2025/06/02', 'TE', '外資', [2 ** 40] * 12),
+    ])
+    df = accumulator.to_frame()
+    assert list(df.columns) == list(KEY_FIELDS) + COMPLETE_METRICS
+    assert str(df['契約名稱'].dtype) == 'category' and str(df['身份別'].dtype) == 'category'
+    assert all(str(df[col].dtype) == 'int64' for col in COMPLETE_METRICS)
+    assert list(zip(df['日期'], df['契約名稱'])) == [('2025/06/02', 'TE'), ('2025/06/02', 'TX'), ('2025/06/03', 'TX')]
+    assert df.loc[0, COMPLETE_METRICS[0]] == 2 ** 40 and list(df.loc[2, COMPLETE_METRICS]) == list(range(12))
+    assert list(accumulator.to_frame(sort=False)['日期']) == ['2025/06/03', '2025/06/02', '2025/06/02']
+    print("✅ 欄位、型別與排序正確")
+
+    # 交易量與完整資料不可混用
+    try:
+        accumulator.append(FuturesRecord('2025/06/04', 'TX', '外資', range(6)))
+        assert False, "欄位數不一致應該失敗"
+    except ValueError:
+        pass
+    assert len(accumulator) == 3
+
+
+if __name__ == "__main__":
+    test_futures_record()
+    test_record_accumulator()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試Parquet歷史歸檔（使用暫存目錄，不需要網路）
+"""
+
+import shutil
+import tempfile
+import pandas as pd
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from parquet_archive import ParquetArchive, ARCHIVE_COLUMNS
+
+
+def test_parquet_archive():
+    """測試依 年度/契約 分割寫入、upsert 只重寫受影響的分割、讀取條件與欄位裁剪"""
+    print("📦 測試Parquet歸檔...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="parquet_test_"))
+    try:
+        archive = ParquetArchive(work_dir / "archive")
+
+        # 爬蟲中文欄位格式，跨兩個年度、兩個契約
+        crawled = pd.DataFrame({
+            '日期': ['2024/12/31', '2025/01/02', '2025/01/02', '2025/01/03'],
+            '契約名稱': ['TX', 'TX', 'TE', 'TX'],
+            '身份別': ['外資', '外資', '外資', '投信'],
+            '多空淨額未平倉口數': [100, 200, 300, 400],
+        })
+        assert archive.write(crawled) == 3
+        partitions = sorted(str(path.relative_to(archive.root)) for path in archive.root.rglob('*.parquet'))
+        assert partitions == [
+            'year=2024/contract=TX/part-0.parquet',
+            'year=2025/contract=TE/part-0.parquet',
+            'year=2025/contract=TX/part-0.parquet',
+        ]
+        print("✅ 依 年度/契約 分割寫入")
+
+        # 同一鍵值覆寫、新增一筆，只重寫 2025/TX
+        update = pd.DataFrame({
+            'date': ['2025/01/02', '2025/01/06'],
+            'contract_code': ['TX', 'TX'],
+            'identity_type': ['外資', '外資'],
+            'net_position_volume': [250, 500],
+        })
+        assert archive.write(update) == 1
+        df = archive.read()
+        assert list(df.columns) == ARCHIVE_COLUMNS and len(df) == 5
+        tx = df[(df['contract_code'] == 'TX') & (df['identity_type'] == '外資')]
+        assert list(tx['net_position_volume']) == [100, 250, 500]
+        assert (df['long_trade_volume'] == 0).all() and str(df['net_position_volume'].dtype) == 'int64'
+        print("✅ upsert 覆寫相同鍵值，缺少的欄位補0")
+
+        # 條件與欄位裁剪
+        subset = archive.read(start='2025/01/01', end='2025/01/03', contracts='TX',
+                              columns=['date', 'identity_type', 'net_position_volume'])
+        assert list(subset.columns) == ['date', 'identity_type', 'net_position_volume']
+        assert list(subset['date'].dt.strftime('%Y/%m/%d')) == ['2025/01/02', '2025/01/03']
+        assert list(subset['net_position_volume']) == [250, 400]
+        assert archive.read(identities=['投信'], as_='arrow').num_rows == 1
+        assert archive.read(start='2026/01/01').empty
+        print("✅ 日期、契約、身份別條件與欄位裁剪")
+
+        # 掛到資料庫管理器，寫入提交後同步
+        db = TaifexDatabaseManager(work_dir / "taifex.db")
+        archive.attach(db)
+        db.insert_data_async(update.assign(net_position_volume=[999, 500])).result(10)
+        assert archive.read(start='2025/01/02', end='2025/01/02', contracts='TX')['net_position_volume'].tolist() == [999]
+        print("✅ 資料庫寫入後自動同步歸檔")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_parquet_archive()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試滾動指標物化表（與 pandas rolling 比對，不需要網路）
+"""
+
+import shutil
+import sqlite3
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from database_manager import TaifexDatabaseManager
+from rolling_metrics import RollingMetricsStore, MARKET_IDENTITY, INSTITUTIONS
+
+WINDOW = 5
+
+
+def make_days(dates, seed):
+    """產生指定日期、三大法人的隨機資料"""
+    rng = np.random.default_rng(seed)
+    rows = []
+    for date in dates:
+        for identity in INSTITUTIONS:
+            rows.append({
+                'date': date.strftime('%Y/%m/%d'),
+                'contract_code': 'TX',
+                'identity_type': identity,
+                'net_trade_volume': int(rng.integers(-5000, 5000)),
+                'net_position_volume': int(rng.integers(-50000, 50000)),
+            })
+    return pd.DataFrame(rows)
+
+
+def assert_matches_pandas(store, db_path):
+    """滾動平均與標準差需與 pandas rolling 的結果相同"""
+    conn = sqlite3.connect(db_path)
+    raw = pd.read_sql_query("SELECT date, identity_type, net_trade_volume FROM futures_data", conn)
+    conn.close()
+    market = raw.groupby('date', as_index=False)['net_trade_volume'].sum().assign(identity_type=MARKET_IDENTITY)
+    raw = pd.concat([raw, market], ignore_index=True)
+
+    series = store.get_series('net_trade_volume', WINDOW, contracts=['TX'])
+    for identity, expected in raw.sort_values('date').groupby('identity_type'):
+        actual = series[series['identity_type'] == identity]
+        rolling = expected['net_trade_volume'].rolling(WINDOW, min_periods=1)
+        assert len(actual) == len(expected), identity
+        np.testing.assert_allclose(actual['mean'].to_numpy(), rolling.mean().to_numpy())
+        np.testing.assert_allclose(actual['std'].to_numpy(), rolling.std().to_numpy(), equal_nan=True)
+
+
+def test_rolling_metrics():
+    """測試增量更新、補入歷史日期與刪除資料後的滾動指標都與 pandas rolling 一致"""
+    print("📈 測試滾動指標...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="rolling_test_"))
+    try:
+        db_path = work_dir / "taifex.db"
+        db = TaifexDatabaseManager(db_path)
+        store = RollingMetricsStore(db_path, windows=(WINDOW, 20)).attach(db)
+        dates = pd.bdate_range('2025-06-02', periods=12)
+
+        # 逐日寫入（增量）與重新寫入同一天
+        for i, date in enumerate(dates[1:]):
+            db.insert_data(make_days([date], seed=i))
+        db.insert_data(make_days(dates[-1:], seed=99))
+        assert_matches_pandas(store, db_path)
+        print("✅ 逐日增量更新與 pandas rolling 一致")
+
+        # 補入較舊的日期
+        db.insert_data(make_days(dates[:1], seed=100))
+        assert_matches_pandas(store, db_path)
+        print("✅ 補入歷史日期後一致")
+
+        # 其他連線刪除資料：讀取前重建
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM futures_data WHERE date = ?", (dates[5].strftime('%Y/%m/%d'),))
+        conn.commit()
+        conn.close()
+        assert_matches_pandas(store, db_path)
+
+        # 刪除後的下一次寫入也會先重建
+        conn = sqlite3.connect(db_path)
+        conn.execute("DELETE FROM futures_data WHERE date = ?", (dates[3].strftime('%Y/%m/%d'),))
+        conn.commit()
+        conn.close()
+        db.insert_data(make_days(pd.bdate_range(dates[-1], periods=2)[1:], seed=101))
+        assert_matches_pandas(store, db_path)
+        print("✅ 刪除資料後滾動指標不會過期")
+
+        # 一次回補超過SQLite參數上限的日期數
+        db.writer.submit_statements([
+            lambda conn: conn.setlimit(sqlite3.SQLITE_LIMIT_VARIABLE_NUMBER, 999)
+        ]).result()
+        backfill = pd.bdate_range(dates[-1], periods=1201)[2:]
+        db.insert_data(make_days(backfill, seed=102))
+        assert_matches_pandas(store, db_path)
+        print("✅ 大量回補後滾動指標一致")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_rolling_metrics()
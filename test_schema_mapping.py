@@ -0,0 +1,62 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試欄位對照與格式轉換（不需要網路）
+"""
+
+import pandas as pd
+from schema_mapping import (
+    KEY_COLUMNS, METRIC_COLUMNS, SHEETS_COLUMN_MAP, DEFAULT_IDENTITY,
+    crawler_to_db, db_to_sheets, sheet_rows, to_int64, typed_frame,
+)
+
+
+def test_schema_mapping():
+    """測試爬蟲中文欄位 → 資料庫 → Google Sheets 的往返轉換"""
+    print("🔤 測試欄位對照...")
+
+    crawled = pd.DataFrame({
+        '日期': ['2025-06-02', '2025/06/03'],
+        '契約名稱': ['TX', 'TE'],
+        '多方交易口數': ['1,234', 5],
+        '空方交易口數': [None, (7).to_bytes(8, 'little', signed=True)],
+    })
+    db = crawler_to_db(crawled)
+    assert list(db.columns) == KEY_COLUMNS + ['long_trade_volume', 'short_trade_volume']
+    assert list(db['date']) == ['2025/06/02', '2025/06/03']
+    assert list(db['identity_type']) == [DEFAULT_IDENTITY] * 2
+    assert list(db['long_trade_volume']) == [1234, 5] and list(db['short_trade_volume']) == [0, 7]
+    assert str(db['long_trade_volume'].dtype) == 'int64'
+    print("✅ 爬蟲資料轉為資料庫格式（千分位、舊版blob與缺值都已處理）")
+
+    sheets = db_to_sheets(db)
+    assert list(sheets.columns) == [SHEETS_COLUMN_MAP[col] for col in KEY_COLUMNS + METRIC_COLUMNS]
+    assert (sheets['多方未平倉口數'] == 0).all()
+    rows = sheet_rows(sheets)
+    assert rows[0][:4] == ['2025/06/02', 'TX', DEFAULT_IDENTITY, 1234]
+    assert all(type(value) is int for value in rows[0][3:])
+    assert crawler_to_db(sheets)[db.columns].equals(db)
+    print("✅ 資料庫格式轉為Google Sheets欄位，上傳列為Python原生型別")
+
+    assert list(to_int64(pd.Series(['12', 'x', None, 3.0]))) == [12, 0, 0, 3]
+
+
+def test_typed_frame():
+    """測試Google Sheets字串資料轉為標準型別，無效日期的資料列移除"""
+    values = pd.DataFrame({
+        '日期': ['2025/06/02', '2025-06-03', '無效'],
+        '契約名稱': ['TX', ' TE ', 'TX'],
+        '身份別': ['外資', '投信', '外資'],
+        '多空淨額未平倉口數': ['-1,200', '35', '1'],
+    })
+    typed = typed_frame(values)
+    assert str(typed['日期'].dtype) == 'datetime64[ns]'
+    assert list(typed['日期'].dt.strftime('%Y/%m/%d')) == ['2025/06/02', '2025/06/03']
+    assert str(typed['契約名稱'].dtype) == 'category' and list(typed['契約名稱']) == ['TX', 'TE']
+    assert list(typed['多空淨額未平倉口數']) == [-1200, 35]
+
+
+if __name__ == "__main__":
+    test_schema_mapping()
+    test_typed_frame()
@@ -5,7 +5,6 @@
 測試從Google Sheets載入歷史資料並生成圖表
 """
 
-import pandas as pd
 import logging
 import os
 from datetime import datetime
@@ -114,7 +113,7 @@ def show_google_sheets_info():
                 logger.info("📊 可用工作表:")
                 for ws in worksheets:
                     try:
-                        row_count = len(ws.get_all_values())
+                        row_count = sheets_manager.row_count(ws.title)
                         logger.info(f"  • {ws.title}: {row_count} 行資料")
                     except:
                         logger.info(f"  • {ws.title}: 無法讀取")
@@ -0,0 +1,503 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試Google Sheets上傳流程（使用 fake_gspread 記憶體替身，不需要網路與認證）
+並比較逐一呼叫與批次寫入的API呼叫次數、儲存格數與模擬延遲下的耗時
+"""
+
+import json
+import time
+import shutil
+import tempfile
+import pandas as pd
+import google_sheets_manager
+from datetime import datetime, timedelta
+from pathlib import Path
+from fake_gspread import FakeClient, VirtualClock
+from sheets_quota import QuotaGate
+from google_sheets_manager import GoogleSheetsManager
+from sheets_session import get_session
+from sheets_merge import SheetsMerger, SheetKeyIndex
+
+IDENTITIES = ['自營商', '投信', '外資']
+CONTRACTS = ['TX', 'TE', 'TF', 'MTX']
+
+
+def make_days(start, days, base=100):
+    """產生N天的交易量測試資料（工作表欄位名稱）"""
+    rows = []
+    for date in pd.bdate_range(start, periods=days):
+        for contract in CONTRACTS:
+            for i, identity in enumerate(IDENTITIES):
+                rows.append({
+                    '日期': date.strftime('%Y/%m/%d'),
+                    '契約名稱': contract,
+                    '身份別': identity,
+                    '多方交易口數': base + i,
+                    '多方契約金額': (base + i) * 10,
+                    '空方交易口數': base - i,
+                    '空方契約金額': (base - i) * 10,
+                    '多空淨額交易口數': 2 * i,
+                    '多空淨額契約金額': 20 * i,
+                })
+    return pd.DataFrame(rows)
+
+
+def make_manager(work_dir, **fake_options):
+    """以記憶體替身建立管理器與新試算表（延遲、限速與退避都以模擬時鐘計時，不實際等待）"""
+    clock = VirtualClock()
+    client = FakeClient(sleep=clock.sleep, **fake_options)
+    manager = GoogleSheetsManager(client=client, quota_gate=QuotaGate(clock=clock, sleep=clock.sleep),
+                                  mirror_path=work_dir / "mirror.db")
+    manager.clock = clock
+    manager.create_spreadsheet()
+    client.http_client.calls.clear()
+    client.http_client.cells.clear()
+    manager.api_calls.clear()
+    return manager, client
+
+
+def test_upload_upsert():
+    """測試依主鍵更新既有列、附加新列"""
+    print("🧪 測試主鍵上傳...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        manager, client = make_manager(work_dir)
+
+        assert manager.upload_data(make_days('2025-06-02', 5), data_type='TRADING')
+        values = manager.mirror.get_all_values("交易量資料", refresh=True)
+        assert len(values) == 1 + 5 * len(CONTRACTS) * len(IDENTITIES), len(values)
+        print(f"✅ 第一次上傳: {len(values) - 1} 列")
+
+        # 後3天重新上傳（數值改變）並新增2天
+        changed = make_days('2025-06-04', 5, base=500)
+        assert manager.upload_data(changed, data_type='TRADING')
+        values = manager.mirror.get_all_values("交易量資料", refresh=True)
+        assert len(values) == 1 + 7 * len(CONTRACTS) * len(IDENTITIES), len(values)
+
+        sheet = pd.DataFrame(values[1:], columns=values[0])
+        assert not sheet.duplicated(['日期', '契約名稱', '身份別']).any()
+        assert (sheet[sheet['日期'] == '2025/06/02']['多方交易口數'].isin(['100', '101', '102'])).all()
+        assert (sheet[sheet['日期'] == '2025/06/04']['多方交易口數'].isin(['500', '501', '502'])).all()
+        print(f"✅ 重新上傳後: {len(values) - 1} 列，無重複鍵，舊資料已更新")
+
+        # 鏡像經由寫入同步，內容與工作表一致
+        mirrored = manager.mirror.get_all_values("交易量資料")
+        worksheet = manager.spreadsheet.worksheet("交易量資料")
+        assert mirrored == worksheet.get_all_values()
+        print("✅ 本機鏡像與工作表一致")
+
+        # 內容相同的列不重寫（更新時間不同也一樣）；主鍵取自鏡像，只讀取相符的列
+        later = datetime.now() + timedelta(minutes=5)
+
+        class LaterDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                return later
+
+        client.http_client.calls.clear()
+        client.http_client.cells.clear()
+        google_sheets_manager.datetime = LaterDatetime
+        try:
+            assert manager.upload_data(changed, data_type='TRADING')
+        finally:
+            google_sheets_manager.datetime = datetime
+        assert client.http_client.cells['written'] == 0, client.http_client.cells
+        assert client.http_client.calls['get_all_values'] == 0 and client.http_client.calls['batch_get'] == 1
+        assert client.http_client.cells['read'] == len(changed) * len(values[0]), client.http_client.cells
+        print("✅ 內容相同的列不重寫，只讀取相符的列")
+
+        # 同一批次兩次寫入相同的新鍵：只附加一列，內容為最後一次的值
+        first = make_days('2025-06-13', 1, base=700)
+        second = make_days('2025-06-13', 1, base=800)
+        with manager.batch_writes():
+            assert manager.upload_data(first, data_type='TRADING')
+            assert manager.upload_data(second, data_type='TRADING')
+        values = worksheet.get_all_values()
+        assert len(values) == 1 + 8 * len(CONTRACTS) * len(IDENTITIES), len(values)
+        sheet = pd.DataFrame(values[1:], columns=values[0])
+        assert (sheet[sheet['日期'] == '2025/06/13']['多方交易口數'].isin(['800', '801', '802'])).all()
+        assert manager.mirror.get_all_values("交易量資料") == values
+        print("✅ 同一批次重複的新鍵只附加一次")
+
+        # 其他人刪除了列、鏡像的列號過期：讀到的列主鍵不符時重新下載鏡像再比對，不會寫錯列
+        worksheet.delete_rows(2)
+        client.http_client.cells.clear()
+        assert manager.upload_data(changed, data_type='TRADING')
+        assert client.http_client.cells['written'] == 0, client.http_client.cells
+        assert manager.mirror.get_all_values("交易量資料") == worksheet.get_all_values()
+        print("✅ 鏡像過期時重新比對")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_batch_pipeline():
+    """測試一次執行的所有寫入只用一次寫入呼叫，且任一請求失敗時全部不生效"""
+    print("🧪 測試批次寫入...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        manager, client = make_manager(work_dir)
+        summary_df = pd.DataFrame({
+            'date': ['2025/06/02', '2025/06/03'],
+            'total_contracts': [12, 12],
+            'total_volume': [1000, 1100],
+            'foreign_net': [10, -5],
+            'dealer_net': [3, 4],
+            'trust_net': [-1, 2],
+        })
+
+        with manager.batch_writes():
+            assert manager.upload_data(make_days('2025-06-02', 2), data_type='TRADING')
+            assert manager.upload_summary(summary_df)
+            manager.update_system_info()
+
+        writes = sum(count for name, count in client.http_client.calls.items()
+                     if name in ('batch_update', 'values_batch_update', 'append_rows', 'update',
+                                 'batch_clear', 'clear', 'format'))
+        print(f"📊 呼叫統計: {dict(client.http_client.calls)}")
+        assert writes == 1, writes
+
+        summary = manager.spreadsheet.worksheet("每日摘要").get_all_values()
+        assert len(summary) == 3 and summary[1][0] == '2025/06/02'
+        print(f"✅ 上傳資料、摘要與系統資訊共 {writes} 次寫入呼叫")
+
+        # 資料範圍超出格線：附加與其他工作表的寫入也一起不生效
+        trading = manager.spreadsheet.worksheet("交易量資料")
+        before = {name: manager.spreadsheet.worksheet(name).get_all_values() for name in ("交易量資料", "每日摘要")}
+        try:
+            with manager.batch_writes() as batch:
+                assert manager.upload_data(make_days('2025-06-09', 1), data_type='TRADING')
+                assert manager.upload_summary(summary_df.assign(total_volume=[1, 2]))
+                batch.update(trading, f"A{trading.row_count + 1}", [['超出範圍']])
+            assert False, "超出格線的寫入應該失敗"
+        except Exception as e:
+            assert 'exceeds grid limits' in str(e), e
+        after = {name: manager.spreadsheet.worksheet(name).get_all_values() for name in before}
+        assert after == before
+        print("✅ 任一請求失敗時整批不生效")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_parallel_worksheets():
+    """測試各工作表同時寫入：結果與一次送出相同、耗時接近最慢的工作表、失敗互不影響"""
+    print("🧪 測試平行寫入工作表...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        summary_df = pd.DataFrame({
+            'date': ['2025/06/02', '2025/06/03'],
+            'total_contracts': [12, 12],
+            'total_volume': [1000, 1100],
+            'foreign_net': [10, -5],
+            'dealer_net': [3, 4],
+            'trust_net': [-1, 2],
+        })
+        sheets = ["交易量資料", "每日摘要", "三大法人趨勢"]
+
+        def stage(workers):
+            # 實際延遲（執行緒同時等待），配額放寬避免建立試算表時的請求觸發限速
+            client = FakeClient(latency=0.1)
+            quota_gate = QuotaGate(limits={'read': 6000, 'write': 6000}, burst=100)
+            manager = GoogleSheetsManager(client=client, quota_gate=quota_gate,
+                                          mirror_path=work_dir / f"mirror_{workers}.db")
+            manager.create_spreadsheet()
+            manager.upload_data(make_days('2025-06-02', 1), data_type='TRADING')
+            manager._worksheet("系統資訊")
+
+            started = time.monotonic()
+            with manager.batch_writes(workers=workers) as batch:
+                manager.upload_data(make_days('2025-06-02', 3, base=200), data_type='TRADING')
+                manager.upload_summary(summary_df)
+                manager.update_trend_analysis(summary_df)
+            elapsed = time.monotonic() - started
+            # 最後一欄為更新時間（趨勢表除外），不比較
+            values = {}
+            for name in sheets:
+                rows = manager.spreadsheet.worksheet(name).get_all_values()
+                values[name] = rows if name == "三大法人趨勢" else [row[:-1] for row in rows]
+            return manager, batch, values, elapsed
+
+        _, _, atomic_values, atomic_elapsed = stage(1)
+        manager, batch, parallel_values, parallel_elapsed = stage(4)
+        assert parallel_values == atomic_values
+        assert not batch.errors and set(batch.timings) == set(sheets)
+        # 3個工作表各一次 batchUpdate，同時送出：寫入約為一次請求（另有讀取主鍵約0.15秒），
+        # 逐一送出至少需要 0.45 秒
+        assert parallel_elapsed < 0.1 * 3 + 0.08, parallel_elapsed
+        print(f"✅ 內容與一次送出相同，耗時 {parallel_elapsed:.2f} 秒（一次送出 {atomic_elapsed:.2f} 秒，"
+              f"最慢工作表 {max(batch.timings.values()):.2f} 秒）")
+
+        # 單一工作表失敗（超出格線）不影響其他工作表，依賴它的動作不執行
+        done = []
+        with manager.batch_writes(workers=4) as batch:
+            manager.upload_data(make_days('2025-06-09', 1), data_type='TRADING')
+            batch.update(manager._worksheet("每日摘要"), 'A5000', [['超出範圍']])
+            batch.update(manager._worksheet("系統資訊"), 'A1', [['項目', '數值', '說明']])
+            batch.after_flush(lambda: done.append('data'), "交易量資料")
+            batch.after_flush(lambda: done.append('summary'), "每日摘要")
+            batch.after_flush(lambda: done.append('all'))
+        assert list(batch.errors) == ["每日摘要"], batch.errors
+        assert done == ['data'], done
+        assert manager.row_count("交易量資料") == 1 + 4 * len(CONTRACTS) * len(IDENTITIES)
+        assert manager.mirror.row_count("交易量資料") == 1 + 4 * len(CONTRACTS) * len(IDENTITIES)
+        print("✅ 每日摘要寫入失敗，其他工作表照常寫入並確認")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_session_reuse():
+    """測試同一程序的管理器共用試算表、工作表清單與鏡像，不重複開啟與查詢"""
+    print("🧪 測試程序共用連線...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        manager, client = make_manager(work_dir)
+        manager.upload_data(make_days('2025-06-02', 1), data_type='TRADING')
+        config_file = work_dir / "spreadsheet_config.json"
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({'spreadsheet_id': manager.spreadsheet.id}, f)
+
+        calls = client.http_client.calls.copy()
+        session = get_session()
+        opened = session.stats['open']
+        for _ in range(3):
+            other = GoogleSheetsManager(client=client, quota_gate=manager.quota_gate, mirror_path=work_dir / "mirror.db")
+            assert other.connect_configured_spreadsheet(config_file) is manager.spreadsheet
+            assert other._worksheet("交易量資料") is manager._worksheet("交易量資料")
+            assert other.mirror is manager.mirror
+        # 試算表由第一個管理器建立時已登記，之後的管理器不必 open_by_key，也不重新查詢工作表
+        assert session.stats['open'] == opened
+        new_calls = client.http_client.calls - calls
+        assert not new_calls, new_calls
+        print(f"✅ 3個管理器沒有重新開啟試算表或查詢工作表: {session.summary()}")
+
+        session.clear()
+        for _ in range(3):
+            other = GoogleSheetsManager(client=client, quota_gate=manager.quota_gate, mirror_path=work_dir / "mirror.db")
+            other.connect_configured_spreadsheet(config_file)
+            other._worksheet("交易量資料")
+        new_calls = client.http_client.calls - calls
+        assert new_calls == {'open': 1, 'fetch_sheet_metadata': 1}, new_calls
+        print("✅ 清除快取後只開啟與查詢各1次")
+
+        # 設定檔更新後重新讀取
+        other = GoogleSheetsManager(client=client, quota_gate=manager.quota_gate, mirror_path=work_dir / "mirror.db")
+        spreadsheet = other.create_spreadsheet("另一個試算表")
+        time.sleep(0.01)
+        with open(config_file, 'w', encoding='utf-8') as f:
+            json.dump({'spreadsheet_id': spreadsheet.id}, f)
+        assert other.connect_configured_spreadsheet(config_file) is spreadsheet
+        print("✅ 設定檔更新後連接新的試算表")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_incremental_merge():
+    """測試增量合併只寫入新的列與有變動的儲存格，寫入量不隨歷史資料增加"""
+    print("🧪 測試增量合併...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        written = {}
+        for days in (50, 250):
+            manager, client = make_manager(work_dir / str(days))
+            manager.upload_data(make_days('2024-01-01', days), data_type='TRADING')
+
+            # 本地資料：最後20天（其中一格改變）加上2個新交易日
+            local = make_days('2024-01-01', days).tail(20 * len(CONTRACTS) * len(IDENTITIES)).copy()
+            local.iloc[0, local.columns.get_loc('多方交易口數')] = 999
+            new_days = make_days(pd.Timestamp('2024-01-01') + pd.offsets.BDay(days), 2)
+            local = pd.concat([local, new_days], ignore_index=True)
+
+            merger = SheetsMerger(manager)
+            manager.mirror.get_all_values("交易量資料")
+            client.http_client.cells.clear()
+            result = merger.merge(local, "交易量資料")
+            assert result['inserted'] == len(new_days) and result['updated_rows'] == 1, result
+            assert result['updated_cells'] == 1, result
+            written[days] = client.http_client.cells['written']
+
+            values = manager.spreadsheet.worksheet("交易量資料").get_all_values()
+            assert len(values) == 1 + (days + 2) * len(CONTRACTS) * len(IDENTITIES)
+            assert sum(row[3] == '999' for row in values) == 1
+            assert manager.mirror.get_all_values("交易量資料") == values
+
+            # 再次合併相同資料不寫入
+            calls = client.http_client.calls.copy()
+            result = merger.merge(local, "交易量資料")
+            assert result['unchanged'] == len(local) and not (client.http_client.calls - calls)
+
+        assert written[50] == written[250], written
+        print(f"✅ 新增 {len(new_days)} 列、更新 1 格，歷史 50 天與 250 天的寫入量相同（{written[50]} 格），重複合併不寫入")
+
+        # 有更新時間欄的工作表：只寫入變動的儲存格，中間未變動的數字不被改寫成文字
+        manager, client = make_manager(work_dir / "history")
+        merger = SheetsMerger(manager)
+        local = make_days('2024-01-01', 2)
+        merger.merge(local, "歷史資料")
+        worksheet = manager.spreadsheet.worksheet("歷史資料")
+        header = worksheet.get_all_values()[0]
+        assert header[-1] == '更新時間'
+
+        local.loc[0, ['多方交易口數', '多空淨額交易口數']] = [999, 77]
+        client.http_client.cells.clear()
+        result = merger.merge(local, "歷史資料")
+        assert result['updated_rows'] == 1 and result['updated_cells'] == 3, result
+        assert client.http_client.cells['written'] == 3, client.http_client.cells
+        row = worksheet.cells[1]
+        assert row[header.index('多方交易口數')] == 999 and row[header.index('多空淨額交易口數')] == 77
+        for column in ('多方契約金額', '空方交易口數', '空方契約金額'):
+            assert isinstance(row[header.index(column)], int), (column, row)
+        assert manager.mirror.get_all_values("歷史資料") == worksheet.get_all_values()
+        print("✅ 有更新時間欄時只寫入變動的儲存格，未變動的數字維持數值")
+
+        # 索引尾端延伸與重新建立的結果相同，重複的鍵以較前面的列為準
+        values = [['日期', '契約名稱', '身份別']] + [[f"2024/01/{i % 28 + 1:02d}", 'TX', str(i % 40)] for i in range(60)]
+        index = SheetKeyIndex(values[:25])
+        index.extend(values)
+        rebuilt = SheetKeyIndex(values)
+        assert (index.keys == rebuilt.keys).all() and (index.rows == rebuilt.rows).all()
+        assert list(index.lookup(['2024/01/01|TX|0', '2024/01/29|TX|0'])) == [2, 0]
+        print("✅ 排序索引延伸正確")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_mirror_writes():
+    """測試寫入同步到鏡像後，None、NaN、浮點數與布林值都與工作表顯示的內容相同"""
+    print("🧪 測試鏡像同步寫入...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        manager, client = make_manager(work_dir)
+        worksheet = manager.spreadsheet.worksheet("交易量資料")
+        mirror = manager.mirror
+        mirror.get_all_values("交易量資料")
+
+        rows = [['2025/06/02', 'TX', '外資', 100.0, None, float('nan'), 5, '', 0, None],
+                ['2025/06/03', 'TX', '投信', 1.5, 2, 3, 4, 5, 6, True]]
+        with manager.batch_writes() as batch:
+            batch.append(worksheet, rows)
+        mirror.apply_writes("交易量資料", appended=rows)
+        assert mirror.get_all_values("交易量資料") == worksheet.get_all_values()
+
+        update = ['2025/06/02', 'TX', '外資', '', 2.5, 7.0, False, 1, 0, '']
+        with manager.batch_writes() as batch:
+            batch.update(worksheet, "A2:J2", [update])
+        mirror.apply_writes("交易量資料", updates={2: update})
+        assert mirror.get_all_values("交易量資料") == worksheet.get_all_values()
+        print("✅ 鏡像與工作表顯示的內容一致")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def test_quota_errors():
+    """測試注入的 429/503 錯誤由配額關卡退避重試"""
+    print("🧪 測試配額錯誤重試...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        manager, client = make_manager(work_dir)
+        client.http_client.fail_next(429, count=2, retry_after=5)
+        client.http_client.fail_next(503)
+
+        assert manager.upload_data(make_days('2025-06-02', 3), data_type='TRADING')
+        assert manager.quota_gate.stats['retries'] == 3, manager.quota_gate.stats
+        assert client.http_client.errors == {429: 2, 503: 1}
+        assert manager.row_count("交易量資料") == 1 + 3 * len(CONTRACTS) * len(IDENTITIES)
+        print(f"✅ 重試後上傳成功: {manager.quota_gate.summary()}")
+
+        # 隨機錯誤率下多次上傳仍然完整
+        manager, client = make_manager(work_dir, error_rate=0.3, error_status=503, seed=7)
+        for day in range(5):
+            start = pd.Timestamp('2025-06-02') + pd.offsets.BDay(day)
+            assert manager.upload_data(make_days(start, 1), data_type='TRADING')
+        assert manager.row_count("交易量資料") == 1 + 5 * len(CONTRACTS) * len(IDENTITIES)
+        print(f"✅ 30% 錯誤率: 注入 {sum(client.http_client.errors.values())} 次錯誤，資料完整")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def legacy_upload(manager, df):
+    """逐一呼叫的上傳方式（讀取整個工作表、逐範圍 update、append_rows、逐一 format）"""
+    worksheet = manager.spreadsheet.worksheet("交易量資料")
+    headers = manager.get_trading_headers()
+    values = worksheet.get_all_values()
+    existing = {tuple(row[:3]): number for number, row in enumerate(values[1:], start=2)}
+    new_rows = []
+    for row in df[headers].values.tolist():
+        number = existing.get(tuple(str(value) for value in row[:3]))
+        if number:
+            worksheet.update(f"A{number}", [row])
+        else:
+            new_rows.append(row)
+    if new_rows:
+        worksheet.append_rows(new_rows)
+    worksheet.format('A1:Z1', {'textFormat': {'bold': True}})
+
+
+def test_benchmark():
+    """比較上傳方式的API呼叫次數、儲存格數與模擬延遲下的耗時"""
+    print("🧪 上傳方式比較（每次請求模擬 200ms 延遲，含配額限速的模擬耗時）...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="sheets_offline_test_"))
+    try:
+        history = make_days('2025-01-01', 60)
+        update = make_days('2025-03-20', 10, base=300)
+        results = {}
+
+        def run(label, upload):
+            manager, client = make_manager(work_dir / label, latency=0.2)
+            manager.upload_data(history, data_type='TRADING')
+            client.http_client.calls.clear()
+            client.http_client.cells.clear()
+            start = manager.clock()
+            upload(manager)
+            stats = client.summary()
+            results[label] = (sum(stats['calls'].values()), stats['cells_read'], stats['cells_written'],
+                              manager.clock() - start)
+            return manager
+
+        run("逐一呼叫", lambda manager: legacy_upload(manager, update))
+        run("主鍵上傳", lambda manager: manager.upload_data(update, data_type='TRADING'))
+
+        def batched(manager):
+            with manager.batch_writes():
+                manager.upload_data(update, data_type='TRADING')
+                manager.upload_data(update.assign(**{'多方交易口數': 1}), data_type='TRADING')
+        run("批次(2次上傳)", batched)
+
+        print(f"{'方式':<12}{'呼叫':>6}{'讀取格':>8}{'寫入格':>8}{'耗時':>8}")
+        for label, (calls, read, written, elapsed) in results.items():
+            print(f"{label:<12}{calls:>6}{read:>8}{written:>8}{elapsed:>7.2f}s")
+
+        assert results["主鍵上傳"][0] < results["逐一呼叫"][0]
+        assert results["主鍵上傳"][1] < results["逐一呼叫"][1]
+        assert results["批次(2次上傳)"][0] <= results["主鍵上傳"][0] + 1
+        print("✅ 主鍵上傳與批次寫入的呼叫數與讀取量都較少")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_upload_upsert()
+    test_batch_pipeline()
+    test_parallel_worksheets()
+    test_session_reuse()
+    test_incremental_merge()
+    test_mirror_writes()
+    test_quota_errors()
+    test_benchmark()
+    print("🎉 所有離線測試通過")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+測試記憶體映射的時間序列資料方塊（使用暫存目錄，不需要網路）
+"""
+
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from timeseries_cube import TimeSeriesCube
+
+IDENTITIES = ['外資', '投信', '自營商']
+
+
+def make_days(dates, contract, offset=0):
+    """產生指定契約、三大法人的資料（數值由日期與身份別決定，方便比對）"""
+    rows = []
+    for n, date in enumerate(dates):
+        for k, identity in enumerate(IDENTITIES):
+            rows.append({
+                'date': date.strftime('%Y/%m/%d'),
+                'contract_code': contract,
+                'identity_type': identity,
+                'net_position_volume': offset + date.day * 100 + k,
+            })
+    return pd.DataFrame(rows)
+
+
+def test_timeseries_cube():
+    """測試逐日寫入、補入中間交易日、新增契約後的序列與重新開啟的方塊都與輸入一致"""
+    print("🧊 測試時間序列資料方塊...")
+
+    work_dir = Path(tempfile.mkdtemp(prefix="cube_test_"))
+    try:
+        dates = pd.bdate_range('2025-06-02', periods=8)
+        cube = TimeSeriesCube(work_dir / "cube", headroom=4)
+
+        # 逐日寫入（預留空間用完時重新配置），略過第三個交易日
+        for date in dates.delete(2):
+            cube.append(make_days([date], 'TX'))
+        assert cube.length == 7
+
+        # 補入中間的交易日、新增契約與覆寫既有交易日
+        cube.append(make_days(dates[2:3], 'TX'))
+        cube.append(make_days(dates[-2:], 'TE', offset=1))
+        cube.append(make_days(dates[-1:], 'TX', offset=5))
+
+        expected = pd.concat([make_days(dates[:-1], 'TX'), make_days(dates[-1:], 'TX', offset=5)])
+        foreign = expected[expected['identity_type'] == '外資']
+        assert list(cube.dates()) == list(dates.to_numpy().astype('datetime64[D]'))
+        np.testing.assert_array_equal(cube.series('TX', '外資', 'net_position_volume'), foreign['net_position_volume'])
+        print("✅ 逐日寫入、補入中間交易日與覆寫後序列正確")
+
+        # 新契約在加入之前的交易日為 NaN；切片參數
+        te = cube.series('TE', '投信', '多空淨額未平倉口數')
+        assert np.isnan(te[:-2]).all() and list(te[-2:]) == [dates[-2].day * 100 + 2, dates[-1].day * 100 + 2]
+        assert len(cube.series('TX', '外資', 'net_position_volume', last=3)) == 3
+        assert list(cube.dates(start='2025/06/04', end='2025/06/05')) == list(dates[2:4].to_numpy().astype('datetime64[D]'))
+        assert not cube.series('TX', '外資', 'net_position_volume').flags.writeable
+        totals = cube.contract_totals('TE', ['net_position_volume'])
+        assert len(totals) == 2 and list(totals['net_position_volume']) == [
+            sum(date.day * 100 + 1 + k for k in range(3)) for date in dates[-2:]
+        ]
+        print("✅ 新契約、切片與契約合計")
+
+        # 重新開啟（記憶體映射）得到相同內容
+        reopened = TimeSeriesCube(work_dir / "cube")
+        assert reopened.contracts == ['TX', 'TE'] and reopened.identities == IDENTITIES
+        np.testing.assert_array_equal(reopened.block('TX'), cube.block('TX'))
+        print("✅ 重新開啟後內容一致")
+
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    test_timeseries_cube()
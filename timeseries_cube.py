@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台期所時間序列資料方塊
+預先把資料排成 [交易日 × 契約 × 身份別 × 指標] 的 NumPy 陣列，以記憶體映射的 .npy 儲存，
+取單一契約/身份別/指標的序列只是陣列切片（不複製資料），圖表與報告不必再逐次篩選、分組、排序
+"""
+
+import os
+import json
+import logging
+import numpy as np
+import pandas as pd
+from pathlib import Path
+from schema_mapping import KEY_COLUMNS, METRIC_COLUMNS, SHEETS_COLUMN_MAP
+
+# 中文指標名稱（與 Google Sheets/CSV 欄位相同）對應到資料庫欄位
+METRIC_ALIASES = {SHEETS_COLUMN_MAP[col]: col for col in METRIC_COLUMNS if col in SHEETS_COLUMN_MAP}
+
+CUBE_FILE = 'cube.npy'
+DATES_FILE = 'dates.npy'
+LABELS_FILE = 'labels.json'
+
+
+def _to_day(values):
+    """日期（'YYYY/MM/DD' 字串、datetime 等）轉為 datetime64[D] 陣列"""
+    values = pd.Series(values).astype(str).str.replace('-', '/').str.slice(0, 10)
+    return pd.to_datetime(values, format='%Y/%m/%d').to_numpy().astype('datetime64[D]')
+
+
+class TimeSeriesCube:
+    """記憶體映射的 [交易日 × 契約 × 身份別 × 指標] 資料方塊"""
+
+    def __init__(self, root="data/cube", headroom=256):
+        """
+        初始化資料方塊（已存在的方塊直接以記憶體映射開啟）
+
+        Args:
+            root: 方塊檔案目錄
+            headroom: 配置空間時預留的交易日數，新增交易日在預留空間內只需寫入該日
+        """
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.headroom = headroom
+        self.logger = logging.getLogger(__name__)
+
+        self.contracts = []
+        self.identities = []
+        self.metrics = list(METRIC_COLUMNS)
+        self.length = 0
+        self._values = None
+        self._dates = None
+        self._open()
+
+    def _open(self):
+        """依標籤檔映射方塊與日期陣列"""
+        labels_path = self.root / LABELS_FILE
+        if not labels_path.exists():
+            return
+
+        with open(labels_path, 'r', encoding='utf-8') as f:
+            labels = json.load(f)
+        self.contracts = labels['contracts']
+        self.identities = labels['identities']
+        self.metrics = labels['metrics']
+        self.length = labels['length']
+        self._values = np.load(self.root / CUBE_FILE, mmap_mode='r+')
+        self._dates = np.load(self.root / DATES_FILE, mmap_mode='r+')
+
+    def _save_labels(self):
+        """寫入標籤檔（先寫暫存檔再取代，讀取端只會看到已寫完的交易日）"""
+        tmp_path = self.root / (LABELS_FILE + '.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'contracts': self.contracts,
+                'identities': self.identities,
+                'metrics': self.metrics,
+                'length': self.length,
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, self.root / LABELS_FILE)
+
+    def _allocate(self, dates, contracts, identities):
+        """
+        配置新的方塊檔案，並把既有資料依標籤搬到新位置
+
+        Args:
+            dates: 排序後的全部交易日（datetime64[D]）
+            contracts: 契約標籤
+            identities: 身份別標籤
+        """
+        capacity = len(dates) + self.headroom
+        shape = (capacity, len(contracts), len(identities), len(self.metrics))
+
+        tmp_cube = self.root / (CUBE_FILE + '.tmp')
+        tmp_dates = self.root / (DATES_FILE + '.tmp')
+        values = np.lib.format.open_memmap(tmp_cube, mode='w+', dtype=np.float64, shape=shape)
+        values[:] = np.nan
+        day_index = np.lib.format.open_memmap(tmp_dates, mode='w+', dtype='datetime64[D]', shape=(capacity,))
+        day_index[:len(dates)] = dates
+
+        if self.length:
+            rows = np.searchsorted(dates, self._dates[:self.length])
+            contract_idx = [contracts.index(c) for c in self.contracts]
+            identity_idx = [identities.index(i) for i in self.identities]
+            values[np.ix_(rows, contract_idx, identity_idx, range(len(self.metrics)))] = self._values[:self.length]
+
+        values.flush()
+        day_index.flush()
+        del values, day_index
+        self._values = None
+        self._dates = None
+        os.replace(tmp_cube, self.root / CUBE_FILE)
+        os.replace(tmp_dates, self.root / DATES_FILE)
+
+        self.contracts = list(contracts)
+        self.identities = list(identities)
+        self.length = len(dates)
+        self._values = np.load(self.root / CUBE_FILE, mmap_mode='r+')
+        self._dates = np.load(self.root / DATES_FILE, mmap_mode='r+')
+
+    @staticmethod
+    def _normalize(df):
+        """整理為資料庫欄位名稱（接受中文欄位）"""
+        df = df.rename(columns={'日期': 'date', '契約名稱': 'contract_code', '身份別': 'identity_type', **METRIC_ALIASES})
+        columns = [col for col in KEY_COLUMNS + METRIC_COLUMNS if col in df.columns]
+        df = df[columns].dropna(subset=KEY_COLUMNS)
+        return df.assign(
+            contract_code=df['contract_code'].astype(str),
+            identity_type=df['identity_type'].astype(str)
+        )
+
+    def append(self, df):
+        """
+        寫入資料（新交易日接在尾端；已存在的交易日就地覆寫；補入中間的交易日或新標籤才重新配置）
+
+        Args:
+            df: 資料庫欄位或中文欄位的DataFrame，同一鍵只需一列
+
+        Returns:
+            int: 寫入的資料列數
+        """
+        if df is None or df.empty:
+            return 0
+
+        df = self._normalize(df)
+        if df.empty:
+            return 0
+        days = _to_day(df['date'])
+        current = self._dates[:self.length] if self.length else np.array([], dtype='datetime64[D]')
+
+        new_contracts = [c for c in pd.unique(df['contract_code']) if c not in self.contracts]
+        new_identities = [i for i in pd.unique(df['identity_type']) if i not in self.identities]
+        new_days = np.setdiff1d(np.unique(days), current)
+
+        appends_only = len(new_days) == 0 or not self.length or new_days[0] > current[-1]
+        capacity = len(self._dates) if self._dates is not None else 0
+        if new_contracts or new_identities or not appends_only or self.length + len(new_days) > capacity:
+            self._allocate(np.union1d(current, new_days), self.contracts + new_contracts, self.identities + new_identities)
+            length = self.length
+        else:
+            # 新交易日寫進預留空間，寫完數值後才更新標籤檔中的長度
+            self._dates[self.length:self.length + len(new_days)] = new_days
+            length = self.length + len(new_days)
+
+        rows = np.searchsorted(self._dates[:length], days)
+        contract_idx = pd.Index(self.contracts).get_indexer(df['contract_code'])
+        identity_idx = pd.Index(self.identities).get_indexer(df['identity_type'])
+        for m, metric in enumerate(self.metrics):
+            if metric in df.columns:
+                self._values[rows, contract_idx, identity_idx, m] = pd.to_numeric(df[metric], errors='coerce').to_numpy(dtype=np.float64)
+
+        self._values.flush()
+        self._dates.flush()
+        self.length = length
+        self._save_labels()
+        return len(df)
+
+    def rebuild(self, df):
+        """
+        以完整資料重建方塊
+
+        Args:
+            df: 全部資料（資料庫欄位或中文欄位）
+        """
+        for path in (CUBE_FILE, DATES_FILE, LABELS_FILE):
+            if (self.root / path).exists():
+                (self.root / path).unlink()
+        self.contracts = []
+        self.identities = []
+        self.length = 0
+        self._values = None
+        self._dates = None
+        rows = self.append(df)
+        self.logger.info(f"🧊 資料方塊重建完成: {self.length} 個交易日 × {len(self.contracts)} 契約 × {len(self.identities)} 身份別（{rows} 筆）")
+        return rows
+
+    def rebuild_from_database(self, db_manager):
+        """由資料庫的全部資料重建方塊"""
+        return self.rebuild(db_manager.query(columns=KEY_COLUMNS + self.metrics))
+
+    def attach(self, db_manager):
+        """掛到資料庫管理器上，每次寫入提交後把變動的資料列寫進方塊"""
+        if self.length == 0:
+            self.rebuild_from_database(db_manager)
+        db_manager.register_commit_hook(self.append)
+        return self
+
+    def _slice(self, last=None, start=None, end=None):
+        """交易日範圍對應的切片"""
+        if not self.length:
+            return slice(0, 0)
+        dates = self._dates[:self.length]
+        lo = 0 if start is None else int(np.searchsorted(dates, _to_day([start])[0], side='left'))
+        hi = self.length if end is None else int(np.searchsorted(dates, _to_day([end])[0], side='right'))
+        if last is not None:
+            lo = max(lo, hi - last)
+        return slice(lo, hi)
+
+    def _metric_index(self, metric):
+        """指標位置（接受資料庫欄位或中文名稱）"""
+        return self.metrics.index(METRIC_ALIASES.get(metric, metric))
+
+    def dates(self, last=None, start=None, end=None):
+        """
+        交易日陣列（唯讀視圖）
+
+        Args:
+            last: 只取最後N個交易日
+            start: 起始日期（含）
+            end: 結束日期（含）
+
+        Returns:
+            numpy.ndarray: datetime64[D]
+        """
+        view = self._dates[self._slice(last, start, end)] if self.length else np.array([], dtype='datetime64[D]')
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+    def series(self, contract, identity, metric, last=None, start=None, end=None):
+        """
+        取得單一契約/身份別/指標的序列（不複製資料的唯讀視圖，當日無資料為 NaN）
+
+        Args:
+            contract: 契約代碼
+            identity: 身份別
+            metric: 指標（資料庫欄位或中文名稱，如 '多空淨額未平倉口數'）
+            last: 只取最後N個交易日
+            start: 起始日期（含）
+            end: 結束日期（含）
+
+        Returns:
+            numpy.ndarray: float64，與 dates() 同長度
+        """
+        view = self._values[self._slice(last, start, end), self.contracts.index(contract),
+                            self.identities.index(identity), self._metric_index(metric)]
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+    def block(self, contract, metrics=None, last=None, start=None, end=None):
+        """
+        單一契約的 [交易日 × 身份別 × 指標] 區塊
+
+        Returns:
+            numpy.ndarray: 唯讀視圖（指定 metrics 時為依序取出的複本）
+        """
+        view = self._values[self._slice(last, start, end), self.contracts.index(contract)]
+        if metrics is not None:
+            view = view[..., [self._metric_index(metric) for metric in metrics]]
+        view = view.view()
+        view.flags.writeable = False
+        return view
+
+    def contract_totals(self, contract, metrics, last=None, start=None, end=None):
+        """
+        單一契約各身份別合計的序列（只保留至少一個身份別有資料的交易日）
+
+        Args:
+            contract: 契約代碼
+            metrics: 指標列表
+            last: 只取最後N個交易日
+
+        Returns:
+            DataFrame: 日期欄位加上各指標欄位（欄位名稱與輸入相同）
+        """
+        block = self.block(contract, metrics, last, start, end)
+        has_data = ~np.isnan(block).all(axis=(1, 2))
+        totals = np.nansum(block, axis=1)[has_data]
+        dates = self.dates(last, start, end)[has_data]
+
+        frame = pd.DataFrame(totals.astype(np.int64), columns=list(metrics))
+        frame.insert(0, '日期', pd.to_datetime(dates))
+        return frame